@@ -0,0 +1,415 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+try:
+    import redis
+except ImportError:  # redis is optional; the in-process backend needs nothing extra.
+    redis = None
+
+from .config import settings
+from .metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+cache_requests = Counter(
+    "cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+)
+
+# Stale entries are refreshed off the request path by this small shared pool.
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+
+class MemoryBackend:
+    # Values are kept as-is, not copied: callers must treat cached objects as read-only.
+    shared = False
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        # key -> (value, monotonic expiry or None, tags)
+        self._entries: OrderedDict[str, tuple[Any, float | None, tuple[str, ...]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at, _ = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._remove(key)
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float | None, tags: tuple[str, ...] = ()) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, expires_at, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, keys: list[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def delete_tag(self, tag: str) -> list[str]:
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+        return keys
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+
+    def count(self, prefix: str = "") -> int:
+        # Expired entries still hold memory until they are read or evicted, so they count.
+        with self._lock:
+            if not prefix:
+                return len(self._entries)
+            return sum(1 for key in self._entries if key.startswith(prefix))
+
+    def publish(self, message: dict) -> None:
+        pass
+
+    def listen(self, callback: Callable[[dict], None]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    # Speaks the Redis protocol through redis-py; values are stored as JSON.
+    shared = True
+
+    def __init__(self, url: str, channel: str) -> None:
+        self.channel = channel
+        # RESP2 keeps this working against any Redis-protocol server, not just Redis 6+.
+        self.client = redis.Redis.from_url(
+            url, protocol=2, socket_timeout=settings.cache_socket_timeout
+        )
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def get(self, key: str) -> Any:
+        raw = self.client.get(key)
+        return MISSING if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float | None, tags: tuple[str, ...] = ()) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        if ttl is None:
+            pipe.set(key, json.dumps(value))
+        else:
+            pipe.set(key, json.dumps(value), px=max(int(ttl * 1000), 1))
+        for tag in tags:
+            pipe.sadd(tag, key)
+            # Tag sets only need to outlive their members; expired members are harmless.
+            pipe.expire(tag, settings.cache_tag_ttl_seconds)
+        pipe.execute()
+
+    def delete(self, keys: list[str]) -> None:
+        if keys:
+            self.client.delete(*keys)
+
+    def delete_tag(self, tag: str) -> list[str]:
+        keys = [key.decode() for key in self.client.smembers(tag)]
+        self.client.delete(tag, *keys)
+        return keys
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=f"{prefix}*", count=500))
+        if keys:
+            self.client.delete(*keys)
+
+    def publish(self, message: dict) -> None:
+        self.client.publish(self.channel, json.dumps(message))
+
+    def listen(self, callback: Callable[[dict], None]) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._listen, args=(callback,), name="cache-invalidation", daemon=True
+        )
+        self._thread.start()
+
+    def _listen(self, callback: Callable[[dict], None]) -> None:
+        while not self._stop.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        callback(json.loads(message["data"]))
+            except Exception:
+                logger.exception("Cache invalidation listener failed; reconnecting")
+                self._stop.wait(2.0)
+            finally:
+                pubsub.close()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def build_backend():
+    if settings.cache_backend == "redis":
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        return RedisBackend(settings.cache_url, f"{settings.cache_key_prefix}:invalidate")
+    return MemoryBackend(settings.cache_max_entries)
+
+
+backend = build_backend()
+# Identifies this process in invalidation messages so it can skip its own.
+_origin = uuid.uuid4().hex
+_caches: dict[str, "Cache"] = {}
+
+
+class Cache:
+    def __init__(self, namespace: str) -> None:
+        self.namespace = namespace
+        self.prefix = f"{settings.cache_key_prefix}:{namespace}:"
+        # A shared backend costs a round trip, so each worker keeps a short-lived near copy.
+        # Other workers' invalidations evict it; the short TTL bounds any missed message.
+        self.local = (
+            MemoryBackend(settings.cache_local_max_entries) if backend.shared else None
+        )
+        _caches[namespace] = self
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.prefix}{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    def get(self, key: Hashable) -> Any:
+        full_key = self._key(key)
+        if self.local is not None:
+            value = self.local.get(full_key)
+            if value is not MISSING:
+                return value
+        try:
+            value = backend.get(full_key)
+        except Exception:
+            logger.exception("Cache read failed for %s", full_key)
+            return MISSING
+        if value is not MISSING and self.local is not None:
+            self.local.set(full_key, value, settings.cache_local_ttl_seconds)
+        return value
+
+    def set(
+        self, key: Hashable, value: Any, ttl: float | None, tags: tuple[str, ...] = ()
+    ) -> None:
+        full_key = self._key(key)
+        tag_keys = tuple(self._tag(tag) for tag in tags)
+        if self.local is not None:
+            local_ttl = settings.cache_local_ttl_seconds
+            self.local.set(full_key, value, local_ttl if ttl is None else min(ttl, local_ttl))
+        try:
+            backend.set(full_key, value, ttl, tag_keys)
+        except Exception:
+            logger.exception("Cache write failed for %s", full_key)
+
+    def delete(self, key: Hashable) -> None:
+        full_key = self._key(key)
+        if self.local is not None:
+            self.local.delete([full_key])
+        try:
+            backend.delete([full_key])
+            backend.publish({"origin": _origin, "namespace": self.namespace, "keys": [full_key]})
+        except Exception:
+            logger.exception("Cache delete failed for %s", full_key)
+
+    def invalidate_tag(self, tag: str) -> None:
+        try:
+            keys = backend.delete_tag(self._tag(tag))
+            if self.local is not None:
+                self.local.delete(keys)
+            backend.publish({"origin": _origin, "namespace": self.namespace, "keys": keys})
+        except Exception:
+            logger.exception("Cache tag invalidation failed for %s", tag)
+
+    def clear(self) -> None:
+        if self.local is not None:
+            self.local.delete_prefix(self.prefix)
+        try:
+            backend.delete_prefix(self.prefix)
+            backend.publish({"origin": _origin, "namespace": self.namespace, "clear": True})
+        except Exception:
+            logger.exception("Cache clear failed for %s", self.prefix)
+
+    def _on_invalidation(self, message: dict) -> None:
+        if self.local is None:
+            return
+        if message.get("clear"):
+            self.local.delete_prefix(self.prefix)
+        else:
+            self.local.delete(message.get("keys", []))
+
+
+def _on_invalidation(message: dict) -> None:
+    if message.get("origin") == _origin:
+        return
+    cache = _caches.get(message.get("namespace"))
+    if cache is not None:
+        cache._on_invalidation(message)
+
+
+def _entry_counts() -> dict[tuple[str, ...], float]:
+    # Sampled at scrape time. A shared backend's own size is the server's business; here it
+    # is each cache's near copy that takes this process's memory.
+    counts = {}
+    for namespace, cache in list(_caches.items()):
+        if cache.local is not None:
+            counts[(namespace,)] = cache.local.count()
+        elif not backend.shared:
+            counts[(namespace,)] = backend.count(cache.prefix)
+    return counts
+
+
+Gauge(
+    "cache_entries", "Entries held in this process's memory cache by cache", ("cache",)
+).set_function(_entry_counts)
+
+
+def start() -> None:
+    backend.listen(_on_invalidation)
+
+
+def stop() -> None:
+    backend.close()
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+        # Set when the key is invalidated mid-load; the result is then returned but not stored.
+        self.invalidated = False
+
+
+class CoalescingCache:
+    def __init__(self, cache: Cache, *, ttl_seconds: float, stale_seconds: float) -> None:
+        self.cache = cache
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._flights: dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            result: cache_requests.labels(cache=cache.namespace, result=result)
+            for result in ("hit", "stale", "miss", "coalesced")
+        }
+
+    def get(
+        self,
+        key: Hashable,
+        loader: Callable[[Hashable], Any],
+        tags: Callable[[Any], tuple[str, ...]] | None = None,
+    ) -> Any:
+        # Entries are [value, loaded_at] with wall-clock time so every worker ages them alike.
+        entry = self.cache.get(key)
+        if entry is not MISSING:
+            value, loaded_at = entry
+            age = time.time() - loaded_at
+            if age < self.ttl_seconds:
+                self._counters["hit"].inc()
+                return value
+            # Stale-while-revalidate: answer now, refresh once in the background.
+            self._counters["stale"].inc()
+            with self._lock:
+                if key not in self._flights:
+                    flight = self._flights[key] = _Flight()
+                    _refresher.submit(self._load, key, flight, loader, tags)
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        # Single flight: concurrent misses for one key wait on the leader's load.
+        if leader:
+            self._counters["miss"].inc()
+            self._load(key, flight, loader, tags)
+        else:
+            self._counters["coalesced"].inc()
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _load(self, key, flight: _Flight, loader, tags) -> None:
+        try:
+            flight.value = loader(key)
+        except BaseException as exc:
+            flight.error = exc
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            store = flight.error is None and not flight.invalidated
+        if store:
+            self.cache.set(
+                key,
+                [flight.value, time.time()],
+                self.ttl_seconds + self.stale_seconds,
+                tags(flight.value) if tags and flight.value is not None else (),
+            )
+            # An invalidation that raced the write above must still win.
+            if flight.invalidated:
+                self.cache.delete(key)
+        flight.done.set()
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            flight = self._flights.pop(key, None)
+            if flight is not None:
+                flight.invalidated = True
+        self.cache.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for flight in self._flights.values():
+                flight.invalidated = True
+            self._flights.clear()
+        self.cache.clear()
+
+
+listing_cache = CoalescingCache(
+    Cache("listing"),
+    ttl_seconds=settings.listing_cache_ttl_seconds,
+    stale_seconds=settings.listing_cache_stale_seconds,
+)
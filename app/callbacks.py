@@ -0,0 +1,129 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager
+
+from . import jobs
+from .config import settings
+from .database import SessionLocal, as_naive_utc
+from .models import MpesaCallbackInbox, MpesaTransaction, PaymentMethod, PaymentStatus
+from .services import record_payment_event
+
+
+def store_mpesa_callback(checkout_request_id: str, payload: str) -> bool:
+    with SessionLocal() as db:
+        db.add(MpesaCallbackInbox(checkout_request_id=checkout_request_id, payload=payload))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Safaricom replays callbacks; the first copy is already queued.
+            db.rollback()
+            return False
+    jobs.wake_workers()
+    return True
+
+
+# Callbacks whose transaction row is not visible yet; retried until the grace period ends.
+WAITING = "waiting"
+
+_last_retry = 0.0
+
+
+def stk_callback(payload) -> dict:
+    # Daraja payloads are untrusted; anything off-shape reads as an empty callback.
+    body = payload.get("Body") if isinstance(payload, dict) else None
+    callback = body.get("stkCallback") if isinstance(body, dict) else None
+    return callback if isinstance(callback, dict) else {}
+
+
+def _receipt_from_callback(callback: dict) -> str | None:
+    metadata = callback.get("CallbackMetadata")
+    metadata_items = metadata.get("Item") if isinstance(metadata, dict) else None
+    for item in metadata_items if isinstance(metadata_items, list) else []:
+        if isinstance(item, dict) and item.get("Name") == "MpesaReceiptNumber":
+            return item.get("Value")
+    return None
+
+
+def _process_batch(limit: int, *, waiting: bool) -> int:
+    outcome = MpesaCallbackInbox.outcome
+    with SessionLocal() as db:
+        rows = db.scalars(
+            select(MpesaCallbackInbox)
+            .where(
+                MpesaCallbackInbox.processed_at.is_(None),
+                outcome == WAITING if waiting else outcome.is_(None),
+            )
+            .order_by(MpesaCallbackInbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return 0
+
+        transactions = db.scalars(
+            select(MpesaTransaction)
+            .join(MpesaTransaction.order)
+            .options(contains_eager(MpesaTransaction.order))
+            .where(
+                MpesaTransaction.checkout_request_id.in_(
+                    [row.checkout_request_id for row in rows]
+                )
+            )
+        ).all()
+        by_checkout_id = {tx.checkout_request_id: tx for tx in transactions}
+
+        now = datetime.utcnow()
+        grace_cutoff = now - timedelta(seconds=settings.mpesa_callback_match_grace_seconds)
+        for row in rows:
+            tx = by_checkout_id.get(row.checkout_request_id)
+            if not tx:
+                # The callback can beat the commit of the STK push's transaction row.
+                if as_naive_utc(row.received_at) >= grace_cutoff:
+                    row.outcome = WAITING
+                    continue
+                row.processed_at = now
+                row.outcome = "unmatched"
+                continue
+            row.processed_at = now
+            if tx.status != PaymentStatus.pending:
+                row.outcome = "duplicate"
+                continue
+
+            callback = stk_callback(json.loads(row.payload))
+            result_code = str(callback.get("ResultCode", ""))
+            result_desc = callback.get("ResultDesc", "")
+            receipt = _receipt_from_callback(callback)
+            success = result_code == "0"
+
+            tx.result_code = result_code
+            tx.result_desc = result_desc
+            tx.mpesa_receipt = receipt
+            tx.raw_payload = row.payload
+            tx.status = PaymentStatus.success if success else PaymentStatus.failed
+
+            order = tx.order
+            order.payment_method = PaymentMethod.mpesa
+            order.payment_status = PaymentStatus.success if success else PaymentStatus.failed
+            order.payment_result_desc = result_desc
+            if receipt:
+                order.payment_receipt = receipt
+            row.outcome = "applied"
+            record_payment_event(db, order)
+
+        db.commit()
+        return len(rows)
+
+
+def process_callback_inbox(limit: int) -> int:
+    global _last_retry
+    processed = _process_batch(limit, waiting=False)
+    now = time.monotonic()
+    if now - _last_retry >= settings.mpesa_callback_retry_seconds:
+        _last_retry = now
+        # Waiting rows are retried on their own schedule so they never crowd out new ones.
+        _process_batch(limit, waiting=True)
+    return processed
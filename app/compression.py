@@ -0,0 +1,160 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available.
+    brotli = None
+
+from .config import settings
+
+# Already-compressed or latency-sensitive bodies are passed through untouched.
+SKIPPED_CONTENT_TYPES = ("image/", "video/", "audio/", "text/event-stream", "application/zip")
+
+
+def _accepted_encodings(scope) -> set[str]:
+    for name, value in scope.get("headers", []):
+        if name == b"accept-encoding":
+            accepted = set()
+            for part in value.decode("latin-1").split(","):
+                token, _, params = part.partition(";")
+                param, _, quality = params.strip().partition("=")
+                try:
+                    if param.strip() == "q" and float(quality) <= 0:
+                        continue
+                except ValueError:
+                    continue
+                accepted.add(token.strip().lower())
+            return accepted
+    return set()
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int) -> None:
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        *,
+        minimum_size: int | None = None,
+        gzip_level: int | None = None,
+        brotli_quality: int | None = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = (
+            settings.compression_minimum_size if minimum_size is None else minimum_size
+        )
+        self.gzip_level = settings.gzip_level if gzip_level is None else gzip_level
+        self.brotli_quality = settings.brotli_quality if brotli_quality is None else brotli_quality
+
+    def _encoder_factory(self, scope):
+        accepted = _accepted_encodings(scope)
+        if brotli is not None and "br" in accepted:
+            return lambda: _BrotliEncoder(self.brotli_quality)
+        if "gzip" in accepted:
+            return lambda: _GzipEncoder(self.gzip_level)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoder_factory = self._encoder_factory(scope)
+        if encoder_factory is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+        # None until the first body chunk decides; then True (compressing) or False (passthrough).
+        compressing = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressing, encoder
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressing is None:
+                headers = start_message.get("headers", [])
+                content_type = b""
+                already_encoded = False
+                for name, value in headers:
+                    if name == b"content-type":
+                        content_type = value
+                    elif name == b"content-encoding":
+                        already_encoded = True
+                skip = already_encoded or content_type.decode("latin-1").startswith(
+                    SKIPPED_CONTENT_TYPES
+                )
+                # A single small body is cheaper to send as-is than to compress.
+                if skip or (not more_body and len(body) < self.minimum_size):
+                    compressing = False
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressing = True
+                # Created only now: a compressor allocates its window up front.
+                encoder = encoder_factory()
+                vary = [value for name, value in headers if name == b"vary"]
+                headers = [
+                    (name, value)
+                    for name, value in headers
+                    if name not in {b"content-length", b"vary"}
+                ]
+                headers.append((b"content-encoding", encoder.name.encode("latin-1")))
+                headers.append((b"vary", b", ".join([*vary, b"Accept-Encoding"])))
+                if not more_body:
+                    compressed = encoder.compress(body) + encoder.finish()
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                # Streaming: chunks are compressed as they arrive and sent chunked.
+                await send({**start_message, "headers": headers})
+
+            if not compressing:
+                await send(message)
+                return
+
+            chunk = encoder.compress(body)
+            if more_body:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                return
+            await send({"type": "http.response.body", "body": chunk + encoder.finish()})
+
+        await self.app(scope, receive, send_wrapper)
+        if start_message is not None and compressing is None:
+            # The app sent headers but no body message (e.g. HEAD); forward them unchanged.
+            await send(start_message)
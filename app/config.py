@@ -1,4 +1,5 @@
 import os
+from decimal import Decimal
 
 
 class Settings:
@@ -59,6 +60,141 @@ class Settings:
         self.daraja_transaction_type = os.getenv(
             "DARAJA_TRANSACTION_TYPE", "CustomerPayBillOnline"
         )
+        self.daraja_token_refresh_margin_seconds = float(
+            os.getenv("DARAJA_TOKEN_REFRESH_MARGIN_SECONDS", "60")
+        )
+        self.daraja_max_connections = int(os.getenv("DARAJA_MAX_CONNECTIONS", "20"))
+        self.daraja_max_in_flight = int(os.getenv("DARAJA_MAX_IN_FLIGHT", "16"))
+        # STK status queries have their own, smaller bulkhead so a reconciler sweep can never take
+        # the slots live STK pushes need.
+        self.daraja_query_max_in_flight = int(os.getenv("DARAJA_QUERY_MAX_IN_FLIGHT", "4"))
+        self.daraja_breaker_failure_threshold = int(
+            os.getenv("DARAJA_BREAKER_FAILURE_THRESHOLD", "5")
+        )
+        self.daraja_breaker_reset_seconds = float(os.getenv("DARAJA_BREAKER_RESET_SECONDS", "30"))
+        self.daraja_breaker_half_open_probes = int(
+            os.getenv("DARAJA_BREAKER_HALF_OPEN_PROBES", "1")
+        )
+        self.daraja_timeout_min_seconds = float(os.getenv("DARAJA_TIMEOUT_MIN_SECONDS", "2"))
+        self.daraja_timeout_max_seconds = float(os.getenv("DARAJA_TIMEOUT_MAX_SECONDS", "20"))
+        self.daraja_timeout_multiplier = float(os.getenv("DARAJA_TIMEOUT_MULTIPLIER", "3"))
+        self.reconcile_interval_seconds = float(os.getenv("RECONCILE_INTERVAL_SECONDS", "60"))
+        self.reconcile_stale_after_seconds = int(
+            os.getenv("RECONCILE_STALE_AFTER_SECONDS", "120")
+        )
+        self.reconcile_page_size = int(os.getenv("RECONCILE_PAGE_SIZE", "200"))
+        self.reconcile_concurrency = int(os.getenv("RECONCILE_CONCURRENCY", "4"))
+        self.job_worker_embedded = os.getenv("JOB_WORKER_EMBEDDED", "true").lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+        self.job_worker_concurrency = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+        self.job_worker_poll_seconds = float(os.getenv("JOB_WORKER_POLL_SECONDS", "0.5"))
+        self.job_max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.job_retry_backoff_seconds = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "5"))
+        self.job_lease_seconds = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+        # Queued payment pushes to one gateway are sent together, up to this many per job run.
+        self.payment_initiate_batch_size = int(os.getenv("PAYMENT_INITIATE_BATCH_SIZE", "8"))
+        self.mpesa_callback_batch_size = int(os.getenv("MPESA_CALLBACK_BATCH_SIZE", "200"))
+        # Callbacks for an unknown CheckoutRequestID are retried this long before giving up.
+        self.mpesa_callback_match_grace_seconds = float(
+            os.getenv("MPESA_CALLBACK_MATCH_GRACE_SECONDS", "600")
+        )
+        self.mpesa_callback_retry_seconds = float(os.getenv("MPESA_CALLBACK_RETRY_SECONDS", "5"))
+        # With a process-local bus, a long-polling status request also rereads the order this
+        # often, since changes made by other processes never reach it as events.
+        self.payment_status_recheck_seconds = float(
+            os.getenv("PAYMENT_STATUS_RECHECK_SECONDS", "2")
+        )
+        self.payment_events_heartbeat_seconds = float(
+            os.getenv("PAYMENT_EVENTS_HEARTBEAT_SECONDS", "15")
+        )
+        self.payment_events_max_seconds = float(os.getenv("PAYMENT_EVENTS_MAX_SECONDS", "300"))
+        # "auto" uses Postgres LISTEN/NOTIFY across workers when the database is Postgres.
+        self.notification_backend = os.getenv("NOTIFICATION_BACKEND", "auto").lower()
+        self.order_events_heartbeat_seconds = float(
+            os.getenv("ORDER_EVENTS_HEARTBEAT_SECONDS", "25")
+        )
+        self.outbox_batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+        self.outbox_max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+        self.outbox_retry_backoff_seconds = float(os.getenv("OUTBOX_RETRY_BACKOFF_SECONDS", "5"))
+        self.outbox_retention_hours = float(os.getenv("OUTBOX_RETENTION_HOURS", "72"))
+        # Market price stats are folded in from changed groups at most this often.
+        self.market_stats_refresh_seconds = float(os.getenv("MARKET_STATS_REFRESH_SECONDS", "10"))
+        self.market_stats_batch_size = int(os.getenv("MARKET_STATS_BATCH_SIZE", "500"))
+        # The market-wide rollup scans every price point, so it is refreshed less often.
+        self.market_stats_rollup_seconds = float(os.getenv("MARKET_STATS_ROLLUP_SECONDS", "300"))
+        # Listing prices outside this range are left out of market stats; the ceiling must stay
+        # below what listing_price_points.price (NUMERIC(14, 2)) can hold.
+        self.market_price_min = Decimal(os.getenv("MARKET_PRICE_MIN", "1"))
+        self.market_price_max = min(
+            Decimal(os.getenv("MARKET_PRICE_MAX", "100000000")), Decimal("999999999999.99")
+        )
+        # The worker recounts listing facets from scratch this often to correct any drift.
+        self.facet_recount_seconds = float(os.getenv("FACET_RECOUNT_SECONDS", "3600"))
+        self.idempotency_ttl_hours = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+        self.metrics_enabled = os.getenv("METRICS_ENABLED", "true").lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+        self.query_stats_enabled = os.getenv("QUERY_STATS_ENABLED", "true").lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+        self.query_budget = int(os.getenv("QUERY_BUDGET", "25"))
+        self.query_budget_strict = os.getenv("QUERY_BUDGET_STRICT", "false").lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+        self.slow_query_ms = float(os.getenv("SLOW_QUERY_MS", "200"))
+        self.slow_query_explain = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+        self.slow_query_log_per_minute = int(os.getenv("SLOW_QUERY_LOG_PER_MINUTE", "10"))
+        self.slow_query_dedupe_seconds = float(os.getenv("SLOW_QUERY_DEDUPE_SECONDS", "300"))
+        self.compression_enabled = os.getenv("COMPRESSION_ENABLED", "true").lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+        self.compression_minimum_size = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+        self.gzip_level = int(os.getenv("GZIP_LEVEL", "6"))
+        self.brotli_quality = int(os.getenv("BROTLI_QUALITY", "4"))
+        self.bulk_listing_max_rows = int(os.getenv("BULK_LISTING_MAX_ROWS", "10000"))
+        self.listing_cache_enabled = os.getenv("LISTING_CACHE_ENABLED", "true").lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+        self.listing_cache_ttl_seconds = float(os.getenv("LISTING_CACHE_TTL_SECONDS", "30"))
+        # Past the TTL an entry is still served for this long while it refreshes in the background.
+        self.listing_cache_stale_seconds = float(os.getenv("LISTING_CACHE_STALE_SECONDS", "300"))
+        # "memory" keeps entries per process; "redis" shares them across workers via CACHE_URL.
+        self.cache_backend = os.getenv("CACHE_BACKEND", "memory").lower()
+        self.cache_url = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+        self.cache_key_prefix = os.getenv("CACHE_KEY_PREFIX", "farmart")
+        self.cache_max_entries = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+        self.cache_local_max_entries = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1000"))
+        self.cache_local_ttl_seconds = float(os.getenv("CACHE_LOCAL_TTL_SECONDS", "5"))
+        self.cache_tag_ttl_seconds = int(os.getenv("CACHE_TAG_TTL_SECONDS", "86400"))
+        self.cache_socket_timeout = float(os.getenv("CACHE_SOCKET_TIMEOUT", "0.5"))
+        self.media_root = os.getenv("MEDIA_ROOT", "media")
+        self.media_url_prefix = os.getenv("MEDIA_URL_PREFIX", "/media").rstrip("/")
+        self.image_max_bytes = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.image_webp_quality = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
         self.seed_demo_users = os.getenv("SEED_DEMO_USERS", "true").lower() in {
             "1",
             "true",
@@ -0,0 +1,315 @@
+import base64
+import threading
+import time
+from datetime import datetime
+
+import httpx
+from fastapi import HTTPException
+
+from .cache import MISSING, Cache
+from .config import settings
+from .metrics import Counter, Gauge
+from .resilience import AdaptiveTimeout, Bulkhead, CircuitBreaker, CircuitState
+
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    timeout=20.0,
+                    limits=httpx.Limits(
+                        max_connections=settings.daraja_max_connections,
+                        max_keepalive_connections=settings.daraja_max_connections,
+                    ),
+                )
+    return _client
+
+
+def set_client(client: httpx.Client | None) -> None:
+    global _client
+    with _client_lock:
+        _client = client
+
+
+circuit_trips_total = Counter("daraja_circuit_trips_total", "Times the Daraja circuit has opened")
+breaker = CircuitBreaker(
+    failure_threshold=settings.daraja_breaker_failure_threshold,
+    reset_timeout_seconds=settings.daraja_breaker_reset_seconds,
+    half_open_max_calls=settings.daraja_breaker_half_open_probes,
+    on_trip=circuit_trips_total.inc,
+)
+adaptive_timeout = AdaptiveTimeout(
+    min_seconds=settings.daraja_timeout_min_seconds,
+    max_seconds=settings.daraja_timeout_max_seconds,
+    multiplier=settings.daraja_timeout_multiplier,
+)
+bulkhead = Bulkhead(settings.daraja_max_in_flight)
+query_bulkhead = Bulkhead(settings.daraja_query_max_in_flight)
+
+_CIRCUIT_STATE_VALUES = {CircuitState.closed: 0, CircuitState.half_open: 1, CircuitState.open: 2}
+
+requests_total = Counter(
+    "daraja_requests_total", "Daraja HTTP calls by endpoint and outcome", ("endpoint", "outcome")
+)
+rejected_total = Counter(
+    "daraja_rejected_total", "Daraja calls shed before reaching the network", ("reason",)
+)
+token_cache_requests = Counter(
+    "daraja_token_cache_requests_total", "OAuth token cache lookups by result", ("result",)
+)
+Gauge("daraja_circuit_state", "0 closed, 1 half-open, 2 open").set_function(
+    lambda: _CIRCUIT_STATE_VALUES[breaker.state]
+)
+Gauge("daraja_in_flight", "Daraja calls currently in flight").set_function(
+    lambda: bulkhead.in_flight
+)
+Gauge("daraja_query_in_flight", "Daraja STK status queries currently in flight").set_function(
+    lambda: query_bulkhead.in_flight
+)
+Gauge("daraja_timeout_seconds", "Current adaptive Daraja timeout").set_function(
+    adaptive_timeout.current
+)
+
+
+def _is_upstream_failure(response: httpx.Response) -> bool:
+    if response.status_code == 429:
+        return True
+    if response.status_code < 500:
+        return False
+    try:
+        # A still-processing STK query is a normal answer delivered as HTTP 500.
+        return response.json().get("errorCode") != "500.001.1001"
+    except (ValueError, AttributeError):
+        return True
+
+
+def _request(
+    endpoint: str, method: str, url: str, limiter: Bulkhead = bulkhead, **kwargs
+) -> httpx.Response:
+    # Bulkhead first so a rejected call never consumes a half-open probe slot.
+    if not limiter.try_acquire():
+        rejected_total.inc(reason="bulkhead_full")
+        raise HTTPException(status_code=503, detail="Daraja is busy, try again shortly")
+    try:
+        if not breaker.allow():
+            rejected_total.inc(reason="circuit_open")
+            raise HTTPException(status_code=503, detail="Daraja is temporarily unavailable")
+        started = time.perf_counter()
+        try:
+            response = get_client().request(
+                method, url, timeout=adaptive_timeout.current(), **kwargs
+            )
+        except Exception as exc:
+            adaptive_timeout.observe(time.perf_counter() - started)
+            breaker.record_failure()
+            outcome = "timeout" if isinstance(exc, httpx.TimeoutException) else "network_error"
+            requests_total.inc(endpoint=endpoint, outcome=outcome)
+            raise
+        adaptive_timeout.observe(time.perf_counter() - started)
+        if _is_upstream_failure(response):
+            breaker.record_failure()
+            requests_total.inc(endpoint=endpoint, outcome="upstream_error")
+        else:
+            breaker.record_success()
+            requests_total.inc(endpoint=endpoint, outcome="ok")
+        return response
+    finally:
+        limiter.release()
+
+
+def resilience_snapshot() -> dict:
+    return {
+        "circuitState": breaker.state.value,
+        "circuitTrips": breaker.trips,
+        "inFlight": bulkhead.in_flight,
+        "maxInFlight": bulkhead.max_concurrent,
+        "queriesInFlight": query_bulkhead.in_flight,
+        "maxQueriesInFlight": query_bulkhead.max_concurrent,
+        "timeoutSeconds": round(adaptive_timeout.current(), 3),
+    }
+
+
+class DarajaTokenCache:
+    # Backed by the shared cache so all workers reuse one OAuth token between refreshes.
+    KEY = "access_token"
+
+    def __init__(self, refresh_margin_seconds: float) -> None:
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._cache = Cache("daraja")
+        self._lock = threading.Lock()
+
+    def _fresh_token(self) -> str | None:
+        entry = self._cache.get(self.KEY)
+        if entry is MISSING or time.time() >= entry["expires_at"] - self.refresh_margin_seconds:
+            return None
+        return entry["token"]
+
+    def get(self) -> str:
+        token = self._fresh_token()
+        if token:
+            token_cache_requests.inc(result="hit")
+            return token
+        with self._lock:
+            # Another thread may have refreshed while we waited on the lock.
+            token = self._fresh_token()
+            if token:
+                token_cache_requests.inc(result="hit")
+                return token
+            token_cache_requests.inc(result="miss")
+            token, expires_in = _fetch_access_token()
+            self._cache.set(
+                self.KEY, {"token": token, "expires_at": time.time() + expires_in}, expires_in
+            )
+            return token
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cache.delete(self.KEY)
+
+    def seconds_remaining(self) -> float:
+        entry = self._cache.get(self.KEY)
+        if entry is MISSING:
+            return 0.0
+        return max(entry["expires_at"] - time.time(), 0.0)
+
+
+def _fetch_access_token() -> tuple[str, float]:
+    if not settings.daraja_consumer_key or not settings.daraja_consumer_secret:
+        raise HTTPException(
+            status_code=500,
+            detail="Daraja consumer key/secret not configured",
+        )
+
+    url = f"{settings.daraja_base_url}/oauth/v1/generate?grant_type=client_credentials"
+    try:
+        response = _request(
+            "oauth",
+            "GET",
+            url,
+            auth=(settings.daraja_consumer_key, settings.daraja_consumer_secret),
+        )
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=502, detail=f"Daraja auth network error: {exc}") from exc
+    if response.status_code >= 400:
+        raise HTTPException(
+            status_code=502,
+            detail=f"Daraja auth failed: {response.text}",
+        )
+    body = response.json()
+    token = body.get("access_token")
+    if not token:
+        raise HTTPException(status_code=502, detail="Daraja access token missing")
+    try:
+        expires_in = float(body.get("expires_in") or 0)
+    except (TypeError, ValueError):
+        expires_in = 0.0
+    return token, expires_in
+
+
+token_cache = DarajaTokenCache(settings.daraja_token_refresh_margin_seconds)
+Gauge("daraja_token_ttl_seconds", "Seconds until the cached OAuth token expires").set_function(
+    token_cache.seconds_remaining
+)
+
+
+def access_token() -> str:
+    return token_cache.get()
+
+
+def _password(timestamp: str) -> str:
+    password_raw = f"{settings.daraja_shortcode}{settings.daraja_passkey}{timestamp}"
+    return base64.b64encode(password_raw.encode("utf-8")).decode("utf-8")
+
+
+def stk_push(*, phone: str, amount: int, order_id: int) -> dict:
+    required = [
+        settings.daraja_shortcode,
+        settings.daraja_passkey,
+        settings.daraja_callback_url,
+    ]
+    if any(not value for value in required):
+        raise HTTPException(
+            status_code=500,
+            detail="Daraja shortcode/passkey/callback URL not configured",
+        )
+
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    password = _password(timestamp)
+    token = access_token()
+
+    payload = {
+        "BusinessShortCode": settings.daraja_shortcode,
+        "Password": password,
+        "Timestamp": timestamp,
+        "TransactionType": settings.daraja_transaction_type,
+        "Amount": max(amount, 1),
+        "PartyA": phone,
+        "PartyB": settings.daraja_shortcode,
+        "PhoneNumber": phone,
+        "CallBackURL": settings.daraja_callback_url,
+        "AccountReference": f"ORDER-{order_id}",
+        "TransactionDesc": f"Farmart payment for order {order_id}",
+    }
+
+    url = f"{settings.daraja_base_url}/mpesa/stkpush/v1/processrequest"
+    try:
+        response = _request(
+            "stk_push",
+            "POST",
+            url,
+            headers={"Authorization": f"Bearer {token}"},
+            json=payload,
+        )
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=502, detail=f"Daraja STK network error: {exc}") from exc
+    if response.status_code == 401:
+        # Token revoked or expired early on Safaricom's side; force a refresh next time.
+        token_cache.invalidate()
+    if response.status_code >= 400:
+        raise HTTPException(status_code=502, detail=f"Daraja STK failed: {response.text}")
+    return response.json()
+
+
+def stk_query(checkout_request_id: str) -> dict:
+    if not settings.daraja_shortcode or not settings.daraja_passkey:
+        raise HTTPException(
+            status_code=500,
+            detail="Daraja shortcode/passkey not configured",
+        )
+
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    payload = {
+        "BusinessShortCode": settings.daraja_shortcode,
+        "Password": _password(timestamp),
+        "Timestamp": timestamp,
+        "CheckoutRequestID": checkout_request_id,
+    }
+
+    url = f"{settings.daraja_base_url}/mpesa/stkpushquery/v1/query"
+    try:
+        response = _request(
+            "stk_query",
+            "POST",
+            url,
+            query_bulkhead,
+            headers={"Authorization": f"Bearer {access_token()}"},
+            json=payload,
+        )
+    except httpx.RequestError as exc:
+        raise HTTPException(status_code=502, detail=f"Daraja STK query network error: {exc}") from exc
+    if response.status_code == 401:
+        token_cache.invalidate()
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    # Daraja answers a still-processing query with an HTTP 500 carrying an errorCode body.
+    if response.status_code >= 400 and "errorCode" not in body:
+        raise HTTPException(status_code=502, detail=f"Daraja STK query failed: {response.text}")
+    return body
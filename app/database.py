@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
@@ -23,3 +25,10 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def as_naive_utc(value: datetime) -> datetime:
+    # timestamptz columns come back aware on Postgres and naive on SQLite.
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
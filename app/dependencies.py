@@ -19,8 +19,12 @@ def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Missing authentication token",
         )
+    return authenticate_token(db, credentials.credentials)
+
+
+def authenticate_token(db: Session, token: str) -> User:
     try:
-        payload = decode_access_token(credentials.credentials)
+        payload = decode_access_token(token)
         email = payload.get("sub")
         if not email:
             raise ValueError("Missing subject")
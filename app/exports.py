@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+from collections.abc import Callable, Iterator
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+
+from .database import SessionLocal
+from .schemas import ExportFormat
+
+EXPORT_BATCH_SIZE = 500
+# Rows are buffered into chunks of roughly this size to avoid one ASGI send per row.
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {ExportFormat.ndjson: "application/x-ndjson", ExportFormat.csv: "text/csv"}
+
+
+def _csv_cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def _export_rows(
+    statement: Select,
+    to_out: Callable[[object], BaseModel],
+    model: type[BaseModel],
+    fmt: ExportFormat,
+) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = list(model.model_fields)
+    if fmt == ExportFormat.csv:
+        writer.writerow(columns)
+
+    # A dedicated session lives as long as the stream; yield_per keeps only one
+    # batch of ORM objects in memory at a time.
+    with SessionLocal() as db:
+        result = db.scalars(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for record in result:
+            row = to_out(record).model_dump(mode="json")
+            if fmt == ExportFormat.csv:
+                writer.writerow([_csv_cell(row[column]) for column in columns])
+            else:
+                buffer.write(json.dumps(row, separators=(",", ":")))
+                buffer.write("\n")
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def export_response(
+    statement: Select,
+    to_out: Callable[[object], BaseModel],
+    model: type[BaseModel],
+    fmt: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    return StreamingResponse(
+        _export_rows(statement, to_out, model, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt.value}"'},
+    )
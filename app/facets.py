@@ -0,0 +1,187 @@
+import logging
+import time
+from collections import Counter
+
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import Base, SessionLocal, engine
+from .models import Listing, ListingFacetCount
+from .schemas import FacetCount, ListingFacetsResponse
+
+logger = logging.getLogger(__name__)
+
+FACETS = ("category", "breed", "location", "status")
+TOTAL = ("*", "")
+
+_last_recount: float | None = None
+
+
+def listing_filters(
+    category: str | None = None,
+    breed: str | None = None,
+    location: str | None = None,
+    status: str | None = None,
+) -> dict[str, str]:
+    filters = {"category": category, "breed": breed, "location": location, "status": status}
+    return {name: value for name, value in filters.items() if value is not None}
+
+
+def filter_listings(query, filters: dict[str, str], exclude: str | None = None):
+    for name, value in filters.items():
+        if name != exclude:
+            query = query.where(getattr(Listing, name) == value)
+    return query
+
+
+def facet_values(listing) -> dict[str, str]:
+    # Accepts a Listing or the column dict used for bulk inserts.
+    get = listing.get if isinstance(listing, dict) else lambda name: getattr(listing, name)
+    return {name: get(name) or "" for name in FACETS}
+
+
+def _deltas(values: dict[str, str], sign: int) -> Counter:
+    return Counter({TOTAL: sign, **{(name, value): sign for name, value in values.items()}})
+
+
+def _bump(db: Session, key: tuple[str, str], delta: int) -> int:
+    facet, value = key
+    return db.execute(
+        update(ListingFacetCount)
+        .where(ListingFacetCount.facet == facet, ListingFacetCount.value == value)
+        .values(count=ListingFacetCount.count + delta)
+    ).rowcount
+
+
+def apply_deltas(db: Session, deltas: Counter) -> None:
+    # Runs in the listing write's transaction. Until the worker's first count there is no total
+    # row, and that count includes this listing once it commits.
+    if not _bump(db, TOTAL, deltas.pop(TOTAL, 0)):
+        return
+    # A fixed order keeps concurrent writers from locking the same rows in opposite orders.
+    for key, delta in sorted(deltas.items()):
+        if not delta or _bump(db, key, delta):
+            continue
+        try:
+            with db.begin_nested():
+                db.add(ListingFacetCount(facet=key[0], value=key[1], count=delta))
+        except IntegrityError:
+            # Another writer created the row first.
+            _bump(db, key, delta)
+
+
+def count_listing(db: Session, listing, sign: int = 1) -> None:
+    apply_deltas(db, _deltas(facet_values(listing), sign))
+
+
+def recount_listing(db: Session, previous: dict[str, str], listing) -> None:
+    deltas = _deltas(facet_values(listing), 1)
+    deltas.subtract(_deltas(previous, 1))
+    apply_deltas(db, deltas)
+
+
+def count_new_listings(db: Session, rows: list[dict]) -> None:
+    deltas = Counter()
+    for row in rows:
+        deltas.update(_deltas(facet_values(row), 1))
+    apply_deltas(db, deltas)
+
+
+def _grouped_counts(
+    db: Session, name: str, filters: dict[str, str]
+) -> list[tuple[str | None, int]]:
+    column = getattr(Listing, name)
+    query = filter_listings(select(column, func.count()), filters, exclude=name).group_by(column)
+    return list(db.execute(query).all())
+
+
+def _merged(counts) -> Counter:
+    # NULL and "" are both "not set".
+    merged = Counter()
+    for value, count in counts:
+        merged[value or ""] += count
+    return merged
+
+
+def rebuild_facet_counts(db: Session) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        # Writers wait on the lock, so no delta lands between the count and the swap.
+        db.execute(text(f"LOCK TABLE {ListingFacetCount.__tablename__} IN EXCLUSIVE MODE"))
+    db.execute(ListingFacetCount.__table__.delete())
+    total = db.scalar(select(func.count(Listing.id)))
+    rows = [{"facet": TOTAL[0], "value": TOTAL[1], "count": total}]
+    for name in FACETS:
+        rows.extend(
+            {"facet": name, "value": value, "count": count}
+            for value, count in _merged(_grouped_counts(db, name, {})).items()
+        )
+    db.execute(insert(ListingFacetCount), rows)
+
+
+def _facet_items(counts) -> list[FacetCount]:
+    items = [
+        FacetCount(value=value or None, count=count)
+        for value, count in _merged(counts).items()
+        if count > 0
+    ]
+    return sorted(items, key=lambda item: (-item.count, item.value or ""))
+
+
+def _counted_facets(db: Session) -> ListingFacetsResponse | None:
+    rows = db.execute(
+        select(ListingFacetCount.facet, ListingFacetCount.value, ListingFacetCount.count)
+    ).all()
+    if not rows:
+        return None
+    by_facet: dict[str, list[tuple[str, int]]] = {name: [] for name in FACETS}
+    total = 0
+    for facet, value, count in rows:
+        if (facet, value) == TOTAL:
+            total = count
+        elif facet in by_facet:
+            by_facet[facet].append((value, count))
+    return ListingFacetsResponse(
+        total=total, **{name: _facet_items(counts) for name, counts in by_facet.items()}
+    )
+
+
+def listing_facets(db: Session, filters: dict[str, str]) -> ListingFacetsResponse:
+    if not filters:
+        counted = _counted_facets(db)
+        if counted is not None:
+            return counted
+        # Until the worker's first count, answer from the listings table.
+    # Each facet ignores its own filter so the UI can still offer the other values.
+    total = db.scalar(filter_listings(select(func.count(Listing.id)), filters))
+    return ListingFacetsResponse(
+        total=total,
+        **{name: _facet_items(_grouped_counts(db, name, filters)) for name in FACETS},
+    )
+
+
+def recount_if_due() -> int:
+    global _last_recount
+    now = time.monotonic()
+    if _last_recount is not None and now - _last_recount < settings.facet_recount_seconds:
+        return 0
+    _last_recount = now
+    with SessionLocal() as db:
+        rebuild_facet_counts(db)
+        db.commit()
+    # Report no work so the worker loop still idles between scheduled runs.
+    return 0
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        rebuild_facet_counts(db)
+        db.commit()
+    logger.info("Rebuilt listing facet counts")
+
+
+if __name__ == "__main__":
+    main()
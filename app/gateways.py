@@ -0,0 +1,204 @@
+import json
+import logging
+import random
+import string
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from . import daraja
+from .config import settings
+from .metrics import Histogram
+from .models import PaymentMethod, PaymentStatus
+
+logger = logging.getLogger(__name__)
+
+gateway_latency = Histogram(
+    "payment_gateway_latency_seconds",
+    "Latency of payment gateway operations",
+    ("gateway", "operation"),
+)
+
+
+def random_receipt(prefix: str = "RCP") -> str:
+    alphabet = string.ascii_uppercase + string.digits
+    return f"{prefix}{''.join(random.choice(alphabet) for _ in range(10))}"
+
+
+@dataclass
+class PaymentRequest:
+    order_id: int
+    amount: int
+    phone: str | None = None
+    card_number: str | None = None
+
+
+@dataclass
+class PaymentResult:
+    status: PaymentStatus
+    result_desc: str
+    receipt: str | None = None
+    checkout_request_id: str | None = None
+    merchant_request_id: str | None = None
+    response_code: str | None = None
+    customer_message: str | None = None
+    raw_payload: str | None = None
+
+
+@dataclass
+class StatusResult:
+    status: PaymentStatus
+    result_code: str
+    result_desc: str
+
+
+class PaymentGateway(ABC):
+    name = "base"
+    method: PaymentMethod
+    # Asynchronous gateways talk to the network and must be driven from the job worker.
+    asynchronous = False
+
+    def initiate(self, request: PaymentRequest) -> PaymentResult:
+        started = time.perf_counter()
+        try:
+            return self._initiate(request)
+        finally:
+            gateway_latency.observe(
+                time.perf_counter() - started, gateway=self.name, operation="initiate"
+            )
+
+    def query(self, reference: str) -> StatusResult | None:
+        started = time.perf_counter()
+        try:
+            return self._query(reference)
+        finally:
+            gateway_latency.observe(
+                time.perf_counter() - started, gateway=self.name, operation="query"
+            )
+
+    def initiate_many(
+        self, requests: list[PaymentRequest], *, concurrency: int | None = None
+    ) -> list[PaymentResult | Exception]:
+        # One failed push must not sink the rest, so errors come back in place of results.
+        def initiate(request: PaymentRequest) -> PaymentResult | Exception:
+            try:
+                return self.initiate(request)
+            except Exception as exc:
+                return exc
+
+        return self._map(initiate, requests, concurrency)
+
+    def query_many(
+        self, references: list[str], *, concurrency: int | None = None
+    ) -> list[StatusResult | None]:
+        return self._map(
+            self.query, references, concurrency or settings.daraja_query_max_in_flight
+        )
+
+    def _map(self, func, items: list, concurrency: int | None) -> list:
+        if not self.asynchronous or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(
+            max_workers=concurrency or settings.daraja_max_in_flight,
+            thread_name_prefix=f"{self.name}-gateway",
+        ) as executor:
+            return list(executor.map(func, items))
+
+    @abstractmethod
+    def _initiate(self, request: PaymentRequest) -> PaymentResult: ...
+
+    def _query(self, reference: str) -> StatusResult | None:
+        return None
+
+
+class MockMpesaGateway(PaymentGateway):
+    name = "mpesa_mock"
+    method = PaymentMethod.mpesa
+
+    def _initiate(self, request: PaymentRequest) -> PaymentResult:
+        phone = request.phone or ""
+        if phone.endswith("0"):
+            return PaymentResult(status=PaymentStatus.failed, result_desc="M-Pesa mock failure")
+        if phone.endswith("9"):
+            return PaymentResult(
+                status=PaymentStatus.success,
+                result_desc="M-Pesa payment confirmed",
+                receipt=random_receipt("MP"),
+            )
+        return PaymentResult(status=PaymentStatus.pending, result_desc="M-Pesa STK push sent")
+
+
+class DarajaGateway(PaymentGateway):
+    name = "daraja"
+    method = PaymentMethod.mpesa
+    asynchronous = True
+
+    def _initiate(self, request: PaymentRequest) -> PaymentResult:
+        response = daraja.stk_push(
+            phone=request.phone, amount=request.amount, order_id=request.order_id
+        )
+        response_code = str(response.get("ResponseCode", ""))
+        is_ok = response_code == "0"
+        return PaymentResult(
+            status=PaymentStatus.pending if is_ok else PaymentStatus.failed,
+            result_desc=response.get("ResponseDescription")
+            or response.get("errorMessage")
+            or "M-Pesa request sent",
+            checkout_request_id=response.get("CheckoutRequestID"),
+            merchant_request_id=response.get("MerchantRequestID"),
+            response_code=response_code,
+            customer_message=response.get("CustomerMessage")
+            or response.get("ResponseDescription"),
+            raw_payload=json.dumps(response),
+        )
+
+    def _query(self, reference: str) -> StatusResult | None:
+        try:
+            response = daraja.stk_query(reference)
+        except Exception as exc:
+            logger.warning("STK query for %s failed: %s", reference, exc)
+            return None
+        # No ResultCode means Daraja is still processing the request.
+        if not response or "ResultCode" not in response:
+            return None
+        result_code = str(response.get("ResultCode"))
+        return StatusResult(
+            status=PaymentStatus.success if result_code == "0" else PaymentStatus.failed,
+            result_code=result_code,
+            result_desc=response.get("ResultDesc") or "",
+        )
+
+
+class CardGateway(PaymentGateway):
+    name = "card"
+    method = PaymentMethod.card
+
+    def _initiate(self, request: PaymentRequest) -> PaymentResult:
+        return PaymentResult(
+            status=PaymentStatus.success,
+            result_desc="Card payment successful",
+            receipt=random_receipt("CD"),
+        )
+
+
+_gateways: dict[str, PaymentGateway] = {}
+
+
+def register_gateway(gateway: PaymentGateway) -> PaymentGateway:
+    _gateways[gateway.name] = gateway
+    return gateway
+
+
+def get_gateway(name: str) -> PaymentGateway:
+    gateway = _gateways.get(name)
+    if gateway is None:
+        raise LookupError(f"No payment gateway registered as {name}")
+    return gateway
+
+
+for _gateway in (MockMpesaGateway(), DarajaGateway(), CardGateway()):
+    register_gateway(_gateway)
+
+mpesa_gateway = get_gateway("mpesa_mock" if settings.mpesa_mock else "daraja")
+card_gateway = get_gateway("card")
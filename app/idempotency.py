@@ -0,0 +1,127 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Depends, Header, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal, as_naive_utc, get_db
+from .dependencies import get_current_user
+from .models import IdempotencyRecord, User
+
+IN_PROGRESS = "A request with this Idempotency-Key is still being processed"
+
+_last_purge = 0.0
+
+
+class IdempotencyScope:
+    # The reservation is flushed, not committed: save() commits it together with the request's
+    # writes and its response, so a failed or crashed request leaves no trace and is safe
+    # to retry, while a committed key always has a response to replay.
+    def __init__(self, db: Session, user: User, key: str | None, route: str) -> None:
+        self.db = db
+        self.user = user
+        self.key = key
+        self.route = route
+        self.record: IdempotencyRecord | None = None
+
+    def reserve(self, payload: BaseModel) -> Response | None:
+        if not self.key:
+            return None
+        request_hash = hashlib.sha256(
+            json.dumps(payload.model_dump(mode="json"), sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        now = datetime.utcnow()
+
+        for _ in range(2):
+            record = IdempotencyRecord(
+                user_id=self.user.id,
+                key=self.key,
+                route=self.route,
+                request_hash=request_hash,
+                expires_at=now + timedelta(hours=settings.idempotency_ttl_hours),
+            )
+            self.db.add(record)
+            try:
+                # A concurrent request holding the key blocks this until it commits or rolls back.
+                self.db.flush()
+            except IntegrityError:
+                self.db.rollback()
+            except OperationalError:
+                self.db.rollback()
+                # SQLite has one writer at a time and gives up after its busy timeout; the lock
+                # is usually held by the request that owns this key.
+                if self.db.get_bind().dialect.name != "sqlite":
+                    raise
+                raise HTTPException(status_code=409, detail=IN_PROGRESS) from None
+            else:
+                self.record = record
+                return None
+
+            existing = self.db.scalars(
+                select(IdempotencyRecord).where(
+                    IdempotencyRecord.user_id == self.user.id,
+                    IdempotencyRecord.key == self.key,
+                )
+            ).first()
+            if existing is None:
+                continue
+            if as_naive_utc(existing.expires_at) < now:
+                self.db.delete(existing)
+                self.db.commit()
+                continue
+            if existing.route != self.route or existing.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used for a different request",
+                )
+            if existing.status_code is None:
+                raise HTTPException(status_code=409, detail=IN_PROGRESS)
+            return Response(
+                content=existing.response_body,
+                status_code=existing.status_code,
+                media_type="application/json",
+                headers={"Idempotent-Replayed": "true"},
+            )
+
+        raise HTTPException(status_code=409, detail="Could not reserve Idempotency-Key")
+
+    def save(self, result, status_code: int = 200):
+        # Commits the request, with or without a key.
+        if self.record is not None:
+            self.record.status_code = status_code
+            self.record.response_body = json.dumps(jsonable_encoder(result))
+        self.db.commit()
+        self.record = None
+        return result
+
+
+def idempotency_scope(
+    request: Request,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key", max_length=255),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> IdempotencyScope:
+    # An error before save() leaves the session uncommitted; closing it rolls everything back.
+    route = f"{request.method} {request.url.path}"
+    return IdempotencyScope(db, current_user, idempotency_key, route)
+
+
+def purge_expired_if_due() -> int:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < 3600:
+        return 0
+    _last_purge = now
+    with SessionLocal() as db:
+        db.execute(
+            delete(IdempotencyRecord).where(IdempotencyRecord.expires_at < datetime.utcnow())
+        )
+        db.commit()
+    return 0
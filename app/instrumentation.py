@@ -0,0 +1,94 @@
+import time
+
+from sqlalchemy.engine import Engine
+
+from .metrics import Counter, Gauge, Histogram
+
+RESPONSE_SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+requests_total = Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+request_latency = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+response_size = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route template",
+    ("method", "route"),
+    buckets=RESPONSE_SIZE_BUCKETS,
+)
+
+_in_flight = 0
+Gauge("http_requests_in_flight", "HTTP requests currently being served").set_function(
+    lambda: _in_flight
+)
+
+# (method, route template, status) -> bound series, so the hot path skips label resolution.
+_series: dict[tuple[str, str, int], tuple] = {}
+
+
+def _series_for(method: str, route: str, status: int) -> tuple:
+    key = (method, route, status)
+    series = _series.get(key)
+    if series is None:
+        series = _series[key] = (
+            requests_total.labels(method=method, route=route, status=str(status)),
+            request_latency.labels(method=method, route=route),
+            response_size.labels(method=method, route=route),
+        )
+    return series
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task or body buffering per request.
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        # Only touched from the event loop thread, so no lock is needed.
+        _in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _in_flight -= 1
+            # The router stores the matched route on the scope; label by its template
+            # so /orders/1 and /orders/2 share one series.
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            count, latency, body_size = _series_for(scope["method"], template, status_code)
+            count.inc()
+            latency.observe(elapsed)
+            body_size.observe(size)
+
+
+def register_pool_gauges(engine: Engine) -> None:
+    pool = engine.pool
+    for name, documentation, attribute in (
+        ("db_pool_size", "Configured connection pool size", "size"),
+        ("db_pool_checked_out", "Connections currently checked out", "checkedout"),
+        ("db_pool_checked_in", "Idle connections in the pool", "checkedin"),
+        ("db_pool_overflow", "Connections open beyond the pool size", "overflow"),
+    ):
+        function = getattr(pool, attribute, None)
+        # Not every pool class (e.g. SQLite's SingletonThreadPool) reports every figure.
+        if callable(function):
+            Gauge(name, documentation).set_function(function)
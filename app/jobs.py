@@ -0,0 +1,230 @@
+import json
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, or_, select, update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .models import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, dict], None]
+# Takes several payloads and returns, in order, the exception for each one that failed.
+BatchJobHandler = Callable[[Session, list[dict]], list[Exception | None]]
+GiveUpHandler = Callable[[Session, dict, str], None]
+
+_handlers: dict[str, tuple[JobHandler, GiveUpHandler | None]] = {}
+_batch_handlers: dict[str, tuple[BatchJobHandler, GiveUpHandler | None, int]] = {}
+_wakeup = threading.Event()
+_in_flight: set[Future] = set()
+
+
+def job_handler(kind: str, *, on_give_up: GiveUpHandler | None = None):
+    def register(func: JobHandler) -> JobHandler:
+        _handlers[kind] = (func, on_give_up)
+        return func
+
+    return register
+
+
+def batch_job_handler(kind: str, *, max_batch: int, on_give_up: GiveUpHandler | None = None):
+    # Up to max_batch due jobs of this kind share one executor slot and one handler call.
+    def register(func: BatchJobHandler) -> BatchJobHandler:
+        _batch_handlers[kind] = (func, on_give_up, max_batch)
+        return func
+
+    return register
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict,
+    *,
+    max_attempts: int | None = None,
+    delay_seconds: float = 0,
+) -> Job:
+    # The caller commits, so the job becomes visible atomically with its business rows.
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        status=JobStatus.queued,
+        max_attempts=max_attempts or settings.job_max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_seconds),
+    )
+    db.add(job)
+    wake_on_commit(db)
+    return job
+
+
+def wake_workers() -> None:
+    _wakeup.set()
+
+
+def wake_on_commit(db: Session) -> None:
+    # Workers are woken once the rows they should pick up are visible.
+    db.info["wake_workers"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_after_commit(session: Session) -> None:
+    if session.info.pop("wake_workers", False):
+        wake_workers()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_wake(session: Session) -> None:
+    session.info.pop("wake_workers", None)
+
+
+def wait_for_work(timeout: float) -> None:
+    _wakeup.wait(timeout)
+    _wakeup.clear()
+
+
+def claim_jobs(db: Session, limit: int, kind: str | None = None) -> list[int]:
+    now = datetime.utcnow()
+    lease_expired = now - timedelta(seconds=settings.job_lease_seconds)
+    query = (
+        select(Job.id)
+        .where(
+            or_(
+                (Job.status == JobStatus.queued) & (Job.run_after <= now),
+                (Job.status == JobStatus.running) & (Job.locked_at < lease_expired),
+            )
+        )
+        .order_by(Job.run_after)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if kind is not None:
+        query = query.where(Job.kind == kind)
+    candidates = db.scalars(query).all()
+
+    claimed = []
+    for job_id in candidates:
+        # Conditional update so two workers on a backend without SKIP LOCKED never share a job.
+        result = db.execute(
+            update(Job)
+            .where(
+                Job.id == job_id,
+                or_(
+                    Job.status == JobStatus.queued,
+                    (Job.status == JobStatus.running) & (Job.locked_at < lease_expired),
+                ),
+            )
+            .values(status=JobStatus.running, locked_at=now, attempts=Job.attempts + 1)
+        )
+        if result.rowcount:
+            claimed.append(job_id)
+    db.commit()
+    return claimed
+
+
+def _fail(db: Session, job: Job, payload: dict, exc: Exception, on_give_up) -> None:
+    error = str(getattr(exc, "detail", None) or exc)
+    job.last_error = error
+    job.locked_at = None
+    if job.attempts >= job.max_attempts:
+        job.status = JobStatus.failed
+        logger.warning("Job %s (%s) gave up: %s", job.id, job.kind, error)
+        if on_give_up:
+            on_give_up(db, payload, error)
+    else:
+        job.status = JobStatus.queued
+        job.run_after = datetime.utcnow() + timedelta(
+            seconds=settings.job_retry_backoff_seconds * 2 ** (job.attempts - 1)
+        )
+
+
+def _succeed(job: Job) -> None:
+    job.status = JobStatus.done
+    job.locked_at = None
+    job.last_error = None
+
+
+def run_job(job_id: int) -> None:
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        if not job:
+            return
+        payload = json.loads(job.payload or "{}")
+        handler, on_give_up = _handlers.get(job.kind, (None, None))
+        if handler is None:
+            job.status = JobStatus.failed
+            job.last_error = f"No handler registered for {job.kind}"
+            db.commit()
+            return
+
+        try:
+            handler(db, payload)
+        except Exception as exc:
+            db.rollback()
+            _fail(db, db.get(Job, job_id), payload, exc, on_give_up)
+            db.commit()
+            return
+
+        _succeed(job)
+        db.commit()
+
+
+def run_job_batch(job_ids: list[int]) -> None:
+    with SessionLocal() as db:
+        batch = [job for job in (db.get(Job, job_id) for job_id in job_ids) if job]
+        if not batch:
+            return
+        handler, on_give_up, _ = _batch_handlers[batch[0].kind]
+        payloads = [json.loads(job.payload or "{}") for job in batch]
+        try:
+            errors = handler(db, payloads)
+        except Exception as exc:
+            # Nothing from the batch is kept; every job retries.
+            db.rollback()
+            batch = [db.get(Job, job.id) for job in batch]
+            errors = [exc] * len(batch)
+        # Successful payloads commit together with the bookkeeping for the failed ones.
+        for job, payload, error in zip(batch, payloads, errors):
+            if error is None:
+                _succeed(job)
+            else:
+                _fail(db, job, payload, error, on_give_up)
+        db.commit()
+
+
+def _job_finished(future: Future) -> None:
+    if future.exception() is not None:
+        logger.error("Job runner crashed", exc_info=future.exception())
+    # A slot is free again; let the loop claim the next job without waiting for the batch.
+    wake_workers()
+
+
+def run_due_jobs(executor: ThreadPoolExecutor, limit: int) -> int:
+    _in_flight.difference_update([future for future in _in_flight if future.done()])
+    free = limit - len(_in_flight)
+    if free <= 0:
+        return 0
+    with SessionLocal() as db:
+        job_ids = claim_jobs(db, free)
+        kinds = dict(db.execute(select(Job.id, Job.kind).where(Job.id.in_(job_ids))).all())
+        claimed = len(job_ids)
+        runs = []
+        for job_id in job_ids:
+            batch = _batch_handlers.get(kinds[job_id])
+            if batch is None:
+                runs.append((run_job, job_id))
+            else:
+                # Top the slot up with more due jobs of the same kind.
+                more = claim_jobs(db, batch[2] - 1, kind=kinds[job_id])
+                runs.append((run_job_batch, [job_id, *more]))
+                claimed += len(more)
+    for func, argument in runs:
+        future = executor.submit(func, argument)
+        _in_flight.add(future)
+        future.add_done_callback(_job_finished)
+    return claimed
@@ -1,16 +1,52 @@
-from fastapi import FastAPI
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
+from . import cache, daraja, jobs
+from .compression import CompressionMiddleware
 from .config import settings
 from .database import Base, SessionLocal, engine
+from .instrumentation import MetricsMiddleware, register_pool_gauges
+from .media import MediaFiles
+from .metrics import REGISTRY
+from .notifications import bus
+from .querylog import QueryStatsMiddleware, install_query_hooks
 from .routers.auth import router as auth_router
 from .routers.listings import router as listings_router
+from .routers.market import router as market_router
 from .routers.orders import router as orders_router
 from .routers.payments import router as payments_router
 from .seed import seed_demo_users
+from .worker import start_embedded_worker
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    os.makedirs(settings.media_root, exist_ok=True)
+    stop_worker = start_embedded_worker() if settings.job_worker_embedded else None
+    if not settings.job_worker_embedded and not bus.backend.shared:
+        # Bus events are published by the outbox relay in the job worker, so a separate worker
+        # process can only reach these subscribers through a backend that spans processes.
+        logger.warning(
+            "JOB_WORKER_EMBEDDED is off but the notification bus is process-local; "
+            "live order and payment updates need NOTIFICATION_BACKEND=postgres"
+        )
+    bus.start()
+    cache.start()
+    yield
+    cache.stop()
+    bus.stop()
+    if stop_worker:
+        stop_worker.set()
+        jobs.wake_workers()
 
 
-app = FastAPI(title="Farmart API", version="1.0.0")
+app = FastAPI(title="Farmart API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +56,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+
+install_query_hooks(engine)
+if settings.query_stats_enabled:
+    app.add_middleware(QueryStatsMiddleware)
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+    register_pool_gauges(engine)
+
 try:
     Base.metadata.create_all(bind=engine)
     with SessionLocal() as seed_db:
@@ -29,9 +76,18 @@ except Exception as e:
 
 app.include_router(auth_router)
 app.include_router(listings_router)
+app.include_router(market_router)
 app.include_router(orders_router)
 app.include_router(payments_router)
 
+# Uploaded files are content addressed, so they are served with immutable cache headers.
+# The directory is created at startup, not on import.
+app.mount(
+    settings.media_url_prefix,
+    MediaFiles(directory=settings.media_root, check_dir=False),
+    name="media",
+)
+
 
 @app.get("/")
 def root():
@@ -41,3 +97,13 @@ def root():
 @app.get("/health")
 def health():
     return {"ok": True}
+
+
+@app.get("/health/daraja")
+def daraja_health():
+    return daraja.resilience_snapshot()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(REGISTRY.exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,340 @@
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from itertools import product
+
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import Base, SessionLocal, engine
+from .models import Listing, ListingPricePoint, MarketPriceStat, MarketStatDirty
+
+logger = logging.getLogger(__name__)
+
+ANY = "*"
+UNKNOWN = "Unknown"
+DIMENSIONS = ("category", "breed", "location")
+GLOBAL = (ANY, ANY, ANY)
+BATCH_SIZE = 5000
+CENTS = Decimal("0.01")
+_PRICE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+_last_refresh = 0.0
+_last_global = 0.0
+_global_stale = False
+_checked_backfill = False
+
+
+def normalize_dimension(value: str | None) -> str:
+    cleaned = " ".join((value or "").split())
+    return cleaned.title() if cleaned else UNKNOWN
+
+
+def numeric_price(value: str | None) -> Decimal | None:
+    # The first number only, so a range such as "KSh 45,000 - 50,000" prices at 45000.
+    match = _PRICE.search(value or "")
+    if not match:
+        return None
+    price = Decimal(match.group().replace(",", ""))
+    # Typos and placeholder prices would drag min/max and the quartiles for the whole market.
+    if not settings.market_price_min <= price <= settings.market_price_max:
+        return None
+    return price
+
+
+def _group(category: str | None, breed: str | None, location: str | None) -> tuple[str, ...]:
+    return (
+        normalize_dimension(category),
+        normalize_dimension(breed),
+        normalize_dimension(location),
+    )
+
+
+def _rollups(group: tuple[str, ...]) -> set[tuple[str, ...]]:
+    # The group itself plus every combination with some dimensions widened to ANY.
+    return {
+        tuple(value if keep else ANY for value, keep in zip(group, mask))
+        for mask in product((True, False), repeat=len(DIMENSIONS))
+    }
+
+
+def _mark_dirty(db: Session, groups: set[tuple[str, ...]]) -> None:
+    if groups:
+        db.execute(
+            insert(MarketStatDirty),
+            [dict(zip(DIMENSIONS, group)) for group in groups],
+        )
+
+
+def track_listing(db: Session, listing: Listing) -> None:
+    # Runs in the listing's own transaction; the refresher folds the change into the stats.
+    group = _group(listing.category, listing.breed, listing.location)
+    price = numeric_price(listing.price)
+    point = db.get(ListingPricePoint, listing.id)
+    dirty = {group}
+    if point is not None:
+        dirty.add((point.category, point.breed, point.location))
+    if price is None:
+        if point is not None:
+            db.delete(point)
+    elif point is None:
+        db.add(
+            ListingPricePoint(listing_id=listing.id, **dict(zip(DIMENSIONS, group)), price=price)
+        )
+    else:
+        point.category, point.breed, point.location = group
+        point.price = price
+    _mark_dirty(db, dirty)
+
+
+def untrack_listing(db: Session, listing_id: int) -> None:
+    point = db.get(ListingPricePoint, listing_id)
+    if point is not None:
+        _mark_dirty(db, {(point.category, point.breed, point.location)})
+        db.delete(point)
+
+
+def _price_points(rows) -> list[dict]:
+    points = []
+    for row in rows:
+        price = numeric_price(row.price)
+        if price is not None:
+            group = _group(row.category, row.breed, row.location)
+            points.append({"listing_id": row.id, **dict(zip(DIMENSIONS, group)), "price": price})
+    return points
+
+
+def _listing_rows(db: Session, listing_ids: list[int] | None = None):
+    query = select(Listing.id, Listing.category, Listing.breed, Listing.location, Listing.price)
+    if listing_ids is not None:
+        query = query.where(Listing.id.in_(listing_ids))
+    return db.execute(query).all()
+
+
+def track_new_listings(db: Session, listing_ids: list[int]) -> None:
+    points = _price_points(_listing_rows(db, listing_ids))
+    for start in range(0, len(points), BATCH_SIZE):
+        db.execute(insert(ListingPricePoint), points[start : start + BATCH_SIZE])
+    _mark_dirty(db, {tuple(point[name] for name in DIMENSIONS) for point in points})
+
+
+def _percentile(prices: list[Decimal], fraction: float) -> Decimal:
+    # Linear interpolation between the closest ranks, matching percentile_cont.
+    position = (len(prices) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(prices) - 1)
+    return prices[lower] + (prices[upper] - prices[lower]) * Decimal(str(position - lower))
+
+
+def _stat_values(prices: list[Decimal]) -> dict:
+    return {
+        "count": len(prices),
+        "min_price": prices[0],
+        "p25_price": _percentile(prices, 0.25),
+        "median_price": _percentile(prices, 0.5),
+        "p75_price": _percentile(prices, 0.75),
+        "max_price": prices[-1],
+    }
+
+
+def _cents(value) -> Decimal:
+    return Decimal(str(value)).quantize(CENTS)
+
+
+def _aggregate(
+    db: Session, mask: tuple[bool, ...], keys: set[tuple[str, ...]] | None = None
+) -> dict[tuple[str, ...], dict]:
+    # Stats for every group at one rollup level, or only for `keys` at that level.
+    columns = [getattr(ListingPricePoint, name) for name, keep in zip(DIMENSIONS, mask) if keep]
+    price = ListingPricePoint.price
+
+    def key_of(values) -> tuple[str, ...]:
+        values = iter(values)
+        return tuple(next(values) if keep else ANY for keep in mask)
+
+    def restrict(query):
+        if keys is None or not columns:
+            return query
+        wanted = [tuple(value for value in key if value != ANY) for key in keys]
+        if len(columns) == 1:
+            return query.where(columns[0].in_([values[0] for values in wanted]))
+        return query.where(tuple_(*columns).in_(wanted))
+
+    if db.get_bind().dialect.name == "postgresql":
+        query = select(
+            *columns,
+            func.count(),
+            func.min(price),
+            func.percentile_cont(0.25).within_group(price),
+            func.percentile_cont(0.5).within_group(price),
+            func.percentile_cont(0.75).within_group(price),
+            func.max(price),
+        ).group_by(*columns)
+        stats = {}
+        for row in db.execute(restrict(query)):
+            count, low, p25, median, p75, high = row[len(columns) :]
+            if count:
+                stats[key_of(row[: len(columns)])] = {
+                    "count": count,
+                    "min_price": low,
+                    "p25_price": _cents(p25),
+                    "median_price": _cents(median),
+                    "p75_price": _cents(p75),
+                    "max_price": high,
+                }
+        return stats
+
+    # SQLite has no percentile_cont; walk the prices in index order instead.
+    grouped: dict[tuple[str, ...], list[Decimal]] = defaultdict(list)
+    for row in db.execute(restrict(select(*columns, price).order_by(*columns, price))):
+        grouped[key_of(row[:-1])].append(row[-1])
+    return {key: _stat_values(prices) for key, prices in grouped.items()}
+
+
+def _mask(key: tuple[str, ...]) -> tuple[bool, ...]:
+    return tuple(value != ANY for value in key)
+
+
+def _recompute(db: Session, keys: set[tuple[str, ...]], now: datetime) -> None:
+    by_mask: dict[tuple[bool, ...], set[tuple[str, ...]]] = defaultdict(set)
+    for key in keys:
+        by_mask[_mask(key)].add(key)
+    # One grouped query per rollup level, each reading only the groups that changed.
+    fresh = {}
+    for mask, mask_keys in by_mask.items():
+        fresh.update(_aggregate(db, mask, mask_keys))
+
+    stat_columns = [getattr(MarketPriceStat, name) for name in DIMENSIONS]
+    existing = {
+        (stat.category, stat.breed, stat.location): stat
+        for stat in db.scalars(select(MarketPriceStat).where(tuple_(*stat_columns).in_(keys)))
+    }
+    for key in sorted(keys):
+        values = fresh.get(key)
+        stat = existing.get(key)
+        if values is None:
+            if stat is not None:
+                db.delete(stat)
+        elif stat is None:
+            db.add(MarketPriceStat(**dict(zip(DIMENSIONS, key)), refreshed_at=now, **values))
+        else:
+            for name, value in values.items():
+                setattr(stat, name, value)
+            stat.refreshed_at = now
+
+
+def _global_due() -> bool:
+    return time.monotonic() - _last_global >= settings.market_stats_rollup_seconds
+
+
+def refresh_dirty_groups(limit: int) -> int:
+    global _last_global, _global_stale
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(
+                MarketStatDirty.id,
+                MarketStatDirty.category,
+                MarketStatDirty.breed,
+                MarketStatDirty.location,
+            )
+            .order_by(MarketStatDirty.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        keys = set()
+        for row in rows:
+            keys |= _rollups((row.category, row.breed, row.location))
+        # The market-wide row reads every price point, so it refreshes on a slower clock.
+        if GLOBAL in keys or _global_stale:
+            keys.discard(GLOBAL)
+            _global_stale = True
+            if _global_due():
+                keys.add(GLOBAL)
+        if not keys:
+            return 0
+        _recompute(db, keys, datetime.utcnow())
+        if rows:
+            db.execute(
+                delete(MarketStatDirty).where(MarketStatDirty.id.in_([row.id for row in rows]))
+            )
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker created the same aggregate first; the marks stay for the next run.
+            db.rollback()
+            return 0
+        if GLOBAL in keys:
+            _last_global = time.monotonic()
+            _global_stale = False
+        return len(rows)
+
+
+def rebuild_market_stats() -> int:
+    global _last_global, _global_stale
+    with SessionLocal() as db:
+        db.execute(delete(MarketStatDirty))
+        db.execute(delete(MarketPriceStat))
+        db.execute(delete(ListingPricePoint))
+        points = _price_points(_listing_rows(db))
+        for start in range(0, len(points), BATCH_SIZE):
+            db.execute(insert(ListingPricePoint), points[start : start + BATCH_SIZE])
+
+        now = datetime.utcnow()
+        stats = [
+            {**dict(zip(DIMENSIONS, key)), **values, "refreshed_at": now}
+            for mask in product((True, False), repeat=len(DIMENSIONS))
+            for key, values in _aggregate(db, mask).items()
+        ]
+        for start in range(0, len(stats), BATCH_SIZE):
+            db.execute(insert(MarketPriceStat), stats[start : start + BATCH_SIZE])
+        db.commit()
+    _last_global = time.monotonic()
+    _global_stale = False
+    return len(points)
+
+
+def _ensure_indexes() -> None:
+    # create_all skips indexes added after the table first existed.
+    for index in ListingPricePoint.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+
+def _needs_backfill() -> bool:
+    with SessionLocal() as db:
+        has_points = db.scalar(select(ListingPricePoint.listing_id).limit(1)) is not None
+        return not has_points and db.scalar(select(Listing.id).limit(1)) is not None
+
+
+def refresh_if_due() -> int:
+    global _last_refresh, _checked_backfill
+    now = time.monotonic()
+    if now - _last_refresh < settings.market_stats_refresh_seconds:
+        return 0
+    _last_refresh = now
+    if not _checked_backfill:
+        _checked_backfill = True
+        _ensure_indexes()
+        # Listings created before price tracking existed are indexed in one pass.
+        if _needs_backfill():
+            return rebuild_market_stats()
+    refreshed = refresh_dirty_groups(settings.market_stats_batch_size)
+    if refreshed >= settings.market_stats_batch_size:
+        # A backlog remains; skip the wait so it drains without idling.
+        _last_refresh = 0.0
+    return refreshed
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    _ensure_indexes()
+    logger.info("Rebuilt market stats from %s priced listings", rebuild_market_stats())
+
+
+if __name__ == "__main__":
+    main()
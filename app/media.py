@@ -0,0 +1,122 @@
+import hashlib
+import io
+import logging
+import os
+import tempfile
+
+from sqlalchemy.orm import Session
+from starlette.staticfiles import StaticFiles
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; originals are still stored and served without it.
+    Image = None
+
+from . import jobs
+from .cache import listing_cache
+from .config import settings
+from .models import Listing
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS_JOB = "media.image_variants"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Variant name -> longest edge in pixels.
+VARIANT_SIZES = {"full": 1600, "thumb": 400}
+
+
+def detect_image_extension(data: bytes) -> str | None:
+    # Trust the bytes, not the client's Content-Type.
+    if data.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if data[:6] in {b"GIF87a", b"GIF89a"}:
+        return ".gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(handle, "wb") as temp_file:
+        temp_file.write(data)
+    os.replace(temp_path, path)
+
+
+def _original_path(digest: str, extension: str) -> str:
+    return f"originals/{digest[:2]}/{digest}{extension}"
+
+
+def _variant_path(digest: str, name: str) -> str:
+    return f"variants/{digest[:2]}/{digest}/{name}.webp"
+
+
+def media_url(relative_path: str) -> str:
+    return f"{settings.media_url_prefix}/{relative_path}"
+
+
+def store_original(data: bytes, extension: str) -> tuple[str, str]:
+    digest = hashlib.sha256(data).hexdigest()
+    relative_path = _original_path(digest, extension)
+    path = os.path.join(settings.media_root, relative_path)
+    # Content addressed: identical uploads share one file and never change once written.
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    return digest, relative_path
+
+
+def thumbnail_url(image_url: str | None) -> str | None:
+    # Only listings whose variants have been generated point at a full.webp.
+    if not image_url or not image_url.startswith(f"{settings.media_url_prefix}/variants/"):
+        return None
+    if not image_url.endswith("/full.webp"):
+        return None
+    return image_url.removesuffix("/full.webp") + "/thumb.webp"
+
+
+def queue_image_variants(db: Session, *, listing_id: int, digest: str, extension: str) -> None:
+    jobs.enqueue(
+        db,
+        IMAGE_VARIANTS_JOB,
+        {"listing_id": listing_id, "digest": digest, "extension": extension},
+    )
+
+
+@jobs.job_handler(IMAGE_VARIANTS_JOB)
+def generate_image_variants(db: Session, payload: dict) -> None:
+    if Image is None:
+        logger.warning("Pillow is not installed; skipping image variants for %s", payload["digest"])
+        return
+
+    digest = payload["digest"]
+    original = os.path.join(settings.media_root, _original_path(digest, payload["extension"]))
+    with Image.open(original) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if image.mode in {"RGBA", "LA", "P"} else "RGB")
+        for name, size in VARIANT_SIZES.items():
+            path = os.path.join(settings.media_root, _variant_path(digest, name))
+            if os.path.exists(path):
+                continue
+            variant = image.copy()
+            variant.thumbnail((size, size))
+            buffer = io.BytesIO()
+            variant.save(buffer, "WEBP", quality=settings.image_webp_quality, method=4)
+            _write_atomic(path, buffer.getvalue())
+
+    listing = db.get(Listing, payload["listing_id"])
+    # Only swap in the variant if the listing still shows this upload.
+    if listing and listing.image_url == media_url(_original_path(digest, payload["extension"])):
+        listing.image_url = media_url(_variant_path(digest, "full"))
+        db.commit()
+        listing_cache.invalidate(listing.id)
+
+
+class MediaFiles(StaticFiles):
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in {200, 304}:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
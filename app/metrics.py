@@ -0,0 +1,203 @@
+import threading
+from bisect import bisect_left
+from collections.abc import Callable
+from itertools import accumulate
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> list[tuple[dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self._inc_key(self._key(labels), amount)
+
+    def labels(self, **labels: str) -> "_BoundCounter":
+        return _BoundCounter(self, self._key(labels))
+
+    def _inc_key(self, key: tuple[str, ...], amount: float) -> None:
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class _BoundCounter:
+    # Label key resolved once, for hot paths that hit the same series repeatedly.
+    def __init__(self, counter: Counter, key: tuple[str, ...]) -> None:
+        self._counter = counter
+        self._key = key
+
+    def inc(self, amount: float = 1) -> None:
+        self._counter._inc_key(self._key, amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float | dict[tuple[str, ...], float]]) -> None:
+        # A labelled gauge's function returns every series at once: label values -> value.
+        self._function = function
+
+    def samples(self) -> list[tuple[dict[str, str], float]]:
+        if self._function is not None:
+            value = self._function()
+            if self.labelnames:
+                return [
+                    (dict(zip(self.labelnames, key)), float(series))
+                    for key, series in value.items()
+                ]
+            return [({}, float(value))]
+        return super().samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        self.labels(**labels).observe(value)
+
+    def labels(self, **labels: str) -> "_BoundHistogram":
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+        return _BoundHistogram(self, series)
+
+    def series(self) -> list[tuple[dict[str, str], list[float], float, float]]:
+        # Returns (labels, cumulative bucket counts incl. +Inf, count, sum).
+        with self._lock:
+            items = [(key, list(values)) for key, values in self._series.items()]
+        result = []
+        for key, values in items:
+            cumulative = list(accumulate(values[:-1]))
+            result.append((dict(zip(self.labelnames, key)), cumulative, cumulative[-1], values[-1]))
+        return result
+
+    def samples(self) -> list[tuple[dict[str, str], float]]:
+        return [(labels, count) for labels, _, count, _ in self.series()]
+
+
+class _BoundHistogram:
+    def __init__(self, histogram: Histogram, series: list[float]) -> None:
+        self._buckets = histogram.buckets
+        self._lock = histogram._lock
+        self._series = series
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self._series[index] += 1
+            self._series[-1] += value
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def metrics(self) -> list[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def exposition(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                for labels, cumulative, count, total in metric.series():
+                    bounds = [*(_format_value(b) for b in metric.buckets), "+Inf"]
+                    for bound, value in zip(bounds, cumulative):
+                        lines.append(
+                            f"{metric.name}_bucket{_format_labels({**labels, 'le': bound})} "
+                            f"{_format_value(value)}"
+                        )
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(
+                        f"{metric.name}_count{_format_labels(labels)} {_format_value(count)}"
+                    )
+                continue
+            for labels, value in metric.samples():
+                lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self, prefix: str = "") -> dict:
+        return {
+            metric.name: [
+                {"labels": labels, "value": value} for labels, value in metric.samples()
+            ]
+            for metric in self.metrics()
+            if metric.name.startswith(prefix)
+        }
+
+
+REGISTRY = Registry()
@@ -2,7 +2,7 @@ from datetime import datetime
 from decimal import Decimal
 from enum import Enum
 
-from sqlalchemy import DateTime, Enum as SqlEnum, ForeignKey, Numeric, String, Text
+from sqlalchemy import DateTime, Enum as SqlEnum, ForeignKey, Index, Integer, Numeric, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -31,6 +31,13 @@ class PaymentMethod(str, Enum):
     card = "CARD"
 
 
+class JobStatus(str, Enum):
+    queued = "QUEUED"
+    running = "RUNNING"
+    done = "DONE"
+    failed = "FAILED"
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -135,6 +142,9 @@ class OrderItem(Base):
 
 class MpesaTransaction(Base):
     __tablename__ = "mpesa_transactions"
+    __table_args__ = (
+        Index("ix_mpesa_transactions_status_created_at", "status", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), nullable=False, index=True)
@@ -155,3 +165,134 @@ class MpesaTransaction(Base):
     )
 
     order: Mapped[Order] = relationship(back_populates="mpesa_transactions")
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (Index("ix_jobs_status_run_after", "status", "run_after"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    kind: Mapped[str] = mapped_column(String(80), nullable=False)
+    payload: Mapped[str] = mapped_column(Text(), nullable=False, default="{}")
+    status: Mapped[JobStatus] = mapped_column(
+        SqlEnum(JobStatus), nullable=False, default=JobStatus.queued
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=3)
+    run_after: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    locked_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text(), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class MpesaCallbackInbox(Base):
+    __tablename__ = "mpesa_callback_inbox"
+    __table_args__ = (Index("ix_mpesa_callback_inbox_processed_at", "processed_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    checkout_request_id: Mapped[str] = mapped_column(String(120), nullable=False, unique=True)
+    payload: Mapped[str] = mapped_column(Text(), nullable=False)
+    outcome: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_user_key", "user_id", "key", unique=True),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    route: Mapped[str] = mapped_column(String(255), nullable=False)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    response_body: Mapped[str | None] = mapped_column(Text(), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (Index("ix_outbox_events_pending", "dispatched_at", "available_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(80), nullable=False)
+    order_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    payload: Mapped[str] = mapped_column(Text(), nullable=False, default="{}")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text(), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+    dispatched_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class ListingPricePoint(Base):
+    __tablename__ = "listing_price_points"
+    __table_args__ = (
+        # One index per leading dimension so every rollup level filters and sorts by index.
+        Index("ix_listing_price_points_group", "category", "breed", "location", "price"),
+        Index("ix_listing_price_points_breed", "breed", "location", "price"),
+        Index("ix_listing_price_points_location", "location", "price"),
+        Index("ix_listing_price_points_category_location", "category", "location", "price"),
+    )
+
+    listing_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    category: Mapped[str] = mapped_column(String(120), nullable=False)
+    breed: Mapped[str] = mapped_column(String(120), nullable=False)
+    location: Mapped[str] = mapped_column(String(120), nullable=False)
+    price: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+class MarketPriceStat(Base):
+    __tablename__ = "market_price_stats"
+    __table_args__ = (
+        Index("ix_market_price_stats_group", "category", "breed", "location", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # "*" in a dimension means the row aggregates every value of it.
+    category: Mapped[str] = mapped_column(String(120), nullable=False)
+    breed: Mapped[str] = mapped_column(String(120), nullable=False)
+    location: Mapped[str] = mapped_column(String(120), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    min_price: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    p25_price: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    median_price: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    p75_price: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    max_price: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class MarketStatDirty(Base):
+    __tablename__ = "market_stat_dirty"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    category: Mapped[str] = mapped_column(String(120), nullable=False)
+    breed: Mapped[str] = mapped_column(String(120), nullable=False)
+    location: Mapped[str] = mapped_column(String(120), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class ListingFacetCount(Base):
+    __tablename__ = "listing_facet_counts"
+    __table_args__ = (
+        Index("ix_listing_facet_counts_value", "facet", "value", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # A missing value is stored as ""; facet "*" holds the total listing count.
+    facet: Mapped[str] = mapped_column(String(20), nullable=False)
+    value: Mapped[str] = mapped_column(String(120), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import uuid
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from .config import settings
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "farmart_events"
+
+
+class Subscription:
+    def __init__(self, topic: str, loop: asyncio.AbstractEventLoop) -> None:
+        self.topic = topic
+        self.loop = loop
+        self.queue: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def get(self, timeout: float) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBackend:
+    # Single process: events only ever reach subscribers of this process.
+    shared = False
+
+    def publish(self, topic: str, event: dict) -> None:
+        pass
+
+    def start(self, deliver) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class PostgresNotifyBackend:
+    # NOTIFY payloads are capped at 8000 bytes, which is why bus events carry ids only.
+    shared = True
+    max_payload_bytes = 7900
+
+    def __init__(self, engine, channel: str = NOTIFY_CHANNEL) -> None:
+        self.engine = engine
+        self.channel = channel
+        # Events this process published were already delivered locally; skip their echo.
+        self.origin = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._outgoing: queue.SimpleQueue[tuple[str, dict] | None] = queue.SimpleQueue()
+        self._sender: threading.Thread | None = None
+        self._sender_lock = threading.Lock()
+
+    def publish(self, topic: str, event: dict) -> None:
+        # Sent from a background thread so publishers never wait on the database.
+        self._outgoing.put((topic, event))
+        with self._sender_lock:
+            if self._sender is None or not self._sender.is_alive():
+                self._sender = threading.Thread(
+                    target=self._send_loop, name="notify-sender", daemon=True
+                )
+                self._sender.start()
+
+    def _send_loop(self) -> None:
+        while True:
+            item = self._outgoing.get()
+            if item is None:
+                return
+            batch = [item]
+            # Everything queued meanwhile goes out in the same transaction.
+            while True:
+                try:
+                    item = self._outgoing.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._send(batch)
+                    return
+                batch.append(item)
+            self._send(batch)
+
+    def _encode(self, events: list[dict]) -> str:
+        # json.dumps escapes non-ASCII, so the string length is the byte length.
+        return json.dumps({"origin": self.origin, "events": events})
+
+    def _payloads(self, batch: list[tuple[str, dict]]) -> list[str]:
+        # As few NOTIFYs as fit under the payload cap.
+        payloads = []
+        events: list[dict] = []
+        for topic, event in batch:
+            events.append({"topic": topic, "event": event})
+            if len(events) > 1 and len(self._encode(events)) > self.max_payload_bytes:
+                payloads.append(self._encode(events[:-1]))
+                events = events[-1:]
+        if events:
+            payloads.append(self._encode(events))
+        return payloads
+
+    def _send(self, batch: list[tuple[str, dict]]) -> None:
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    [
+                        {"channel": self.channel, "payload": payload}
+                        for payload in self._payloads(batch)
+                    ],
+                )
+        except Exception:
+            logger.exception("Could not forward %s events to other workers", len(batch))
+
+    def start(self, deliver) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._listen, args=(deliver,), name="notify-listener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        # Flush what is still queued before the process exits.
+        with self._sender_lock:
+            sender, self._sender = self._sender, None
+        if sender is not None:
+            self._outgoing.put(None)
+            sender.join(timeout=5)
+
+    def _listen(self, deliver) -> None:
+        while not self._stop.is_set():
+            raw = None
+            try:
+                # A dedicated connection kept out of the pool: LISTEN is per session.
+                raw = self.engine.raw_connection()
+                raw.detach()
+                connection = raw.driver_connection
+                connection.autocommit = True
+                connection.execute(f"LISTEN {self.channel}")
+                while not self._stop.is_set():
+                    for notify in connection.notifies(timeout=1.0):
+                        message = json.loads(notify.payload)
+                        if message.get("origin") == self.origin:
+                            continue
+                        for item in message["events"]:
+                            deliver(item["topic"], item["event"])
+            except Exception:
+                logger.exception("Notification listener failed; reconnecting")
+                self._stop.wait(2.0)
+            finally:
+                if raw is not None:
+                    raw.close()
+
+
+def build_backend():
+    name = settings.notification_backend
+    if name == "auto":
+        name = "postgres" if settings.database_url.startswith("postgresql") else "local"
+    if name == "postgres":
+        return PostgresNotifyBackend(engine)
+    return LocalBackend()
+
+
+class NotificationBus:
+    def __init__(self, backend=None) -> None:
+        self._subscriptions: dict[str, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.backend = backend or LocalBackend()
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(topic, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.topic)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[subscription.topic]
+
+    def publish(self, topic: str, event: dict) -> None:
+        self.deliver(topic, event)
+        self.backend.publish(topic, event)
+
+    def deliver(self, topic: str, event: dict) -> None:
+        # Publishers run in worker threads; hand the event to each subscriber's own loop.
+        with self._lock:
+            subscribers = list(self._subscriptions.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down.
+                self.unsubscribe(subscription)
+
+    def start(self) -> None:
+        self.backend.start(self.deliver)
+
+    def stop(self) -> None:
+        self.backend.stop()
+
+
+bus = NotificationBus(build_backend())
+
+
+def order_payment_topic(order_id: int) -> str:
+    return f"order:{order_id}:payment"
+
+
+def farmer_orders_topic(farmer_id: int) -> str:
+    return f"farmer:{farmer_id}:orders"
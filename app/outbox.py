@@ -0,0 +1,129 @@
+import json
+import logging
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from . import jobs
+from .config import settings
+from .database import SessionLocal, as_naive_utc
+from .metrics import Counter, Histogram
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = "order.created"
+ORDER_STATUS_CHANGED = "order.status_changed"
+PAYMENT_STATUS_CHANGED = "payment.status_changed"
+
+Consumer = Callable[[dict], None]
+
+_consumers: dict[str, list[Consumer]] = defaultdict(list)
+_last_purge = 0.0
+
+events_dispatched = Counter(
+    "outbox_events_dispatched_total", "Outbox events relayed to consumers", ("kind", "outcome")
+)
+dispatch_lag = Histogram(
+    "outbox_dispatch_lag_seconds", "Time from an outbox event's commit to its dispatch"
+)
+
+
+def consumer(*kinds: str):
+    # Delivery is at least once: a relay that dies before committing redelivers the batch.
+    def register(func: Consumer) -> Consumer:
+        for kind in kinds:
+            _consumers[kind].append(func)
+        return func
+
+    return register
+
+
+def record(db: Session, kind: str, payload: dict, *, order_id: int | None = None) -> OutboxEvent:
+    # The caller commits, so the event exists exactly when the state change it describes does.
+    outbox_event = OutboxEvent(kind=kind, order_id=order_id, payload=json.dumps(payload))
+    db.add(outbox_event)
+    jobs.wake_on_commit(db)
+    return outbox_event
+
+
+def record_many(db: Session, kind: str, events: list[tuple[int | None, dict]]) -> None:
+    # One executemany INSERT for a batch of (order_id, payload) events; ids are not returned.
+    if not events:
+        return
+    db.execute(
+        insert(OutboxEvent),
+        [
+            {"kind": kind, "order_id": order_id, "payload": json.dumps(payload)}
+            for order_id, payload in events
+        ],
+    )
+    jobs.wake_on_commit(db)
+
+
+def _dispatch(kind: str, payload: dict) -> str | None:
+    for func in _consumers.get(kind, ()):
+        try:
+            func(payload)
+        except Exception as exc:
+            logger.exception("Outbox consumer %s failed for %s", func.__name__, kind)
+            return str(exc)
+    return None
+
+
+def relay_outbox(limit: int) -> int:
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        # SKIP LOCKED lets several workers relay disjoint batches side by side.
+        batch = db.scalars(
+            select(OutboxEvent)
+            .where(OutboxEvent.dispatched_at.is_(None), OutboxEvent.available_at <= now)
+            .order_by(OutboxEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not batch:
+            return 0
+
+        for outbox_event in batch:
+            error = _dispatch(outbox_event.kind, json.loads(outbox_event.payload or "{}"))
+            outbox_event.attempts += 1
+            if error is None:
+                outbox_event.dispatched_at = now
+                outbox_event.last_error = None
+                outcome = "ok"
+                dispatch_lag.observe((now - as_naive_utc(outbox_event.created_at)).total_seconds())
+            elif outbox_event.attempts >= settings.outbox_max_attempts:
+                outbox_event.dispatched_at = now
+                outbox_event.last_error = error
+                outcome = "gave_up"
+                logger.warning(
+                    "Outbox event %s (%s) gave up: %s", outbox_event.id, outbox_event.kind, error
+                )
+            else:
+                outbox_event.last_error = error
+                outbox_event.available_at = now + timedelta(
+                    seconds=settings.outbox_retry_backoff_seconds
+                    * 2 ** (outbox_event.attempts - 1)
+                )
+                outcome = "retry"
+            events_dispatched.inc(kind=outbox_event.kind, outcome=outcome)
+        db.commit()
+        return len(batch)
+
+
+def purge_dispatched_if_due() -> int:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < 3600:
+        return 0
+    _last_purge = now
+    cutoff = datetime.utcnow() - timedelta(hours=settings.outbox_retention_hours)
+    with SessionLocal() as db:
+        db.execute(delete(OutboxEvent).where(OutboxEvent.dispatched_at < cutoff))
+        db.commit()
+    return 0
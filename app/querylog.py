@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryStats:
+    def __init__(self, route: str = "", budget: int = 0, forward_to: tuple = ()) -> None:
+        self.route = route
+        self.budget = budget
+        self.forward_to = forward_to
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: list[str] = []
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements.append(statement)
+        for collector in self.forward_to:
+            collector.record(statement, seconds)
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.2f};desc="{self.count} queries"'
+
+
+class SlowQueryLog:
+    def __init__(self, *, max_per_minute: int, dedupe_seconds: float) -> None:
+        self.max_per_minute = max_per_minute
+        self.dedupe_seconds = dedupe_seconds
+        self._window_started = 0.0
+        self._window_count = 0
+        self._last_logged: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def should_log(self, statement: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_logged.get(statement, -self.dedupe_seconds) < self.dedupe_seconds:
+                return False
+            if now - self._window_started >= 60:
+                self._window_started = now
+                self._window_count = 0
+                # Forget statements outside the dedupe window so the map stays bounded.
+                self._last_logged = {
+                    key: at
+                    for key, at in self._last_logged.items()
+                    if now - at < self.dedupe_seconds
+                }
+            if self._window_count >= self.max_per_minute:
+                return False
+            self._window_count += 1
+            self._last_logged[statement] = now
+            return True
+
+
+slow_query_log = SlowQueryLog(
+    max_per_minute=settings.slow_query_log_per_minute,
+    dedupe_seconds=settings.slow_query_dedupe_seconds,
+)
+_explaining = threading.local()
+# Plans are looked up here so a slow request never waits on, or holds a second pooled
+# connection for, its own EXPLAIN. The slow-query rate limit bounds what is queued.
+_explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+
+# Set per request by QueryStatsMiddleware and by count_queries(). Starlette copies the
+# context into the threadpool for sync endpoints and dependencies, and TestClient carries
+# the caller's context onto its portal thread, so a request made inside count_queries()
+# reports to it. Background worker threads have their own context and are not counted.
+_request_stats: ContextVar[QueryStats | None] = ContextVar("request_query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    if settings.slow_query_ms and elapsed * 1000 >= settings.slow_query_ms:
+        _log_slow_query(conn, statement, parameters, executemany, elapsed)
+
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    stats.record(statement, elapsed)
+    if stats.budget and stats.count == stats.budget + 1:
+        logger.warning(
+            "%s exceeded its query budget of %s; statements so far:\n%s",
+            stats.route,
+            stats.budget,
+            "\n".join(stats.statements),
+        )
+        if settings.query_budget_strict:
+            raise QueryBudgetExceeded(f"{stats.route} ran more than {stats.budget} queries")
+
+
+def _explain(engine: Engine, statement: str, parameters) -> str | None:
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return None
+    _explaining.active = True
+    try:
+        with engine.connect() as explain_conn:
+            rows = explain_conn.exec_driver_sql(prefix + statement, parameters).all()
+    except Exception as exc:
+        logger.debug("EXPLAIN failed: %s", exc)
+        return None
+    finally:
+        _explaining.active = False
+    return "\n".join(" ".join(str(value) for value in row) for row in rows)
+
+
+def _log_plan(engine: Engine, statement: str, parameters, route: str) -> None:
+    plan = _explain(engine, statement, parameters)
+    if plan:
+        logger.warning("Plan for slow query from %s\n%s\nplan:\n%s", route, statement, plan)
+
+
+def _redact(parameters, executemany: bool) -> str:
+    # Values can be emails, phone numbers or tokens, so only their types are logged.
+    if executemany:
+        return f"{len(parameters)} parameter sets"
+    if isinstance(parameters, dict):
+        return repr({key: type(value).__name__ for key, value in parameters.items()})
+    return repr(tuple(type(value).__name__ for value in parameters or ()))
+
+
+def _log_slow_query(conn, statement, parameters, executemany, elapsed) -> None:
+    if getattr(_explaining, "active", False) or not slow_query_log.should_log(statement):
+        return
+    stats = _request_stats.get()
+    route = stats.route if stats and stats.route else "background"
+    logger.warning(
+        "Slow query (%.1f ms) from %s\n%s\nparameters: %.500s",
+        elapsed * 1000,
+        route,
+        statement,
+        _redact(parameters, executemany),
+    )
+    if (
+        settings.slow_query_explain
+        and not executemany
+        and statement.lstrip()[:6].upper() == "SELECT"
+    ):
+        _explainer.submit(_log_plan, conn.engine, statement, parameters, route)
+
+
+def install_query_hooks(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def count_queries():
+    stats = QueryStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app, budget: int | None = None) -> None:
+        self.app = app
+        self.budget = settings.query_budget if budget is None else budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        outer = _request_stats.get()
+        forward_to = (outer,) if outer is not None else ()
+        stats = QueryStats(f'{scope["method"]} {scope["path"]}', self.budget, forward_to)
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, exists, literal, or_, select, update
+
+from . import gateways, outbox
+from .config import settings
+from .database import SessionLocal
+from .models import MpesaTransaction, Order, PaymentMethod, PaymentStatus
+from .schemas import PaymentStatusResponse
+
+logger = logging.getLogger(__name__)
+
+_last_run = 0.0
+_thread: threading.Thread | None = None
+
+
+def _by_id(id_column, column, values: dict):
+    # One CASE per column lets a single UPDATE carry a different value for every row.
+    return case(
+        {key: literal(value, column.type) for key, value in values.items()},
+        value=id_column,
+        else_=column,
+    )
+
+
+def _apply_results(db, found: list) -> int:
+    tx_table = MpesaTransaction.__table__
+    order_table = Order.__table__
+    now = datetime.utcnow()
+    # Guard on PENDING so a callback that landed meanwhile is never overwritten; RETURNING
+    # names exactly the rows this sweep resolved.
+    applied = db.execute(
+        update(tx_table)
+        .where(
+            tx_table.c.id.in_([row.id for row, _ in found]),
+            tx_table.c.status == PaymentStatus.pending,
+        )
+        .values(
+            status=_by_id(
+                tx_table.c.id, tx_table.c.status, {row.id: result.status for row, result in found}
+            ),
+            result_code=_by_id(
+                tx_table.c.id,
+                tx_table.c.result_code,
+                {row.id: result.result_code for row, result in found},
+            ),
+            result_desc=_by_id(
+                tx_table.c.id,
+                tx_table.c.result_desc,
+                {row.id: result.result_desc for row, result in found},
+            ),
+            updated_at=now,
+        )
+        .returning(tx_table.c.id)
+    ).scalars().all()
+    if not applied:
+        db.commit()
+        return 0
+
+    applied = set(applied)
+    by_order = {row.order_id: (row, result) for row, result in found if row.id in applied}
+    # An order follows only its latest transaction: an older push's result must not settle an
+    # order whose retry is still PENDING.
+    newer = tx_table.alias("newer")
+    tx_ids = case(
+        {order_id: row.id for order_id, (row, _) in by_order.items()}, value=order_table.c.id
+    )
+    orders = db.execute(
+        update(order_table)
+        .where(
+            order_table.c.id.in_(list(by_order)),
+            order_table.c.payment_status == PaymentStatus.pending,
+            ~exists().where(newer.c.order_id == order_table.c.id, newer.c.id > tx_ids),
+        )
+        .values(
+            payment_method=PaymentMethod.mpesa,
+            payment_status=_by_id(
+                order_table.c.id,
+                order_table.c.payment_status,
+                {order_id: result.status for order_id, (_, result) in by_order.items()},
+            ),
+            payment_result_desc=_by_id(
+                order_table.c.id,
+                order_table.c.payment_result_desc,
+                {order_id: result.result_desc for order_id, (_, result) in by_order.items()},
+            ),
+            updated_at=now,
+        )
+        .returning(order_table.c.id)
+    ).scalars().all()
+    for order_id in orders:
+        row, result = by_order[order_id]
+        event = PaymentStatusResponse(
+            orderId=order_id,
+            status=result.status,
+            paymentMethod=PaymentMethod.mpesa,
+            resultDesc=result.result_desc,
+        )
+        outbox.record(
+            db,
+            outbox.PAYMENT_STATUS_CHANGED,
+            {**event.model_dump(mode="json"), "farmerId": row.farmer_id},
+            order_id=order_id,
+        )
+    db.commit()
+    return len(applied)
+
+
+def reconcile_stale_transactions(
+    *,
+    stale_after_seconds: int | None = None,
+    page_size: int | None = None,
+    concurrency: int | None = None,
+) -> int:
+    stale_after_seconds = (
+        settings.reconcile_stale_after_seconds
+        if stale_after_seconds is None
+        else stale_after_seconds
+    )
+    page_size = page_size or settings.reconcile_page_size
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+    resolved = 0
+    last_key: tuple[datetime, int] | None = None
+
+    gateway = gateways.mpesa_gateway
+    concurrency = concurrency or settings.reconcile_concurrency
+
+    with SessionLocal() as db:
+        while True:
+            query = (
+                select(
+                    MpesaTransaction.id,
+                    MpesaTransaction.order_id,
+                    MpesaTransaction.checkout_request_id,
+                    MpesaTransaction.created_at,
+                    Order.farmer_id,
+                )
+                .join(Order, Order.id == MpesaTransaction.order_id)
+                .where(
+                    MpesaTransaction.status == PaymentStatus.pending,
+                    MpesaTransaction.created_at < cutoff,
+                    MpesaTransaction.checkout_request_id.is_not(None),
+                )
+                .order_by(MpesaTransaction.created_at, MpesaTransaction.id)
+                .limit(page_size)
+            )
+            if last_key:
+                query = query.where(
+                    or_(
+                        MpesaTransaction.created_at > last_key[0],
+                        and_(
+                            MpesaTransaction.created_at == last_key[0],
+                            MpesaTransaction.id > last_key[1],
+                        ),
+                    )
+                )
+            page = db.execute(query).all()
+            if not page:
+                break
+            last_key = (page[-1].created_at, page[-1].id)
+
+            results = gateway.query_many(
+                [row.checkout_request_id for row in page], concurrency=concurrency
+            )
+            # None while Daraja still reports the request as in flight or the query failed.
+            found = [(row, result) for row, result in zip(page, results) if result is not None]
+            if found:
+                resolved += _apply_results(db, found)
+
+            if len(page) < page_size:
+                break
+
+    return resolved
+
+
+def _run() -> None:
+    try:
+        resolved = reconcile_stale_transactions()
+    except Exception:
+        logger.exception("Reconciler run failed")
+        return
+    if resolved:
+        logger.info("Reconciled %s stale M-Pesa transactions", resolved)
+
+
+def run_if_due() -> int:
+    global _last_run, _thread
+    if settings.mpesa_mock:
+        return 0
+    # A sweep can take minutes against a slow Daraja; it runs beside the worker loop, not in it.
+    if _thread is not None and _thread.is_alive():
+        return 0
+    now = time.monotonic()
+    if now - _last_run < settings.reconcile_interval_seconds:
+        return 0
+    _last_run = now
+    _thread = threading.Thread(target=_run, name="reconciler", daemon=True)
+    _thread.start()
+    # Report no work so the worker loop still idles between scheduled runs.
+    return 0
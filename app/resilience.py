@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from enum import Enum
+
+
+class CircuitState(str, Enum):
+    closed = "closed"
+    half_open = "half_open"
+    open = "open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        *,
+        failure_threshold: int,
+        reset_timeout_seconds: float,
+        half_open_max_calls: int = 1,
+        on_trip: Callable[[], None] | None = None,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.on_trip = on_trip
+        self.state = CircuitState.closed
+        self.trips = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CircuitState.open:
+                if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                    return False
+                self.state = CircuitState.half_open
+                self._probes_in_flight = 0
+            if self.state == CircuitState.half_open:
+                if self._probes_in_flight >= self.half_open_max_calls:
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self.state == CircuitState.half_open:
+                self.state = CircuitState.closed
+                self._probes_in_flight = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == CircuitState.half_open or self._failures >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self) -> None:
+        if self.state != CircuitState.open:
+            self.trips += 1
+            if self.on_trip:
+                self.on_trip()
+        self.state = CircuitState.open
+        self._opened_at = time.monotonic()
+        self._probes_in_flight = 0
+
+
+class AdaptiveTimeout:
+    def __init__(
+        self,
+        *,
+        min_seconds: float,
+        max_seconds: float,
+        multiplier: float,
+        percentile: float = 99.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ) -> None:
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.multiplier = multiplier
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def current(self) -> float:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.max_seconds
+            ordered = sorted(self._samples)
+        index = min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)
+        return min(max(ordered[index] * self.multiplier, self.min_seconds), self.max_seconds)
+
+
+class Bulkhead:
+    def __init__(self, max_concurrent: int) -> None:
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
@@ -1,11 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+import json
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session, joinedload
 
-from ..database import get_db
+from ..cache import listing_cache
+from ..config import settings
+from ..database import SessionLocal, get_db
 from ..dependencies import get_current_user, require_farmer
+from ..exports import export_response
+from ..facets import (
+    count_listing,
+    count_new_listings,
+    facet_values,
+    filter_listings,
+    listing_facets,
+    listing_filters,
+    recount_listing,
+)
+from ..market import track_listing, track_new_listings, untrack_listing
+from ..media import detect_image_extension, media_url, queue_image_variants, store_original
 from ..models import Listing, User
 from ..schemas import (
+    BulkCreatedRow,
+    BulkListingResponse,
+    BulkRowError,
+    ExportFormat,
     ListingCreateRequest,
+    ListingFacetsResponse,
     ListingOut,
     ListingsResponse,
     ListingUpdateRequest,
@@ -16,24 +42,189 @@ router = APIRouter(prefix="/listings", tags=["listings"])
 
 
 @router.get("", response_model=ListingsResponse)
-def list_listings(db: Session = Depends(get_db)):
-    records = (
-        db.query(Listing).options(joinedload(Listing.owner)).order_by(Listing.created_at.desc()).all()
-    )
+def list_listings(
+    filters: dict[str, str] = Depends(listing_filters), db: Session = Depends(get_db)
+):
+    statement = filter_listings(
+        select(Listing).options(joinedload(Listing.owner)), filters
+    ).order_by(Listing.created_at.desc())
+    records = db.scalars(statement).all()
     return ListingsResponse(items=[listing_to_out(record) for record in records])
 
 
-@router.get("/{listing_id}", response_model=ListingOut)
-def get_listing(listing_id: int, db: Session = Depends(get_db)):
-    record = (
-        db.query(Listing)
+@router.get("/facets", response_model=ListingFacetsResponse)
+def get_listing_facets(
+    filters: dict[str, str] = Depends(listing_filters), db: Session = Depends(get_db)
+):
+    # Unfiltered counts come from maintained counters; filtered ones are grouped in SQL.
+    return listing_facets(db, filters)
+
+
+# Declared before /{listing_id} so "export" is not parsed as an id.
+@router.get("/export")
+def export_listings(fmt: ExportFormat = Query(ExportFormat.ndjson, alias="format")):
+    statement = (
+        select(Listing)
         .options(joinedload(Listing.owner))
-        .filter(Listing.id == listing_id)
-        .first()
+        .order_by(Listing.created_at.desc(), Listing.id.desc())
     )
-    if not record:
+    return export_response(statement, listing_to_out, ListingOut, fmt, "listings")
+
+
+def _load_listing(listing_id: int) -> dict | None:
+    # Its own session: stale entries are reloaded from a background thread.
+    with SessionLocal() as db:
+        record = (
+            db.query(Listing)
+            .options(joinedload(Listing.owner))
+            .filter(Listing.id == listing_id)
+            .first()
+        )
+        # Plain JSON so the entry can live in a shared cache backend.
+        return listing_to_out(record).model_dump(mode="json") if record else None
+
+
+def _listing_tags(listing: dict) -> tuple[str, ...]:
+    return (f"owner:{listing['ownerEmail'].lower()}",)
+
+
+@router.get("/{listing_id}", response_model=ListingOut)
+def get_listing(listing_id: int):
+    if settings.listing_cache_enabled:
+        listing = listing_cache.get(listing_id, _load_listing, _listing_tags)
+    else:
+        listing = _load_listing(listing_id)
+    if listing is None:
         raise HTTPException(status_code=404, detail="Listing not found")
-    return listing_to_out(record)
+    return listing
+
+
+def _listing_values(payload: ListingCreateRequest) -> dict:
+    return {
+        "title": payload.title,
+        "description": payload.description,
+        "category": payload.category,
+        "breed": payload.breed,
+        "location": payload.location,
+        "price": payload.price,
+        "max_price": payload.maxPrice,
+        "weight": payload.weight,
+        "age": payload.age,
+        "image_url": payload.imageUrl,
+        "status": payload.status or "Available",
+        "health": payload.health,
+    }
+
+
+async def _read_bulk_rows(request: Request) -> list:
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Upload a CSV file in the 'file' field")
+        raw = await upload.read()
+    else:
+        raw = await request.body()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Listings must be UTF-8 encoded")
+
+    if content_type.startswith("application/json"):
+        try:
+            rows = json.loads(text)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of listings")
+        return rows
+
+    # CSV: header names match the JSON fields; empty cells mean "not provided".
+    try:
+        return [
+            {key: value for key, value in row.items() if key and value not in ("", None)}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    except csv.Error as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {exc}")
+
+
+@router.post("/bulk", response_model=BulkListingResponse, status_code=status.HTTP_201_CREATED)
+async def bulk_create_listings(
+    request: Request,
+    atomic: bool = Query(True),
+    current_user: User = Depends(require_farmer),
+    db: Session = Depends(get_db),
+):
+    rows = await _read_bulk_rows(request)
+    if not rows:
+        raise HTTPException(status_code=400, detail="No listings provided")
+    if len(rows) > settings.bulk_listing_max_rows:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.bulk_listing_max_rows} listings per request",
+        )
+
+    # Validation and the insert are CPU/DB bound; keep them off the event loop.
+    return await run_in_threadpool(_bulk_insert_listings, db, current_user.id, rows, atomic)
+
+
+def _bulk_insert_listings(
+    db: Session, owner_id: int, rows: list, atomic: bool
+) -> BulkListingResponse:
+    values = []
+    value_rows = []
+    errors = []
+    for index, row in enumerate(rows, start=1):
+        try:
+            payload = ListingCreateRequest.model_validate(row)
+        except ValidationError as exc:
+            errors.append(
+                BulkRowError(
+                    row=index,
+                    errors=[
+                        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+                        for error in exc.errors()
+                    ],
+                )
+            )
+            continue
+        values.append({"owner_id": owner_id, **_listing_values(payload)})
+        value_rows.append(index)
+
+    if errors and atomic:
+        raise HTTPException(
+            status_code=422,
+            detail={"created": 0, "errors": [error.model_dump() for error in errors]},
+        )
+
+    ids = []
+    if values:
+        # One batched multi-row INSERT in one transaction. Postgres returns the ids in
+        # parameter order from that one statement. SQLite would fall back to a statement per
+        # row, but it serializes writers and hands out rowids in insert order, so sorting
+        # restores the parameter order there.
+        ordered = db.get_bind().dialect.name == "postgresql"
+        ids = list(
+            db.scalars(
+                insert(Listing).returning(Listing.id, sort_by_parameter_order=ordered), values
+            )
+        )
+        if not ordered:
+            ids.sort()
+        track_new_listings(db, ids)
+        count_new_listings(db, values)
+        db.commit()
+        # Drop any cached "not found" for ids that now exist.
+        for listing_id in ids:
+            listing_cache.invalidate(listing_id)
+    return BulkListingResponse(
+        created=len(ids),
+        ids=ids,
+        rows=[BulkCreatedRow(row=row, id=listing_id) for row, listing_id in zip(value_rows, ids)],
+        errors=errors,
+    )
 
 
 @router.post("", response_model=ListingOut, status_code=status.HTTP_201_CREATED)
@@ -42,24 +233,14 @@ def create_listing(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_farmer),
 ):
-    record = Listing(
-        owner_id=current_user.id,
-        title=payload.title,
-        description=payload.description,
-        category=payload.category,
-        breed=payload.breed,
-        location=payload.location,
-        price=payload.price,
-        max_price=payload.maxPrice,
-        weight=payload.weight,
-        age=payload.age,
-        image_url=payload.imageUrl,
-        status=payload.status or "Available",
-        health=payload.health,
-    )
+    record = Listing(owner_id=current_user.id, **_listing_values(payload))
     db.add(record)
+    db.flush()
+    track_listing(db, record)
+    count_listing(db, record)
     db.commit()
     db.refresh(record)
+    listing_cache.invalidate(record.id)
     return listing_to_out(record)
 
 
@@ -76,6 +257,7 @@ def update_listing(
     if record.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed to update this listing")
 
+    previous_facets = facet_values(record)
     record.title = payload.title
     record.description = payload.description
     record.category = payload.category
@@ -90,7 +272,54 @@ def update_listing(
     record.health = payload.health
 
     db.add(record)
+    track_listing(db, record)
+    recount_listing(db, previous_facets, record)
+    db.commit()
+    listing_cache.invalidate(listing_id)
+    db.refresh(record)
+    return listing_to_out(record)
+
+
+@router.post(
+    "/{listing_id}/images", response_model=ListingOut, status_code=status.HTTP_201_CREATED
+)
+async def upload_listing_image(
+    listing_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_farmer),
+):
+    # Read one byte past the limit so oversized uploads are rejected without buffering them.
+    data = await file.read(settings.image_max_bytes + 1)
+    if len(data) > settings.image_max_bytes:
+        raise HTTPException(
+            status_code=413, detail=f"Images must be at most {settings.image_max_bytes} bytes"
+        )
+    extension = detect_image_extension(data)
+    if extension is None:
+        raise HTTPException(status_code=415, detail="Upload a JPEG, PNG, GIF or WebP image")
+
+    # The database work and the file write block; keep them off the event loop.
+    return await run_in_threadpool(
+        _attach_listing_image, db, listing_id, current_user.id, data, extension
+    )
+
+
+def _attach_listing_image(
+    db: Session, listing_id: int, owner_id: int, data: bytes, extension: str
+) -> ListingOut:
+    record = db.get(Listing, listing_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    if record.owner_id != owner_id:
+        raise HTTPException(status_code=403, detail="Not allowed to update this listing")
+
+    # Resizing happens in the worker.
+    digest, relative_path = store_original(data, extension)
+    record.image_url = media_url(relative_path)
+    queue_image_variants(db, listing_id=record.id, digest=digest, extension=extension)
     db.commit()
+    listing_cache.invalidate(listing_id)
     db.refresh(record)
     return listing_to_out(record)
 
@@ -106,6 +335,9 @@ def delete_listing(
         raise HTTPException(status_code=404, detail="Listing not found")
     if record.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not allowed to delete this listing")
+    untrack_listing(db, listing_id)
+    count_listing(db, record, sign=-1)
     db.delete(record)
     db.commit()
+    listing_cache.invalidate(listing_id)
     return {"ok": True}
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..market import ANY, normalize_dimension
+from ..models import MarketPriceStat
+from ..schemas import MarketDimension, MarketPricesResponse
+from ..services import market_stat_to_out
+
+router = APIRouter(prefix="/market", tags=["market"])
+
+
+@router.get("/prices", response_model=MarketPricesResponse)
+def market_prices(
+    category: str | None = None,
+    breed: str | None = None,
+    location: str | None = None,
+    group_by: list[MarketDimension] = Query(default=[], alias="groupBy"),
+    db: Session = Depends(get_db),
+):
+    # Answered from precomputed rows: a filtered dimension matches its value, a grouped one
+    # lists every value, and any other dimension reads the "*" rollup.
+    grouped = {dimension.value for dimension in group_by}
+    query = select(MarketPriceStat)
+    for name, value in (("category", category), ("breed", breed), ("location", location)):
+        column = getattr(MarketPriceStat, name)
+        if value is not None:
+            query = query.where(column == normalize_dimension(value))
+        elif name in grouped:
+            query = query.where(column != ANY)
+        else:
+            query = query.where(column == ANY)
+    query = query.order_by(
+        MarketPriceStat.count.desc(),
+        MarketPriceStat.category,
+        MarketPriceStat.breed,
+        MarketPriceStat.location,
+    )
+    return MarketPricesResponse(items=[market_stat_to_out(stat) for stat in db.scalars(query)])
@@ -1,17 +1,48 @@
+import asyncio
+import logging
+from datetime import datetime
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import case, literal, select, update
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from ..database import get_db
-from ..dependencies import get_current_user
+from ..config import settings
+from ..database import SessionLocal, get_db
+from ..dependencies import authenticate_token, get_current_user
+from ..exports import export_response
+from ..idempotency import IdempotencyScope, idempotency_scope
 from ..models import Order, OrderStatus, User, UserRole
+from ..notifications import bus, farmer_orders_topic
 from ..schemas import (
+    BulkOrderStatusResponse,
     CreateOrderRequest,
+    ExportFormat,
+    OrderOut,
     OrdersResponse,
+    OrderStatusResult,
+    OrderStatusUpdate,
     UpdateOrderStatusRequest,
 )
-from ..services import create_order_record, order_to_out
+from ..services import (
+    create_order_record,
+    farmer_event_message,
+    order_to_out,
+    record_order_status_event,
+    record_order_status_events,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
@@ -30,14 +61,89 @@ def list_orders(
     return OrdersResponse(items=[order_to_out(record) for record in records])
 
 
+def _authenticate_farmer(token: str) -> int | None:
+    with SessionLocal() as db:
+        try:
+            user = authenticate_token(db, token)
+        except HTTPException:
+            return None
+        return user.id if user.role == UserRole.farmer else None
+
+
+@router.websocket("/events")
+async def farmer_order_events(websocket: WebSocket, token: str = Query("")):
+    # Browsers cannot set headers on a WebSocket handshake, so the JWT comes as ?token=.
+    farmer_id = await run_in_threadpool(_authenticate_farmer, token)
+    if farmer_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    subscription = bus.subscribe(farmer_orders_topic(farmer_id))
+    await websocket.accept()
+
+    async def forward_events():
+        while True:
+            event = await subscription.get(settings.order_events_heartbeat_seconds)
+            if event is None:
+                # The ping keeps idle proxies from dropping the connection.
+                await websocket.send_json({"type": "ping"})
+                continue
+            message = await run_in_threadpool(farmer_event_message, event)
+            if message is not None:
+                await websocket.send_json(message)
+
+    async def wait_for_disconnect():
+        # Reading is only for noticing the disconnect; clients have nothing to send.
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender = asyncio.create_task(forward_events())
+    receiver = asyncio.create_task(wait_for_disconnect())
+    failed = False
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        sender.cancel()
+        receiver.cancel()
+        bus.unsubscribe(subscription)
+        for result in await asyncio.gather(sender, receiver, return_exceptions=True):
+            if isinstance(result, Exception) and not isinstance(result, WebSocketDisconnect):
+                failed = True
+                logger.error("Order events for farmer %s failed", farmer_id, exc_info=result)
+    if failed:
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+
+
+@router.get("/export")
+def export_orders(
+    fmt: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    current_user: User = Depends(get_current_user),
+):
+    # selectinload rather than joinedload: joined collections cannot be used with yield_per.
+    statement = (
+        select(Order)
+        .options(selectinload(Order.items))
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
+    if current_user.role == UserRole.farmer:
+        statement = statement.where(Order.farmer_email == current_user.email)
+    else:
+        statement = statement.where(Order.buyer_email == current_user.email)
+    return export_response(statement, order_to_out, OrderOut, fmt, "orders")
+
+
 @router.post("", response_model=dict, status_code=201)
 def create_order(
     payload: CreateOrderRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency: IdempotencyScope = Depends(idempotency_scope),
 ):
     if current_user.role == UserRole.farmer:
         raise HTTPException(status_code=403, detail="Farmers cannot place orders")
+    replay = idempotency.reserve(payload)
+    if replay:
+        return replay
     order = create_order_record(
         db,
         buyer=current_user,
@@ -46,7 +152,56 @@ def create_order(
         farmer_email=payload.farmerEmail,
         delivery_address=payload.deliveryAddress,
     )
-    return {"order": order_to_out(order)}
+    return idempotency.save({"order": order_to_out(order)}, status_code=201)
+
+
+@router.patch("/status", response_model=BulkOrderStatusResponse)
+def bulk_update_order_status(
+    payload: list[OrderStatusUpdate] = Body(min_length=1, max_length=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    if current_user.role != UserRole.farmer:
+        raise HTTPException(status_code=403, detail="Only farmers can update order status")
+
+    # Later entries for the same order win, as they would with sequential requests.
+    requested = {item.orderId: item.status for item in payload}
+    status_type = Order.__table__.c.status.type
+    # Authorization is part of the WHERE clause, so the statement only touches the caller's
+    # orders and returns the ids it changed.
+    allowed = set(
+        db.scalars(
+            update(Order)
+            .where(Order.id.in_(requested), Order.farmer_id == current_user.id)
+            .values(
+                status=case(
+                    {
+                        order_id: literal(OrderStatus(status.value), status_type)
+                        for order_id, status in requested.items()
+                    },
+                    value=Order.id,
+                ),
+                updated_at=datetime.utcnow(),
+            )
+            .returning(Order.id)
+            .execution_options(synchronize_session=False)
+        )
+    )
+    record_order_status_events(
+        db,
+        {order_id: OrderStatus(requested[order_id].value) for order_id in allowed},
+        farmer_id=current_user.id,
+    )
+    db.commit()
+
+    # Missing orders and other farmers' orders get the same answer, so ids cannot be probed.
+    results = [
+        OrderStatusResult(orderId=item.orderId, ok=True, status=requested[item.orderId])
+        if item.orderId in allowed
+        else OrderStatusResult(orderId=item.orderId, ok=False, error="Order not found")
+        for item in payload
+    ]
+    return BulkOrderStatusResponse(updated=len(allowed), results=results)
 
 
 @router.patch("/{order_id}/status", response_model=dict)
@@ -66,6 +221,9 @@ def update_order_status(
 
     order.status = OrderStatus(payload.status.value)
     db.add(order)
+    record_order_status_event(
+        db, order_id=order.id, status=order.status, farmer_id=order.farmer_id
+    )
     db.commit()
     db.refresh(order)
     return {"order": order_to_out(order)}
@@ -1,17 +1,21 @@
-import base64
 import json
 import re
-from datetime import datetime
+import time
 from decimal import Decimal
 
-import httpx
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 
+from ..callbacks import stk_callback, store_mpesa_callback
 from ..config import settings
-from ..database import get_db
+from ..database import SessionLocal, get_db
 from ..dependencies import get_current_user
-from ..models import MpesaTransaction, Order, PaymentMethod, PaymentStatus, User, UserRole
+from ..gateways import PaymentRequest, card_gateway, mpesa_gateway
+from ..idempotency import IdempotencyScope, idempotency_scope
+from ..models import MpesaTransaction, Order, PaymentStatus, User, UserRole
+from ..notifications import bus, order_payment_topic
 from ..schemas import (
     CardCheckoutRequest,
     MpesaCheckoutRequest,
@@ -23,15 +27,23 @@ from ..services import (
     create_order_record,
     order_to_out,
     parse_price_to_decimal,
-    random_receipt,
-    set_payment_state,
+    payment_status_out,
+    start_payment,
 )
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 
-def _resolve_order_for_user(db: Session, order_id: int, user: User) -> Order:
-    order = db.query(Order).options(joinedload(Order.items)).filter(Order.id == order_id).first()
+TERMINAL_PAYMENT_STATUSES = {PaymentStatus.success, PaymentStatus.failed}
+
+
+def _resolve_order_for_user(
+    db: Session, order_id: int, user: User, *, load_items: bool = True
+) -> Order:
+    query = db.query(Order)
+    if load_items:
+        query = query.options(joinedload(Order.items))
+    order = query.filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if user.role == UserRole.farmer:
@@ -54,79 +66,6 @@ def _normalize_phone(phone_number: str) -> str:
     raise HTTPException(status_code=400, detail="Invalid M-Pesa phone number format")
 
 
-def _daraja_access_token() -> str:
-    if not settings.daraja_consumer_key or not settings.daraja_consumer_secret:
-        raise HTTPException(
-            status_code=500,
-            detail="Daraja consumer key/secret not configured",
-        )
-
-    url = f"{settings.daraja_base_url}/oauth/v1/generate?grant_type=client_credentials"
-    try:
-        with httpx.Client(timeout=20.0) as client:
-            response = client.get(
-                url,
-                auth=(settings.daraja_consumer_key, settings.daraja_consumer_secret),
-            )
-    except httpx.RequestError as exc:
-        raise HTTPException(status_code=502, detail=f"Daraja auth network error: {exc}") from exc
-    if response.status_code >= 400:
-        raise HTTPException(
-            status_code=502,
-            detail=f"Daraja auth failed: {response.text}",
-        )
-    token = response.json().get("access_token")
-    if not token:
-        raise HTTPException(status_code=502, detail="Daraja access token missing")
-    return token
-
-
-def _daraja_stk_push(*, phone: str, amount: int, order_id: int) -> dict:
-    required = [
-        settings.daraja_shortcode,
-        settings.daraja_passkey,
-        settings.daraja_callback_url,
-    ]
-    if any(not value for value in required):
-        raise HTTPException(
-            status_code=500,
-            detail="Daraja shortcode/passkey/callback URL not configured",
-        )
-
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    password_raw = f"{settings.daraja_shortcode}{settings.daraja_passkey}{timestamp}"
-    password = base64.b64encode(password_raw.encode("utf-8")).decode("utf-8")
-    token = _daraja_access_token()
-
-    payload = {
-        "BusinessShortCode": settings.daraja_shortcode,
-        "Password": password,
-        "Timestamp": timestamp,
-        "TransactionType": settings.daraja_transaction_type,
-        "Amount": max(amount, 1),
-        "PartyA": phone,
-        "PartyB": settings.daraja_shortcode,
-        "PhoneNumber": phone,
-        "CallBackURL": settings.daraja_callback_url,
-        "AccountReference": f"ORDER-{order_id}",
-        "TransactionDesc": f"Farmart payment for order {order_id}",
-    }
-
-    url = f"{settings.daraja_base_url}/mpesa/stkpush/v1/processrequest"
-    try:
-        with httpx.Client(timeout=20.0) as client:
-            response = client.post(
-                url,
-                headers={"Authorization": f"Bearer {token}"},
-                json=payload,
-            )
-    except httpx.RequestError as exc:
-        raise HTTPException(status_code=502, detail=f"Daraja STK network error: {exc}") from exc
-    if response.status_code >= 400:
-        raise HTTPException(status_code=502, detail=f"Daraja STK failed: {response.text}")
-    return response.json()
-
-
 def _latest_mpesa_transaction(order: Order) -> MpesaTransaction | None:
     if not order.mpesa_transactions:
         return None
@@ -138,9 +77,14 @@ def mpesa_stk_push(
     payload: MpesaCheckoutRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency: IdempotencyScope = Depends(idempotency_scope),
 ):
     if current_user.role == UserRole.farmer:
         raise HTTPException(status_code=403, detail="Farmers cannot pay for orders")
+    phone = _normalize_phone(payload.phoneNumber)
+    replay = idempotency.reserve(payload)
+    if replay:
+        return replay
 
     order = create_order_record(
         db,
@@ -150,72 +94,29 @@ def mpesa_stk_push(
         farmer_email=payload.farmerEmail,
         delivery_address=payload.deliveryAddress,
     )
-
-    phone = _normalize_phone(payload.phoneNumber)
-
-    if settings.mpesa_mock:
-        status = PaymentStatus.pending
-        result_desc = "M-Pesa STK push sent"
-        receipt = None
-        if phone.endswith("0"):
-            status = PaymentStatus.failed
-            result_desc = "M-Pesa mock failure"
-        elif phone.endswith("9"):
-            status = PaymentStatus.success
-            result_desc = "M-Pesa payment confirmed"
-            receipt = random_receipt("MP")
-
-        order = set_payment_state(
-            db,
-            order=order,
-            method=PaymentMethod.mpesa,
-            status=status,
-            result_desc=result_desc,
-            receipt=receipt,
-        )
-    else:
-        daraja_response = _daraja_stk_push(
-            phone=phone,
-            amount=int(max(round(float(payload.total)), 1)),
-            order_id=order.id,
-        )
-        response_code = str(daraja_response.get("ResponseCode", ""))
-        is_ok = response_code == "0"
-        order = set_payment_state(
-            db,
-            order=order,
-            method=PaymentMethod.mpesa,
-            status=PaymentStatus.pending if is_ok else PaymentStatus.failed,
-            result_desc=daraja_response.get("ResponseDescription")
-            or daraja_response.get("errorMessage")
-            or "M-Pesa request sent",
-            receipt=None,
-        )
-        tx = MpesaTransaction(
+    order = start_payment(
+        db,
+        order=order,
+        gateway=mpesa_gateway,
+        request=PaymentRequest(
             order_id=order.id,
-            merchant_request_id=daraja_response.get("MerchantRequestID"),
-            checkout_request_id=daraja_response.get("CheckoutRequestID"),
-            phone_number=phone,
-            response_code=response_code,
-            result_code=None,
-            result_desc=daraja_response.get("CustomerMessage")
-            or daraja_response.get("ResponseDescription"),
-            raw_payload=json.dumps(daraja_response),
-            status=PaymentStatus.pending if is_ok else PaymentStatus.failed,
-        )
-        db.add(tx)
-        db.commit()
-        db.refresh(order)
+            amount=int(max(round(float(payload.total)), 1)),
+            phone=phone,
+        ),
+        queued_desc="M-Pesa request sent",
+    )
 
-    return {
-        "message": "M-Pesa prompt sent. Confirm on your phone.",
-        "order": order_to_out(order),
-        "payment": {
-            "status": order.payment_status.value,
-            "resultDesc": order.payment_result_desc,
-            "receipt": order.payment_receipt,
-        },
-    }
+    return idempotency.save(
+        {
+            "message": "M-Pesa prompt sent. Confirm on your phone.",
+            "order": order_to_out(order),
+            "payment": {
+                "status": order.payment_status.value,
+                "resultDesc": order.payment_result_desc,
+                "receipt": order.payment_receipt,
+            },
+        }
+    )
 
 
 @router.post("/card/checkout", response_model=dict)
@@ -223,12 +124,16 @@ def card_checkout(
     payload: CardCheckoutRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    idempotency: IdempotencyScope = Depends(idempotency_scope),
 ):
     if current_user.role == UserRole.farmer:
         raise HTTPException(status_code=403, detail="Farmers cannot pay for orders")
 
     if len(payload.cardNumber.replace(" ", "")) < 12:
         raise HTTPException(status_code=400, detail="Invalid card details")
+    replay = idempotency.reserve(payload)
+    if replay:
+        return replay
 
     order = create_order_record(
         db,
@@ -238,23 +143,28 @@ def card_checkout(
         farmer_email=payload.farmerEmail,
         delivery_address=payload.deliveryAddress,
     )
-    order = set_payment_state(
+    order = start_payment(
         db,
         order=order,
-        method=PaymentMethod.card,
-        status=PaymentStatus.success,
-        result_desc="Card payment successful",
-        receipt=random_receipt("CD"),
+        gateway=card_gateway,
+        request=PaymentRequest(
+            order_id=order.id,
+            amount=int(max(round(float(payload.total)), 1)),
+            card_number=payload.cardNumber,
+        ),
+        queued_desc="Card payment pending",
+    )
+    return idempotency.save(
+        {
+            "message": "Card payment successful",
+            "order": order_to_out(order),
+            "payment": {
+                "status": order.payment_status.value,
+                "resultDesc": order.payment_result_desc,
+                "receipt": order.payment_receipt,
+            },
+        }
     )
-    return {
-        "message": "Card payment successful",
-        "order": order_to_out(order),
-        "payment": {
-            "status": order.payment_status.value,
-            "resultDesc": order.payment_result_desc,
-            "receipt": order.payment_receipt,
-        },
-    }
 
 
 @router.post("/mpesa/retry", response_model=dict)
@@ -275,59 +185,18 @@ def retry_mpesa(
         if not phone:
             raise HTTPException(status_code=400, detail="Phone number required for retry")
 
-    if settings.mpesa_mock:
-        status = PaymentStatus.pending
-        result_desc = "M-Pesa STK push sent"
-        receipt = None
-        if phone.endswith("0"):
-            status = PaymentStatus.failed
-            result_desc = "M-Pesa mock failure"
-        elif phone.endswith("9"):
-            status = PaymentStatus.success
-            result_desc = "M-Pesa payment confirmed"
-            receipt = random_receipt("MP")
-
-        order = set_payment_state(
-            db,
-            order=order,
-            method=PaymentMethod.mpesa,
-            status=status,
-            result_desc=result_desc,
-            receipt=receipt,
-        )
-    else:
-        daraja_response = _daraja_stk_push(
-            phone=phone,
-            amount=int(max(round(float(order.total)), 1)),
-            order_id=order.id,
-        )
-        response_code = str(daraja_response.get("ResponseCode", ""))
-        is_ok = response_code == "0"
-        order = set_payment_state(
-            db,
-            order=order,
-            method=PaymentMethod.mpesa,
-            status=PaymentStatus.pending if is_ok else PaymentStatus.failed,
-            result_desc=daraja_response.get("ResponseDescription")
-            or daraja_response.get("errorMessage")
-            or "M-Pesa retry sent",
-            receipt=None,
-        )
-        tx = MpesaTransaction(
+    order = start_payment(
+        db,
+        order=order,
+        gateway=mpesa_gateway,
+        request=PaymentRequest(
             order_id=order.id,
-            merchant_request_id=daraja_response.get("MerchantRequestID"),
-            checkout_request_id=daraja_response.get("CheckoutRequestID"),
-            phone_number=phone,
-            response_code=response_code,
-            result_code=None,
-            result_desc=daraja_response.get("CustomerMessage")
-            or daraja_response.get("ResponseDescription"),
-            raw_payload=json.dumps(daraja_response),
-            status=PaymentStatus.pending if is_ok else PaymentStatus.failed,
-        )
-        db.add(tx)
-        db.commit()
-        db.refresh(order)
+            amount=int(max(round(float(order.total)), 1)),
+            phone=phone,
+        ),
+        queued_desc="M-Pesa retry sent",
+    )
+    db.commit()
 
     return {
         "message": "M-Pesa prompt sent. Confirm on your phone.",
@@ -340,71 +209,107 @@ def retry_mpesa(
     }
 
 
+def _read_payment_status(order_id: int) -> PaymentStatusResponse | None:
+    with SessionLocal() as db:
+        order = db.get(Order, order_id)
+        return payment_status_out(order) if order else None
+
+
+def _sse_message(event: PaymentStatusResponse) -> str:
+    return f"event: payment\ndata: {event.model_dump_json()}\n\n"
+
+
 @router.get("/{order_id}/status", response_model=PaymentStatusResponse)
-def payment_status(
+async def payment_status(
+    order_id: int,
+    wait: float = Query(default=0, ge=0, le=60),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Subscribe before reading so a change landing in between is not missed.
+    subscription = bus.subscribe(order_payment_topic(order_id)) if wait else None
+    try:
+        order = await run_in_threadpool(
+            _resolve_order_for_user, db, order_id, current_user, load_items=False
+        )
+        current = payment_status_out(order)
+        # Give the pooled connection back before parking on the bus.
+        db.close()
+        if subscription and current.status not in TERMINAL_PAYMENT_STATUSES:
+            # A shared backend delivers every committed change. A local one misses changes made
+            # by other processes, so only then is the order also reread on a timer.
+            recheck = None if bus.backend.shared else settings.payment_status_recheck_seconds
+            deadline = time.monotonic() + wait
+            while (remaining := deadline - time.monotonic()) > 0:
+                event = await subscription.get(min(remaining, recheck or remaining))
+                if event is None and recheck is None:
+                    break
+                # Events carry only the order id; the status itself is read from the row.
+                latest = await run_in_threadpool(_read_payment_status, order_id)
+                if latest and latest != current:
+                    return latest
+        return current
+    finally:
+        if subscription:
+            bus.unsubscribe(subscription)
+
+
+@router.get("/{order_id}/events")
+async def payment_events(
     order_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    order = _resolve_order_for_user(db, order_id, current_user)
-    return PaymentStatusResponse(
-        orderId=order.id,
-        status=order.payment_status,
-        paymentMethod=order.payment_method,
-        receipt=order.payment_receipt,
-        resultDesc=order.payment_result_desc,
+    subscription = bus.subscribe(order_payment_topic(order_id))
+    try:
+        order = await run_in_threadpool(
+            _resolve_order_for_user, db, order_id, current_user, load_items=False
+        )
+    except Exception:
+        bus.unsubscribe(subscription)
+        raise
+    current = payment_status_out(order)
+    db.close()
+
+    async def stream():
+        last = current
+        deadline = time.monotonic() + settings.payment_events_max_seconds
+        try:
+            yield _sse_message(last)
+            while last.status not in TERMINAL_PAYMENT_STATUSES and time.monotonic() < deadline:
+                event = await subscription.get(settings.payment_events_heartbeat_seconds)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                # Events carry only the order id; the status itself is read from the row.
+                latest = await run_in_threadpool(_read_payment_status, order_id)
+                if latest and latest != last:
+                    last = latest
+                    yield _sse_message(last)
+        finally:
+            bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @router.post("/mpesa/callback", include_in_schema=False)
-def mpesa_callback(payload: dict, db: Session = Depends(get_db)):
-    callback = (
-        payload.get("Body", {})
-        .get("stkCallback", {})
-    )
-    checkout_request_id = callback.get("CheckoutRequestID")
-    result_code = str(callback.get("ResultCode", ""))
-    result_desc = callback.get("ResultDesc", "")
-
-    if not checkout_request_id:
+async def mpesa_callback(request: Request):
+    try:
+        # UnicodeDecodeError is a ValueError, so undecodable bytes are rejected here too.
+        text = (await request.body()).decode("utf-8")
+        payload = json.loads(text)
+    except ValueError:
+        return {"ResultCode": 1, "ResultDesc": "Invalid payload"}
+
+    checkout_request_id = stk_callback(payload).get("CheckoutRequestID")
+    if not isinstance(checkout_request_id, str) or not 0 < len(checkout_request_id) <= 120:
         return {"ResultCode": 1, "ResultDesc": "Missing CheckoutRequestID"}
 
-    tx = (
-        db.query(MpesaTransaction)
-        .filter(MpesaTransaction.checkout_request_id == checkout_request_id)
-        .first()
-    )
-    if not tx:
-        return {"ResultCode": 1, "ResultDesc": "Transaction not found"}
-
-    receipt = None
-    metadata_items = callback.get("CallbackMetadata", {}).get("Item", []) or []
-    for item in metadata_items:
-        name = item.get("Name")
-        if name == "MpesaReceiptNumber":
-            receipt = item.get("Value")
-            break
-
-    order = db.query(Order).filter(Order.id == tx.order_id).first()
-    if not order:
-        return {"ResultCode": 1, "ResultDesc": "Order not found"}
-
-    success = result_code == "0"
-    tx.result_code = result_code
-    tx.result_desc = result_desc
-    tx.mpesa_receipt = receipt
-    tx.raw_payload = json.dumps(payload)
-    tx.status = PaymentStatus.success if success else PaymentStatus.failed
-
-    order.payment_method = PaymentMethod.mpesa
-    order.payment_status = PaymentStatus.success if success else PaymentStatus.failed
-    order.payment_result_desc = result_desc
-    if receipt:
-        order.payment_receipt = receipt
-
-    db.add(tx)
-    db.add(order)
-    db.commit()
+    await run_in_threadpool(store_mpesa_callback, checkout_request_id, text)
     return {"ResultCode": 0, "ResultDesc": "Accepted"}
 
 
@@ -1,8 +1,9 @@
 from datetime import datetime
 from decimal import Decimal
+from enum import Enum
 from typing import Any
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 
 from .models import OrderStatus, PaymentMethod, PaymentStatus
 
@@ -48,11 +49,37 @@ class ListingCreateRequest(BaseModel):
     status: str = "Available"
     health: str | None = None
 
+    @field_validator("imageUrl")
+    @classmethod
+    def reject_inline_images(cls, value: str | None) -> str | None:
+        # Inline images would be copied into every listing row, cache entry and response.
+        if value and value.lstrip()[:5].lower() == "data:":
+            raise ValueError("data: URLs are not accepted; upload to /listings/{id}/images")
+        return value
+
 
 class ListingUpdateRequest(ListingCreateRequest):
     pass
 
 
+class BulkRowError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class BulkCreatedRow(BaseModel):
+    row: int
+    id: int
+
+
+class BulkListingResponse(BaseModel):
+    created: int
+    # In input order; rows pairs each id with the 1-based input row it came from.
+    ids: list[int]
+    rows: list[BulkCreatedRow]
+    errors: list[BulkRowError]
+
+
 class ListingOut(BaseModel):
     id: int
     title: str
@@ -65,6 +92,7 @@ class ListingOut(BaseModel):
     weight: str | None
     age: str | None
     imageUrl: str | None
+    thumbnailUrl: str | None = None
     status: str
     health: str | None
     ownerEmail: str
@@ -76,6 +104,19 @@ class ListingsResponse(BaseModel):
     items: list[ListingOut]
 
 
+class FacetCount(BaseModel):
+    value: str | None
+    count: int
+
+
+class ListingFacetsResponse(BaseModel):
+    total: int
+    category: list[FacetCount]
+    breed: list[FacetCount]
+    location: list[FacetCount]
+    status: list[FacetCount]
+
+
 class DeliveryAddress(BaseModel):
     line1: str | None = None
     line2: str | None = None
@@ -107,6 +148,23 @@ class UpdateOrderStatusRequest(BaseModel):
     status: OrderStatus
 
 
+class OrderStatusUpdate(BaseModel):
+    orderId: int
+    status: OrderStatus
+
+
+class OrderStatusResult(BaseModel):
+    orderId: int
+    ok: bool
+    status: OrderStatus | None = None
+    error: str | None = None
+
+
+class BulkOrderStatusResponse(BaseModel):
+    updated: int
+    results: list[OrderStatusResult]
+
+
 class OrderItemOut(BaseModel):
     id: int
     listingId: int | None
@@ -137,6 +195,35 @@ class OrdersResponse(BaseModel):
     items: list[OrderOut]
 
 
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+class MarketDimension(str, Enum):
+    category = "category"
+    breed = "breed"
+    location = "location"
+
+
+class MarketPriceStatOut(BaseModel):
+    # A dimension is None when the row covers all of its values.
+    category: str | None
+    breed: str | None
+    location: str | None
+    count: int
+    min: float
+    p25: float
+    median: float
+    p75: float
+    max: float
+    refreshedAt: datetime
+
+
+class MarketPricesResponse(BaseModel):
+    items: list[MarketPriceStatOut]
+
+
 class MpesaCheckoutRequest(BaseModel):
     items: list[OrderItemInput]
     subtotal: float
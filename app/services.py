@@ -1,12 +1,35 @@
-import random
 import re
-import string
+from collections import defaultdict
 from decimal import Decimal, InvalidOperation
 
 from sqlalchemy.orm import Session
 
-from .models import Listing, Order, OrderItem, OrderStatus, PaymentMethod, PaymentStatus, User
-from .schemas import DeliveryAddress, ListingOut, OrderItemInput, OrderItemOut, OrderOut
+from . import gateways, jobs, outbox
+from .config import settings
+from .database import SessionLocal
+from .market import ANY
+from .media import thumbnail_url
+from .notifications import bus, farmer_orders_topic, order_payment_topic
+from .models import (
+    Listing,
+    MarketPriceStat,
+    MpesaTransaction,
+    Order,
+    OrderItem,
+    OrderStatus,
+    PaymentMethod,
+    PaymentStatus,
+    User,
+)
+from .schemas import (
+    DeliveryAddress,
+    ListingOut,
+    MarketPriceStatOut,
+    OrderItemInput,
+    OrderItemOut,
+    OrderOut,
+    PaymentStatusResponse,
+)
 
 
 def normalize_role(value: str) -> str:
@@ -46,6 +69,7 @@ def listing_to_out(listing: Listing) -> ListingOut:
         weight=listing.weight,
         age=listing.age,
         imageUrl=listing.image_url,
+        thumbnailUrl=thumbnail_url(listing.image_url),
         status=listing.status,
         health=listing.health,
         ownerEmail=owner_email,
@@ -54,6 +78,21 @@ def listing_to_out(listing: Listing) -> ListingOut:
     )
 
 
+def market_stat_to_out(stat: MarketPriceStat) -> MarketPriceStatOut:
+    return MarketPriceStatOut(
+        category=None if stat.category == ANY else stat.category,
+        breed=None if stat.breed == ANY else stat.breed,
+        location=None if stat.location == ANY else stat.location,
+        count=stat.count,
+        min=stat.min_price,
+        p25=stat.p25_price,
+        median=stat.median_price,
+        p75=stat.p75_price,
+        max=stat.max_price,
+        refreshedAt=stat.refreshed_at,
+    )
+
+
 def order_to_out(order: Order) -> OrderOut:
     items = [
         OrderItemOut(
@@ -96,9 +135,93 @@ def order_to_out(order: Order) -> OrderOut:
     )
 
 
-def random_receipt(prefix: str = "RCP") -> str:
-    alphabet = string.ascii_uppercase + string.digits
-    return f"{prefix}{''.join(random.choice(alphabet) for _ in range(10))}"
+def payment_status_out(order: Order) -> PaymentStatusResponse:
+    return PaymentStatusResponse(
+        orderId=order.id,
+        status=order.payment_status,
+        paymentMethod=order.payment_method,
+        receipt=order.payment_receipt,
+        resultDesc=order.payment_result_desc,
+    )
+
+
+def record_payment_event(db: Session, order: Order) -> None:
+    outbox.record(
+        db,
+        outbox.PAYMENT_STATUS_CHANGED,
+        {**payment_status_out(order).model_dump(mode="json"), "farmerId": order.farmer_id},
+        order_id=order.id,
+    )
+
+
+def record_order_status_event(
+    db: Session, *, order_id: int, status: OrderStatus, farmer_id: int | None
+) -> None:
+    outbox.record(
+        db,
+        outbox.ORDER_STATUS_CHANGED,
+        {"orderId": order_id, "status": status.value, "farmerId": farmer_id},
+        order_id=order_id,
+    )
+
+
+def record_order_status_events(
+    db: Session, changes: dict[int, OrderStatus], *, farmer_id: int | None
+) -> None:
+    outbox.record_many(
+        db,
+        outbox.ORDER_STATUS_CHANGED,
+        [
+            (order_id, {"orderId": order_id, "status": status.value, "farmerId": farmer_id})
+            for order_id, status in changes.items()
+        ],
+    )
+
+
+# Live notifications are outbox consumers, so subscribers only hear about committed changes.
+# Bus events name the order only; subscribers read the current row when one arrives.
+@outbox.consumer(outbox.PAYMENT_STATUS_CHANGED)
+def publish_payment_status(payload: dict) -> None:
+    order_id = payload["orderId"]
+    bus.publish(order_payment_topic(order_id), {"orderId": order_id})
+    if payload.get("farmerId") is not None:
+        bus.publish(
+            farmer_orders_topic(payload["farmerId"]),
+            {"type": "payment.status", "orderId": order_id},
+        )
+
+
+@outbox.consumer(outbox.ORDER_CREATED)
+def publish_order_created(payload: dict) -> None:
+    if payload.get("farmerId") is None:
+        return
+    bus.publish(
+        farmer_orders_topic(payload["farmerId"]),
+        {"type": "order.created", "orderId": payload["orderId"]},
+    )
+
+
+@outbox.consumer(outbox.ORDER_STATUS_CHANGED)
+def publish_order_status(payload: dict) -> None:
+    if payload.get("farmerId") is None:
+        return
+    bus.publish(
+        farmer_orders_topic(payload["farmerId"]),
+        {"type": "order.status", "orderId": payload["orderId"]},
+    )
+
+
+def farmer_event_message(event: dict) -> dict | None:
+    with SessionLocal() as db:
+        order = db.get(Order, event["orderId"])
+        if order is None:
+            return None
+        if event["type"] == "order.created":
+            return {"type": "order.created", "order": order_to_out(order).model_dump(mode="json")}
+        if event["type"] == "payment.status":
+            payment = payment_status_out(order).model_dump(mode="json")
+            return {"type": "payment.status", "payment": payment}
+        return {"type": "order.status", "orderId": order.id, "status": order.status.value}
 
 
 def resolve_farmer_by_email(db: Session, farmer_email: str | None) -> User | None:
@@ -147,8 +270,20 @@ def create_order_record(
         )
         db.add(item)
 
-    db.commit()
-    db.refresh(order)
+    outbox.record(
+        db,
+        outbox.ORDER_CREATED,
+        {
+            "orderId": order.id,
+            "buyerId": order.buyer_id,
+            "farmerId": order.farmer_id,
+            "total": str(order.total),
+            "listingIds": [payload.listingId or payload.id for payload in items],
+        },
+        order_id=order.id,
+    )
+    # The caller commits, so the order lands atomically with whatever the request does next.
+    db.flush()
     return order
 
 
@@ -167,6 +302,127 @@ def set_payment_state(
     if receipt:
         order.payment_receipt = receipt
     db.add(order)
-    db.commit()
-    db.refresh(order)
+    record_payment_event(db, order)
+    db.flush()
     return order
+
+
+PAYMENT_INITIATE_JOB = "payment.initiate"
+
+
+def apply_payment_result(
+    db: Session,
+    *,
+    order: Order,
+    gateway: "gateways.PaymentGateway",
+    result: "gateways.PaymentResult",
+    phone: str | None = None,
+) -> Order:
+    if result.raw_payload is not None:
+        db.add(
+            MpesaTransaction(
+                order_id=order.id,
+                merchant_request_id=result.merchant_request_id,
+                checkout_request_id=result.checkout_request_id,
+                phone_number=phone,
+                response_code=result.response_code,
+                result_code=None,
+                result_desc=result.customer_message,
+                raw_payload=result.raw_payload,
+                status=result.status,
+            )
+        )
+    return set_payment_state(
+        db,
+        order=order,
+        method=gateway.method,
+        status=result.status,
+        result_desc=result.result_desc,
+        receipt=result.receipt,
+    )
+
+
+def start_payment(
+    db: Session,
+    *,
+    order: Order,
+    gateway: "gateways.PaymentGateway",
+    request: "gateways.PaymentRequest",
+    queued_desc: str,
+) -> Order:
+    if not gateway.asynchronous:
+        return apply_payment_result(
+            db, order=order, gateway=gateway, result=gateway.initiate(request), phone=request.phone
+        )
+
+    # Network-bound gateways run from the job worker; the job commits with the order state.
+    # Card numbers are never written to the queue.
+    jobs.enqueue(
+        db,
+        PAYMENT_INITIATE_JOB,
+        {
+            "gateway": gateway.name,
+            "order_id": order.id,
+            "phone": request.phone,
+            "amount": request.amount,
+        },
+    )
+    return set_payment_state(
+        db,
+        order=order,
+        method=gateway.method,
+        status=PaymentStatus.pending,
+        result_desc=queued_desc,
+    )
+
+
+def _give_up_payment(db: Session, payload: dict, error: str) -> None:
+    order = db.get(Order, payload["order_id"])
+    if not order or order.payment_status != PaymentStatus.pending:
+        return
+    set_payment_state(
+        db,
+        order=order,
+        method=order.payment_method,
+        status=PaymentStatus.failed,
+        result_desc=f"Payment request failed: {error}",
+    )
+
+
+@jobs.batch_job_handler(
+    PAYMENT_INITIATE_JOB,
+    max_batch=settings.payment_initiate_batch_size,
+    on_give_up=_give_up_payment,
+)
+def dispatch_payments(db: Session, payloads: list[dict]) -> list[Exception | None]:
+    errors: list[Exception | None] = [None] * len(payloads)
+    by_gateway: dict[str, list[tuple[int, Order, dict]]] = defaultdict(list)
+    for index, payload in enumerate(payloads):
+        order = db.get(Order, payload["order_id"])
+        if not order or order.payment_status == PaymentStatus.success:
+            continue
+        by_gateway[payload["gateway"]].append((index, order, payload))
+
+    for name, pushes in by_gateway.items():
+        try:
+            gateway = gateways.get_gateway(name)
+        except LookupError as exc:
+            for index, _, _ in pushes:
+                errors[index] = exc
+            continue
+        results = gateway.initiate_many(
+            [
+                gateways.PaymentRequest(
+                    order_id=order.id, amount=payload["amount"], phone=payload.get("phone")
+                )
+                for _, order, payload in pushes
+            ]
+        )
+        for (index, order, payload), result in zip(pushes, results):
+            if isinstance(result, Exception):
+                errors[index] = result
+            else:
+                apply_payment_result(
+                    db, order=order, gateway=gateway, result=result, phone=payload.get("phone")
+                )
+    return errors
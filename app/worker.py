@@ -0,0 +1,71 @@
+import logging
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from . import cache, callbacks, facets, idempotency, jobs, market, outbox, reconciler
+from .config import settings
+from .database import Base, engine
+from .notifications import bus
+from .querylog import install_query_hooks
+
+logger = logging.getLogger(__name__)
+
+# Periodic tasks return how much work they did; the loop only sleeps once every task is idle.
+PERIODIC_TASKS: list[Callable[[ThreadPoolExecutor], int]] = [
+    lambda executor: jobs.run_due_jobs(executor, settings.job_worker_concurrency),
+    lambda executor: callbacks.process_callback_inbox(settings.mpesa_callback_batch_size),
+    lambda executor: reconciler.run_if_due(),
+    lambda executor: idempotency.purge_expired_if_due(),
+    lambda executor: outbox.relay_outbox(settings.outbox_batch_size),
+    lambda executor: outbox.purge_dispatched_if_due(),
+    lambda executor: market.refresh_if_due(),
+    lambda executor: facets.recount_if_due(),
+]
+
+
+def run_worker(stop_event: threading.Event) -> None:
+    with ThreadPoolExecutor(
+        max_workers=settings.job_worker_concurrency, thread_name_prefix="job"
+    ) as executor:
+        while not stop_event.is_set():
+            done = 0
+            for task in PERIODIC_TASKS:
+                try:
+                    done += task(executor)
+                except Exception:
+                    logger.exception("Worker task failed")
+            if not done:
+                jobs.wait_for_work(settings.job_worker_poll_seconds)
+
+
+def start_embedded_worker() -> threading.Event:
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=run_worker, args=(stop_event,), name="embedded-worker", daemon=True
+    )
+    thread.start()
+    return stop_event
+
+
+def main() -> None:
+    from . import media, services  # noqa: F401  registers job handlers
+
+    logging.basicConfig(level=logging.INFO)
+    install_query_hooks(engine)
+    Base.metadata.create_all(bind=engine)
+    # Invalidations from API workers must also evict this process's near-cache entries.
+    cache.start()
+    stop_event = threading.Event()
+    try:
+        run_worker(stop_event)
+    except KeyboardInterrupt:
+        stop_event.set()
+    finally:
+        # Flushes notifications still queued for other processes.
+        bus.stop()
+        cache.stop()
+
+
+if __name__ == "__main__":
+    main()
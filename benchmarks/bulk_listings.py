@@ -0,0 +1,117 @@
+# Throughput of POST /listings/bulk (JSON and CSV) against one-by-one POST /listings.
+#
+#   python -m benchmarks.bulk_listings --rows 10000 --single-rows 500
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+
+def _rows(count: int) -> list[dict]:
+    return [
+        {
+            "title": f"Friesian heifer {n}",
+            "description": "Bulk imported",
+            "category": "Cattle",
+            "breed": "Friesian",
+            "location": "Nakuru",
+            "price": f"KSh {50_000 + n:,}",
+            "weight": "320 kg",
+            "age": "18 months",
+            "health": "Vaccinated",
+        }
+        for n in range(count)
+    ]
+
+
+def _csv(rows: list[dict]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk listing import benchmark")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--single-rows", type=int, default=500)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="farmart-bulk-")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bulk.db')}",
+            "SEED_DEMO_USERS": "false",
+            "BULK_LISTING_MAX_ROWS": str(max(args.rows, 10_000)),
+            "JOB_WORKER_EMBEDDED": "false",
+        }
+    )
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    rows = _rows(args.rows)
+    results = {"rows": args.rows}
+    with TestClient(app) as client:
+        client.post(
+            "/auth/register",
+            json={
+                "name": "Bulk",
+                "email": "bulk@example.com",
+                "password": "bulk123",
+                "role": "Farmer",
+            },
+        )
+        token = client.post(
+            "/auth/login", json={"email": "bulk@example.com", "password": "bulk123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        started = time.perf_counter()
+        response = client.post("/listings/bulk", json=rows, headers=headers)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 201, response.text
+        results["bulk_json"] = {
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(args.rows / elapsed),
+        }
+
+        started = time.perf_counter()
+        response = client.post(
+            "/listings/bulk",
+            files={"file": ("listings.csv", _csv(rows), "text/csv")},
+            headers=headers,
+        )
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 201, response.text
+        results["bulk_csv"] = {
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(args.rows / elapsed),
+        }
+
+        started = time.perf_counter()
+        for row in rows[: args.single_rows]:
+            client.post("/listings", json=row, headers=headers)
+        elapsed = time.perf_counter() - started
+        results["single_requests"] = {
+            "rows": args.single_rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(args.single_rows / elapsed),
+        }
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
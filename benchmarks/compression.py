@@ -0,0 +1,101 @@
+# CPU cost versus bytes saved for gzip and brotli on realistic GET /listings payloads.
+#
+#   python -m benchmarks.compression --listings 50 500 5000
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+
+CODECS = [("gzip", 1), ("gzip", 6), ("gzip", 9), ("br", 1), ("br", 4), ("br", 6), ("br", 11)]
+
+
+def _payload(count: int) -> bytes:
+    from app.schemas import ListingOut, ListingsResponse
+    from benchmarks.datagen import BREEDS, CATEGORIES, LOCATIONS
+
+    rng = random.Random(count)
+    items = []
+    for n in range(count):
+        category = rng.choice(CATEGORIES)
+        owner = rng.randrange(100)
+        items.append(
+            ListingOut(
+                id=n + 1,
+                title=f"{rng.choice(BREEDS[category])} {category.lower()} #{rng.randrange(10_000)}",
+                description=f"Healthy, {rng.randrange(1, 60)} months, raised on pasture.",
+                category=category,
+                breed=rng.choice(BREEDS[category]),
+                location=rng.choice(LOCATIONS),
+                price=f"KSh {rng.randrange(2_000, 250_000, 500):,}",
+                maxPrice=None,
+                weight=f"{rng.randrange(20, 600)} kg",
+                age=f"{rng.randrange(1, 60)} months",
+                imageUrl=f"https://images.example.com/listings/{rng.getrandbits(64):016x}.jpg",
+                status="Available",
+                health=rng.choice(["Vaccinated", "Dewormed", "Vaccinated, dewormed"]),
+                ownerEmail=f"farmer{owner}@bench.example.com",
+                ownerName=f"Bench Farmer {owner}",
+                createdAt=datetime(2025, 1, 1) + timedelta(minutes=rng.randrange(200_000)),
+            )
+        )
+    return ListingsResponse(items=items).model_dump_json().encode("utf-8")
+
+
+def _compress(codec: str, level: int, data: bytes) -> bytes:
+    if codec == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    import brotli
+
+    return brotli.compress(data, quality=level)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Response compression trade-off benchmark")
+    parser.add_argument("--listings", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SEED_DEMO_USERS", "false")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.compression import brotli
+
+    results = []
+    for count in args.listings:
+        data = _payload(count)
+        for codec, level in CODECS:
+            if codec == "br" and brotli is None:
+                continue
+            timings = []
+            for _ in range(args.rounds):
+                started = time.perf_counter()
+                compressed = _compress(codec, level, data)
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            results.append(
+                {
+                    "listings": count,
+                    "codec": codec,
+                    "level": level,
+                    "raw_bytes": len(data),
+                    "compressed_bytes": len(compressed),
+                    "ratio": round(len(data) / len(compressed), 2),
+                    "compress_ms": round(best * 1000, 3),
+                    "mb_per_second": round(len(data) / best / 1e6, 1),
+                }
+            )
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
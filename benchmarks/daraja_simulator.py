@@ -0,0 +1,232 @@
+# Local stand-in for Safaricom Daraja (OAuth, STK push, STK query) with injectable
+# latency, errors and asynchronous result callbacks.
+#
+#   python -m benchmarks.daraja_simulator --port 8900 --latency-ms 80 --error-rate 0.02
+#
+# Point the API at it with DARAJA_BASE_URL=http://127.0.0.1:8900 and MPESA_MOCK=false.
+import argparse
+import asyncio
+import base64
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class SimulatorConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    success_rate: float = 0.9
+    callback_delay_ms: float = 500.0
+    drop_callback_rate: float = 0.0
+    token_ttl_seconds: int = 3599
+    callback_url: str | None = None
+
+
+@dataclass
+class SimulatorState:
+    tokens: dict[str, float] = field(default_factory=dict)
+    results: dict[str, tuple[str, str, str | None]] = field(default_factory=dict)
+    counters: dict[str, int] = field(
+        default_factory=lambda: {
+            "oauth": 0,
+            "stk_push": 0,
+            "stk_push_errors": 0,
+            "stk_query": 0,
+            "callbacks_sent": 0,
+            "callbacks_failed": 0,
+            "callbacks_dropped": 0,
+        }
+    )
+
+
+_FAILURES = [
+    ("1032", "Request cancelled by user"),
+    ("1037", "DS timeout user cannot be reached"),
+    ("1", "The balance is insufficient for the transaction"),
+    ("2001", "The initiator information is invalid."),
+]
+
+
+def _decode_basic(value: str) -> str:
+    try:
+        return base64.b64decode(value).decode("utf-8")
+    except ValueError:
+        return ""
+
+
+def create_app(config: SimulatorConfig) -> FastAPI:
+    app = FastAPI(title="Daraja simulator")
+    state = SimulatorState()
+    app.state.simulator = state
+    background: set[asyncio.Task] = set()
+
+    async def simulate_latency() -> None:
+        delay = max(config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms), 0)
+        await asyncio.sleep(delay / 1000)
+
+    def authorized(request: Request) -> bool:
+        header = request.headers.get("authorization", "")
+        token = header.removeprefix("Bearer ").strip()
+        expires_at = state.tokens.get(token)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def error(status_code: int, code: str, message: str) -> JSONResponse:
+        return JSONResponse(
+            status_code=status_code,
+            content={"requestId": uuid.uuid4().hex, "errorCode": code, "errorMessage": message},
+        )
+
+    async def send_callback(url: str, merchant_id: str, checkout_id: str, amount: int, phone: str):
+        await asyncio.sleep(config.callback_delay_ms / 1000)
+        if random.random() < config.success_rate:
+            receipt = "SIM" + uuid.uuid4().hex[:7].upper()
+            result = ("0", "The service request is processed successfully.", receipt)
+        else:
+            code, desc = random.choice(_FAILURES)
+            result = (code, desc, None)
+        state.results[checkout_id] = result
+
+        if random.random() < config.drop_callback_rate:
+            state.counters["callbacks_dropped"] += 1
+            return
+        callback = {
+            "MerchantRequestID": merchant_id,
+            "CheckoutRequestID": checkout_id,
+            "ResultCode": int(result[0]),
+            "ResultDesc": result[1],
+        }
+        if result[2]:
+            callback["CallbackMetadata"] = {
+                "Item": [
+                    {"Name": "Amount", "Value": amount},
+                    {"Name": "MpesaReceiptNumber", "Value": result[2]},
+                    {"Name": "TransactionDate", "Value": int(time.strftime("%Y%m%d%H%M%S"))},
+                    {"Name": "PhoneNumber", "Value": int(phone)},
+                ]
+            }
+        try:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.post(url, json={"Body": {"stkCallback": callback}})
+            response.raise_for_status()
+            state.counters["callbacks_sent"] += 1
+        except httpx.HTTPError:
+            state.counters["callbacks_failed"] += 1
+
+    @app.get("/oauth/v1/generate")
+    async def oauth(request: Request):
+        state.counters["oauth"] += 1
+        await simulate_latency()
+        header = request.headers.get("authorization", "")
+        if not header.startswith("Basic ") or ":" not in _decode_basic(header[6:]):
+            return error(400, "400.008.01", "Invalid Authentication passed")
+        token = uuid.uuid4().hex
+        state.tokens[token] = time.monotonic() + config.token_ttl_seconds
+        return {"access_token": token, "expires_in": str(config.token_ttl_seconds)}
+
+    @app.post("/mpesa/stkpush/v1/processrequest")
+    async def stk_push(request: Request):
+        state.counters["stk_push"] += 1
+        await simulate_latency()
+        if not authorized(request):
+            return error(401, "404.001.04", "Invalid Access Token")
+        if random.random() < config.error_rate:
+            state.counters["stk_push_errors"] += 1
+            return error(503, "503.001.01", "Service is currently unavailable")
+
+        payload = await request.json()
+        merchant_id = f"{random.randint(10000, 99999)}-{random.randint(1000000, 9999999)}-1"
+        checkout_id = f"ws_CO_{time.strftime('%d%m%Y%H%M%S')}{uuid.uuid4().hex[:12]}"
+        task = asyncio.create_task(
+            send_callback(
+                config.callback_url or payload.get("CallBackURL", ""),
+                merchant_id,
+                checkout_id,
+                int(payload.get("Amount") or 1),
+                str(payload.get("PhoneNumber") or "254700000000"),
+            )
+        )
+        background.add(task)
+        task.add_done_callback(background.discard)
+        return {
+            "MerchantRequestID": merchant_id,
+            "CheckoutRequestID": checkout_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        }
+
+    @app.post("/mpesa/stkpushquery/v1/query")
+    async def stk_query(request: Request):
+        state.counters["stk_query"] += 1
+        await simulate_latency()
+        if not authorized(request):
+            return error(401, "404.001.04", "Invalid Access Token")
+        payload = await request.json()
+        checkout_id = payload.get("CheckoutRequestID")
+        result = state.results.get(checkout_id)
+        if result is None:
+            return error(500, "500.001.1001", "The transaction is being processed")
+        return {
+            "ResponseCode": "0",
+            "ResponseDescription": "The service request has been accepted successsfully",
+            "MerchantRequestID": "",
+            "CheckoutRequestID": checkout_id,
+            "ResultCode": result[0],
+            "ResultDesc": result[1],
+        }
+
+    @app.get("/simulator/stats")
+    async def stats():
+        return state.counters
+
+    return app
+
+
+def parse_config(argv: list[str] | None = None) -> tuple[SimulatorConfig, str, int]:
+    parser = argparse.ArgumentParser(description="Local Daraja simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=SimulatorConfig.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=SimulatorConfig.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=SimulatorConfig.error_rate)
+    parser.add_argument("--success-rate", type=float, default=SimulatorConfig.success_rate)
+    parser.add_argument(
+        "--callback-delay-ms", type=float, default=SimulatorConfig.callback_delay_ms
+    )
+    parser.add_argument(
+        "--drop-callback-rate", type=float, default=SimulatorConfig.drop_callback_rate
+    )
+    parser.add_argument(
+        "--token-ttl-seconds", type=int, default=SimulatorConfig.token_ttl_seconds
+    )
+    parser.add_argument("--callback-url", help="Override the CallBackURL sent by the API")
+    args = parser.parse_args(argv)
+    config = SimulatorConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        success_rate=args.success_rate,
+        callback_delay_ms=args.callback_delay_ms,
+        drop_callback_rate=args.drop_callback_rate,
+        token_ttl_seconds=args.token_ttl_seconds,
+        callback_url=args.callback_url,
+    )
+    return config, args.host, args.port
+
+
+def main() -> None:
+    import uvicorn
+
+    config, host, port = parse_config()
+    uvicorn.run(create_app(config), host=host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# Bulk-loads a reproducible synthetic dataset for benchmarks and load tests.
+#
+#   python -m benchmarks.datagen --database-url sqlite:///bench.db --listings 5000 --orders 20000
+#
+# Every generated account uses PASSWORD. Users are farmer{n}@bench.example.com and
+# buyer{n}@bench.example.com; pending M-Pesa transactions use ws_CO_bench_{order_id}.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+PASSWORD = "bench123"
+BATCH_SIZE = 5000
+
+CATEGORIES = ["Cattle", "Goats", "Sheep", "Poultry", "Pigs"]
+BREEDS = {
+    "Cattle": ["Friesian", "Ayrshire", "Boran", "Sahiwal", "Jersey"],
+    "Goats": ["Galla", "Toggenburg", "Saanen", "Boer"],
+    "Sheep": ["Dorper", "Red Maasai", "Merino"],
+    "Poultry": ["Kienyeji", "Kuroiler", "Broiler"],
+    "Pigs": ["Large White", "Landrace", "Duroc"],
+}
+LOCATIONS = ["Nairobi", "Nakuru", "Eldoret", "Kisumu", "Meru", "Nyeri", "Machakos", "Kitale"]
+
+
+def _insert(db, table, rows: list[dict]) -> None:
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(table.insert(), rows[start : start + BATCH_SIZE])
+
+
+def _next_id(db, table) -> int:
+    from sqlalchemy import func, select
+
+    return (db.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def generate(
+    *,
+    farmers: int,
+    buyers: int,
+    listings: int,
+    orders: int,
+    items_per_order: int,
+    pending_ratio: float,
+    seed: int,
+) -> dict:
+    from app.database import Base, SessionLocal, engine
+    from app.models import (
+        Listing,
+        MpesaTransaction,
+        Order,
+        OrderItem,
+        OrderStatus,
+        PaymentMethod,
+        PaymentStatus,
+        User,
+        UserRole,
+    )
+    from app.security import hash_password
+
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+    # bcrypt is deliberately slow; one hash shared by every account keeps loading fast.
+    password_hash = hash_password(PASSWORD)
+    now = datetime.utcnow()
+    users_t, listings_t, orders_t = User.__table__, Listing.__table__, Order.__table__
+    items_t, tx_t = OrderItem.__table__, MpesaTransaction.__table__
+
+    with SessionLocal() as db:
+        user_id = _next_id(db, users_t)
+        farmer_rows = [
+            {
+                "id": user_id + n,
+                "name": f"Bench Farmer {n}",
+                "email": f"farmer{n}@bench.example.com",
+                "password_hash": password_hash,
+                "role": UserRole.farmer,
+                "created_at": now,
+            }
+            for n in range(farmers)
+        ]
+        buyer_rows = [
+            {
+                "id": user_id + farmers + n,
+                "name": f"Bench Buyer {n}",
+                "email": f"buyer{n}@bench.example.com",
+                "password_hash": password_hash,
+                "role": UserRole.buyer,
+                "created_at": now,
+            }
+            for n in range(buyers)
+        ]
+        _insert(db, users_t, farmer_rows + buyer_rows)
+
+        listing_id = _next_id(db, listings_t)
+        listing_rows = []
+        for n in range(listings):
+            category = rng.choice(CATEGORIES)
+            price = rng.randrange(2_000, 250_000, 500)
+            created = now - timedelta(minutes=rng.randrange(0, 60 * 24 * 90))
+            listing_rows.append(
+                {
+                    "id": listing_id + n,
+                    "owner_id": rng.choice(farmer_rows)["id"],
+                    "title": f"{category} lot {n}",
+                    "description": "Synthetic benchmark listing",
+                    "category": category,
+                    "breed": rng.choice(BREEDS[category]),
+                    "location": rng.choice(LOCATIONS),
+                    "price": f"KSh {price:,}",
+                    "max_price": None,
+                    "weight": f"{rng.randrange(20, 600)} kg",
+                    "age": f"{rng.randrange(1, 60)} months",
+                    "image_url": None,
+                    "status": "Available",
+                    "health": "Vaccinated",
+                    "created_at": created,
+                    "updated_at": created,
+                }
+            )
+        _insert(db, listings_t, listing_rows)
+        farmer_emails = {row["id"]: row["email"] for row in farmer_rows}
+
+        order_id = _next_id(db, orders_t)
+        item_id = _next_id(db, items_t)
+        tx_id = _next_id(db, tx_t)
+        order_rows, item_rows, tx_rows = [], [], []
+        for n in range(orders):
+            buyer = rng.choice(buyer_rows)
+            picked = rng.sample(listing_rows, min(items_per_order, len(listing_rows)))
+            created = now - timedelta(minutes=rng.randrange(0, 60 * 24 * 30))
+            total = 0
+            for listing in picked:
+                qty = rng.randint(1, 3)
+                total += int(listing["price"][4:].replace(",", "")) * qty
+                item_rows.append(
+                    {
+                        "id": item_id,
+                        "order_id": order_id + n,
+                        "listing_id": listing["id"],
+                        "name": listing["title"],
+                        "qty": qty,
+                        "price": listing["price"],
+                        "weight": listing["weight"],
+                    }
+                )
+                item_id += 1
+
+            roll = rng.random()
+            if roll < pending_ratio:
+                payment_status = PaymentStatus.pending
+            elif roll < 0.85:
+                payment_status = PaymentStatus.success
+            else:
+                payment_status = PaymentStatus.failed
+            method = PaymentMethod.mpesa if rng.random() < 0.8 else PaymentMethod.card
+            if method == PaymentMethod.card and payment_status == PaymentStatus.pending:
+                payment_status = PaymentStatus.success
+            phone = f"2547{rng.randrange(10_000_000, 99_999_999)}"
+            order_rows.append(
+                {
+                    "id": order_id + n,
+                    "buyer_id": buyer["id"],
+                    "farmer_id": picked[0]["owner_id"],
+                    "buyer_name": buyer["name"],
+                    "buyer_email": buyer["email"],
+                    "farmer_email": farmer_emails[picked[0]["owner_id"]],
+                    "delivery_city": rng.choice(LOCATIONS),
+                    "delivery_phone": phone,
+                    "total": total,
+                    "status": rng.choice(list(OrderStatus)),
+                    "payment_status": payment_status,
+                    "payment_method": method,
+                    "payment_receipt": (
+                        f"BENCH{order_id + n:08d}" if payment_status == PaymentStatus.success else None
+                    ),
+                    "payment_result_desc": "Synthetic",
+                    "created_at": created,
+                    "updated_at": created,
+                }
+            )
+            if method == PaymentMethod.mpesa:
+                tx_rows.append(
+                    {
+                        "id": tx_id,
+                        "order_id": order_id + n,
+                        "merchant_request_id": f"bench-{order_id + n}",
+                        "checkout_request_id": f"ws_CO_bench_{order_id + n}",
+                        "phone_number": phone,
+                        "response_code": "0",
+                        "status": payment_status,
+                        "created_at": created,
+                        "updated_at": created,
+                    }
+                )
+                tx_id += 1
+
+        _insert(db, orders_t, order_rows)
+        _insert(db, items_t, item_rows)
+        _insert(db, tx_t, tx_rows)
+        db.commit()
+
+    return {
+        "farmers": len(farmer_rows),
+        "buyers": len(buyer_rows),
+        "listings": len(listing_rows),
+        "orders": len(order_rows),
+        "order_items": len(item_rows),
+        "mpesa_transactions": len(tx_rows),
+        "pending_mpesa": sum(1 for row in tx_rows if row["status"] == PaymentStatus.pending),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark dataset")
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL")
+    parser.add_argument("--farmers", type=int, default=100)
+    parser.add_argument("--buyers", type=int, default=1000)
+    parser.add_argument("--listings", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--items-per-order", type=int, default=2)
+    parser.add_argument("--pending-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SEED_DEMO_USERS", "false")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    started = time.perf_counter()
+    counts = generate(
+        farmers=args.farmers,
+        buyers=args.buyers,
+        listings=args.listings,
+        orders=args.orders,
+        items_per_order=args.items_per_order,
+        pending_ratio=args.pending_ratio,
+        seed=args.seed,
+    )
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    print(json.dumps(counts, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
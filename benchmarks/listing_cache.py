@@ -0,0 +1,97 @@
+# A shared-link stampede on GET /listings/{id}: many concurrent readers of one listing,
+# with the listing cache off and on. Reports throughput, latency and DB statements run.
+#
+#   python -m benchmarks.listing_cache --requests 2000 --concurrency 64
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Listing detail cache benchmark")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="farmart-listing-cache-")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'cache.db')}",
+            "SEED_DEMO_USERS": "false",
+            "JOB_WORKER_EMBEDDED": "false",
+        }
+    )
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import httpx
+    from sqlalchemy import event
+
+    from app.cache import listing_cache
+    from app.config import settings
+    from app.database import engine
+    from app.main import app as api_app
+    from benchmarks.datagen import generate
+    from benchmarks.payment_pipeline import _free_port, _serve, summarize
+
+    generate(
+        farmers=10, buyers=0, listings=100, orders=0, items_per_order=1, pending_ratio=0, seed=1
+    )
+    statements = 0
+    statements_lock = threading.Lock()
+
+    def count_statement(*_):
+        nonlocal statements
+        with statements_lock:
+            statements += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+
+    port = _free_port()
+    server, _ = _serve(api_app, port)
+    results = {}
+    with httpx.Client(
+        base_url=f"http://127.0.0.1:{port}",
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=args.concurrency * 2),
+    ) as client:
+        for label, enabled in (("uncached", False), ("cached", True)):
+            settings.listing_cache_enabled = enabled
+            listing_cache.clear()
+            statements = 0
+            latencies: list[float] = []
+
+            def fetch(_) -> None:
+                started = time.perf_counter()
+                response = client.get("/listings/1")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                list(executor.map(fetch, range(args.requests)))
+            elapsed = time.perf_counter() - started
+            results[label] = {
+                "requests": args.requests,
+                "seconds": round(elapsed, 3),
+                "requests_per_second": round(args.requests / elapsed, 1),
+                "db_statements": statements,
+                **summarize(latencies),
+            }
+
+    server.should_exit = True
+    report = {"concurrency": args.concurrency, "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,230 @@
+# Scripted load test against a real uvicorn server on a generated dataset.
+# Writes throughput and p50/p95/p99 per scenario so runs can be diffed for regressions.
+#
+#   python -m benchmarks.loadtest --requests 500 --concurrency 16 --output loadtest.json
+#   python -m benchmarks.loadtest --scenarios browse farmer_summary
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCENARIOS = ("browse", "login", "checkout", "callback_storm", "farmer_summary")
+
+
+def _callback_body(checkout_request_id: str, n: int) -> dict:
+    return {
+        "Body": {
+            "stkCallback": {
+                "MerchantRequestID": f"bench-{n}",
+                "CheckoutRequestID": checkout_request_id,
+                "ResultCode": 0,
+                "ResultDesc": "The service request is processed successfully.",
+                "CallbackMetadata": {
+                    "Item": [
+                        {"Name": "Amount", "Value": 1},
+                        {"Name": "MpesaReceiptNumber", "Value": f"LOAD{n:08d}"},
+                    ]
+                },
+            }
+        }
+    }
+
+
+def _run(client, calls: list, concurrency: int) -> dict:
+    from benchmarks.payment_pipeline import summarize
+
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def run_one(call) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            ok = call(client)
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run_one, calls))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(calls),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(calls) / elapsed, 1) if elapsed else 0.0,
+        **summarize(latencies),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="FastAPI load test")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--callback-duplicates", type=int, default=3)
+    parser.add_argument("--listings", type=int, default=2000)
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="farmart-loadtest-")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+            "MPESA_MOCK": "true",
+            "SEED_DEMO_USERS": "false",
+        }
+    )
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import httpx
+    from sqlalchemy import select
+
+    from app.database import SessionLocal
+    from app.models import Listing, MpesaCallbackInbox, MpesaTransaction, PaymentStatus
+    from benchmarks.datagen import PASSWORD, generate
+    from benchmarks.payment_pipeline import _free_port, _serve
+
+    dataset = generate(
+        farmers=100,
+        buyers=1000,
+        listings=args.listings,
+        orders=args.orders,
+        items_per_order=2,
+        pending_ratio=0.1,
+        seed=args.seed,
+    )
+    with SessionLocal() as db:
+        listing_ids = list(db.scalars(select(Listing.id)))
+        pending_ids = list(
+            db.scalars(
+                select(MpesaTransaction.checkout_request_id).where(
+                    MpesaTransaction.status == PaymentStatus.pending
+                )
+            )
+        )
+
+    from app.main import app as api_app
+
+    port = _free_port()
+    server, _ = _serve(api_app, port)
+    rng = random.Random(args.seed)
+    results: dict[str, dict] = {}
+
+    with httpx.Client(
+        base_url=f"http://127.0.0.1:{port}",
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=args.concurrency * 2),
+    ) as client:
+
+        def token_for(email: str) -> dict:
+            response = client.post("/auth/login", json={"email": email, "password": PASSWORD})
+            return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        buyer_headers = [token_for(f"buyer{n}@bench.example.com") for n in range(8)]
+        farmer_headers = [token_for(f"farmer{n}@bench.example.com") for n in range(8)]
+
+        for name in args.scenarios:
+            calls = []
+            if name == "browse":
+                for n in range(args.requests):
+                    if n % 10 == 0:
+                        calls.append(lambda c: c.get("/listings").status_code == 200)
+                    else:
+                        listing_id = rng.choice(listing_ids)
+                        calls.append(
+                            lambda c, i=listing_id: c.get(f"/listings/{i}").status_code == 200
+                        )
+            elif name == "login":
+                for _ in range(args.requests):
+                    email = f"buyer{rng.randrange(dataset['buyers'])}@bench.example.com"
+                    calls.append(
+                        lambda c, e=email: c.post(
+                            "/auth/login", json={"email": e, "password": PASSWORD}
+                        ).status_code
+                        == 200
+                    )
+            elif name == "checkout":
+                for n in range(args.requests):
+                    body = {
+                        "items": [{"title": "Heifer", "price": "KSh 1,000", "qty": 1}],
+                        "subtotal": 1000,
+                        "shipping": 0,
+                        "total": 1000,
+                        "phoneNumber": "0712345679",
+                    }
+                    headers = buyer_headers[n % len(buyer_headers)]
+                    calls.append(
+                        lambda c, b=body, h=headers: c.post(
+                            "/payments/mpesa/stk-push", json=b, headers=h
+                        ).status_code
+                        == 200
+                    )
+            elif name == "callback_storm":
+                targets = pending_ids[: args.requests] * args.callback_duplicates
+                rng.shuffle(targets)
+                for n, checkout_request_id in enumerate(targets):
+                    body = _callback_body(checkout_request_id, n)
+                    calls.append(
+                        lambda c, b=body: c.post("/payments/mpesa/callback", json=b).json()[
+                            "ResultCode"
+                        ]
+                        == 0
+                    )
+            elif name == "farmer_summary":
+                for n in range(args.requests):
+                    headers = farmer_headers[n % len(farmer_headers)]
+                    calls.append(
+                        lambda c, h=headers: c.get("/payments/summary", headers=h).status_code
+                        == 200
+                    )
+
+            results[name] = _run(client, calls, args.concurrency)
+
+            if name == "callback_storm":
+                # Callbacks are acknowledged before they are applied; time the inbox drain too.
+                drain_started = time.perf_counter()
+                while time.perf_counter() - drain_started < 60:
+                    with SessionLocal() as db:
+                        backlog = db.scalar(
+                            select(MpesaCallbackInbox.id)
+                            .where(MpesaCallbackInbox.processed_at.is_(None))
+                            .limit(1)
+                        )
+                    if backlog is None:
+                        break
+                    time.sleep(0.05)
+                results[name]["drain_seconds"] = round(time.perf_counter() - drain_started, 3)
+
+    server.should_exit = True
+    report = {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "dataset": dataset,
+        "scenarios": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+# Measures the per-request cost of MetricsMiddleware by driving a no-op ASGI app
+# directly, with and without the middleware, so the result excludes HTTP parsing.
+#
+#   python -m benchmarks.metrics_overhead --requests 200000
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+
+class _Route:
+    path = "/listings/{listing_id}"
+
+
+async def _endpoint(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"ok":true}'})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def _drive(app, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "GET", "path": "/listings/1"}
+        await app(scope, _receive, _send)
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Metrics middleware overhead benchmark")
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SEED_DEMO_USERS", "false")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.instrumentation import MetricsMiddleware
+
+    instrumented = MetricsMiddleware(_endpoint)
+    loop = asyncio.new_event_loop()
+    # Warm up both paths, then keep the best round of each to reduce scheduler noise.
+    loop.run_until_complete(_drive(_endpoint, 1000))
+    loop.run_until_complete(_drive(instrumented, 1000))
+    bare = min(loop.run_until_complete(_drive(_endpoint, args.requests)) for _ in range(args.rounds))
+    wrapped = min(
+        loop.run_until_complete(_drive(instrumented, args.requests)) for _ in range(args.rounds)
+    )
+    loop.close()
+
+    result = {
+        "requests": args.requests,
+        "bare_us_per_request": round(bare / args.requests * 1e6, 3),
+        "instrumented_us_per_request": round(wrapped / args.requests * 1e6, 3),
+        "overhead_us_per_request": round((wrapped - bare) / args.requests * 1e6, 3),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,180 @@
+# Micro-benchmarks for the per-row services helpers, at realistic batch sizes.
+#
+#   python -m benchmarks.micro run                      # print timings
+#   python -m benchmarks.micro run --save               # overwrite the stored baseline
+#   python -m benchmarks.micro compare --threshold 0.15 # exit 1 on a >15% regression
+#
+# Baselines are machine specific; refresh them on the machine you compare on.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "micro.json")
+
+
+def _listings(count: int):
+    from app.models import Listing, User, UserRole
+
+    owner = User(id=1, name="Bench Farmer", email="farmer@bench.example.com", role=UserRole.farmer)
+    return [
+        Listing(
+            id=n,
+            owner_id=owner.id,
+            owner=owner,
+            title=f"Friesian heifer {n}",
+            description="Synthetic benchmark listing",
+            category="Cattle",
+            breed="Friesian",
+            location="Nakuru",
+            price=f"KSh {50_000 + n:,}",
+            weight="320 kg",
+            age="18 months",
+            status="Available",
+            health="Vaccinated",
+            created_at=datetime(2025, 1, 1),
+        )
+        for n in range(count)
+    ]
+
+
+def _orders(count: int, items_per_order: int):
+    from app.models import Order, OrderItem, OrderStatus, PaymentMethod, PaymentStatus
+
+    return [
+        Order(
+            id=n,
+            buyer_id=1,
+            buyer_name="Bench Buyer",
+            buyer_email="buyer@bench.example.com",
+            farmer_email="farmer@bench.example.com",
+            delivery_line1="Plot 7",
+            delivery_city="Nakuru",
+            delivery_phone="254712345678",
+            total=Decimal("150000.00"),
+            status=OrderStatus.pending,
+            payment_status=PaymentStatus.success,
+            payment_method=PaymentMethod.mpesa,
+            payment_receipt="QWE123ABC",
+            created_at=datetime(2025, 1, 1),
+            items=[
+                OrderItem(
+                    id=n * items_per_order + i,
+                    listing_id=i,
+                    name=f"Item {i}",
+                    qty=1,
+                    price="KSh 50,000",
+                    weight="320 kg",
+                )
+                for i in range(items_per_order)
+            ],
+        )
+        for n in range(count)
+    ]
+
+
+def _benchmarks() -> dict:
+    from app.routers.payments import _normalize_phone
+    from app.gateways import random_receipt
+    from app.services import listing_to_out, order_to_out, parse_price_to_decimal
+
+    rng = random.Random(7)
+    listings = _listings(500)
+    orders = _orders(200, 3)
+    prices = [
+        rng.choice(
+            [f"KSh {rng.randrange(1000, 500_000):,}", str(rng.randrange(100, 9999)), "1,250.50"]
+        )
+        for _ in range(1000)
+    ]
+    phones = [
+        rng.choice(["0712345678", "+254 712 345 678", "712345678", "254712345678"])
+        for _ in range(1000)
+    ]
+
+    # name -> (function running one batch, rows per batch)
+    return {
+        "listing_to_out": (lambda: [listing_to_out(item) for item in listings], len(listings)),
+        "order_to_out": (lambda: [order_to_out(item) for item in orders], len(orders)),
+        "parse_price_to_decimal": (
+            lambda: [parse_price_to_decimal(item) for item in prices],
+            len(prices),
+        ),
+        "normalize_phone": (lambda: [_normalize_phone(item) for item in phones], len(phones)),
+        "random_receipt": (lambda: [random_receipt("MP") for _ in range(1000)], 1000),
+    }
+
+
+def run(rounds: int) -> dict:
+    results = {}
+    for name, (batch, size) in _benchmarks().items():
+        batch()
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            batch()
+            timings.append((time.perf_counter() - started) / size)
+        results[name] = {
+            "rows_per_batch": size,
+            "min_us": round(min(timings) * 1e6, 3),
+            "median_us": round(statistics.median(timings) * 1e6, 3),
+        }
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> tuple[dict, bool]:
+    report = {}
+    regressed = False
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base:
+            report[name] = {"current_us": result["min_us"], "baseline_us": None}
+            continue
+        change = result["min_us"] / base["min_us"] - 1
+        is_regression = change > threshold
+        regressed = regressed or is_regression
+        report[name] = {
+            "current_us": result["min_us"],
+            "baseline_us": base["min_us"],
+            "change": f"{change:+.1%}",
+            "regression": is_regression,
+        }
+    return report, regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Services micro-benchmarks")
+    parser.add_argument("command", choices=["run", "compare"])
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SEED_DEMO_USERS", "false")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    current = run(args.rounds)
+    if args.command == "run":
+        print(json.dumps(current, indent=2))
+        if args.save:
+            os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+            with open(args.baseline, "w", encoding="utf-8") as handle:
+                json.dump(current, handle, indent=2)
+                handle.write("\n")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    report, regressed = compare(current, baseline, args.threshold)
+    print(json.dumps(report, indent=2))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+# End-to-end benchmark of the non-mock M-Pesa pipeline: checkout -> job queue -> Daraja
+# simulator -> asynchronous callback -> inbox -> final status, all on localhost.
+#
+#   python -m benchmarks.payment_pipeline --checkouts 200 --concurrency 20
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _serve(app, port: int):
+    import uvicorn
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="End-to-end M-Pesa pipeline benchmark")
+    parser.add_argument("--checkouts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--callback-delay-ms", type=float, default=300.0)
+    parser.add_argument("--drop-callback-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    sim_port = _free_port()
+    api_port = _free_port()
+    workdir = tempfile.mkdtemp(prefix="farmart-pipeline-")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            "MPESA_MOCK": "false",
+            "SEED_DEMO_USERS": "false",
+            "DARAJA_BASE_URL": f"http://127.0.0.1:{sim_port}",
+            "DARAJA_CONSUMER_KEY": "sim-key",
+            "DARAJA_CONSUMER_SECRET": "sim-secret",
+            "DARAJA_SHORTCODE": "174379",
+            "DARAJA_PASSKEY": "sim-passkey",
+            "DARAJA_CALLBACK_URL": f"http://127.0.0.1:{api_port}/payments/mpesa/callback",
+            "RECONCILE_STALE_AFTER_SECONDS": "5",
+            "RECONCILE_INTERVAL_SECONDS": "5",
+        }
+    )
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import httpx
+
+    from app.main import app as api_app
+    from benchmarks.daraja_simulator import SimulatorConfig, create_app
+
+    simulator = create_app(
+        SimulatorConfig(
+            latency_ms=args.latency_ms,
+            error_rate=args.error_rate,
+            callback_delay_ms=args.callback_delay_ms,
+            drop_callback_rate=args.drop_callback_rate,
+        )
+    )
+    sim_server, _ = _serve(simulator, sim_port)
+    api_server, _ = _serve(api_app, api_port)
+
+    base_url = f"http://127.0.0.1:{api_port}"
+    with httpx.Client(base_url=base_url, timeout=60.0) as client:
+        client.post(
+            "/auth/register",
+            json={"name": "Bench", "email": "bench@example.com", "password": "bench123"},
+        )
+        token = client.post(
+            "/auth/login", json={"email": "bench@example.com", "password": "bench123"}
+        ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    checkout = {
+        "items": [{"title": "Heifer", "price": "1000", "qty": 1}],
+        "subtotal": 1000,
+        "shipping": 0,
+        "total": 1000,
+        "phoneNumber": "0712345678",
+    }
+
+    checkout_latencies: list[float] = []
+    settle_latencies: list[float] = []
+    outcomes: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def run_one(client: httpx.Client) -> None:
+        started = time.perf_counter()
+        response = client.post("/payments/mpesa/stk-push", json=checkout, headers=headers)
+        checkout_latencies.append(time.perf_counter() - started)
+        order_id = response.json()["order"]["id"]
+        deadline = started + args.timeout
+        status = "PENDING"
+        while time.perf_counter() < deadline:
+            body = client.get(
+                f"/payments/{order_id}/status", params={"wait": 10}, headers=headers
+            ).json()
+            status = body["status"]
+            if status in {"SUCCESS", "FAILED"}:
+                settle_latencies.append(time.perf_counter() - started)
+                break
+        with lock:
+            outcomes[status] = outcomes.get(status, 0) + 1
+
+    started = time.perf_counter()
+    with httpx.Client(
+        base_url=base_url,
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=args.concurrency * 2),
+    ) as client, ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(lambda _: run_one(client), range(args.checkouts)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "checkouts": args.checkouts,
+        "concurrency": args.concurrency,
+        "daraja_latency_ms": args.latency_ms,
+        "callback_delay_ms": args.callback_delay_ms,
+        "seconds": round(elapsed, 3),
+        "checkouts_per_second": round(args.checkouts / elapsed, 1),
+        "checkout_request": summarize(checkout_latencies),
+        "time_to_final_status": summarize(settle_latencies),
+        "outcomes": outcomes,
+        "simulator": simulator.state.simulator.counters,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(result, handle, indent=2)
+
+    api_server.should_exit = True
+    sim_server.should_exit = True
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+# Measures reconciler throughput against an in-process Daraja stub.
+#
+#   python -m benchmarks.reconcile --count 10000 --latency-ms 20 --concurrency 8 16
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def _configure_env(db_path: str) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["MPESA_MOCK"] = "false"
+    os.environ["SEED_DEMO_USERS"] = "false"
+    os.environ.setdefault("DARAJA_CONSUMER_KEY", "bench-key")
+    os.environ.setdefault("DARAJA_CONSUMER_SECRET", "bench-secret")
+    os.environ.setdefault("DARAJA_SHORTCODE", "174379")
+    os.environ.setdefault("DARAJA_PASSKEY", "bench-passkey")
+    # The sweep runs alone here, with no live pushes to protect, so it may use 16 query slots.
+    os.environ.setdefault("DARAJA_QUERY_MAX_IN_FLIGHT", "16")
+
+
+def _stub_transport(latency_ms: float, pending_ratio: float):
+    import httpx
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.startswith("/oauth"):
+            return httpx.Response(200, json={"access_token": "stub", "expires_in": "3599"})
+        time.sleep(latency_ms / 1000)
+        checkout_request_id = json.loads(request.content)["CheckoutRequestID"]
+        if random.random() < pending_ratio:
+            return httpx.Response(
+                500,
+                json={
+                    "requestId": checkout_request_id,
+                    "errorCode": "500.001.1001",
+                    "errorMessage": "The transaction is being processed",
+                },
+            )
+        result_code = "0" if random.random() < 0.8 else "1032"
+        return httpx.Response(
+            200,
+            json={
+                "ResponseCode": "0",
+                "CheckoutRequestID": checkout_request_id,
+                "ResultCode": result_code,
+                "ResultDesc": "The service request is processed successfully."
+                if result_code == "0"
+                else "Request cancelled by user",
+            },
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def _seed(count: int) -> None:
+    from sqlalchemy import delete, insert
+
+    from app.database import Base, SessionLocal, engine
+    from app.models import MpesaTransaction, Order, PaymentStatus, User, UserRole
+
+    Base.metadata.create_all(bind=engine)
+    created_at = datetime.utcnow() - timedelta(hours=1)
+    with SessionLocal() as db:
+        db.execute(delete(MpesaTransaction))
+        db.execute(delete(Order))
+        db.execute(delete(User))
+        buyer = User(
+            name="Bench Buyer",
+            email="bench-buyer@example.com",
+            password_hash="x",
+            role=UserRole.buyer,
+        )
+        db.add(buyer)
+        db.flush()
+        db.execute(
+            insert(Order),
+            [
+                {
+                    "id": index,
+                    "buyer_id": buyer.id,
+                    "buyer_email": buyer.email,
+                    "total": 100,
+                    "payment_status": PaymentStatus.pending,
+                    "created_at": created_at,
+                }
+                for index in range(1, count + 1)
+            ],
+        )
+        db.execute(
+            insert(MpesaTransaction),
+            [
+                {
+                    "order_id": index,
+                    "checkout_request_id": f"ws_CO_bench_{index}",
+                    "phone_number": "254700000000",
+                    "status": PaymentStatus.pending,
+                    "created_at": created_at,
+                }
+                for index in range(1, count + 1)
+            ],
+        )
+        db.commit()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reconciler throughput benchmark")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--pending-ratio", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="farmart-reconcile-")
+    _configure_env(os.path.join(workdir, "bench.db"))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import httpx
+
+    from app import daraja
+    from app.config import settings
+    from app.reconciler import reconcile_stale_transactions
+
+    # Above the query bulkhead the extra queries are shed, not sent, and the numbers lie.
+    limit = settings.daraja_query_max_in_flight
+    if max(args.concurrency) > limit:
+        parser.error(f"--concurrency above DARAJA_QUERY_MAX_IN_FLIGHT={limit}")
+
+    daraja.set_client(httpx.Client(transport=_stub_transport(args.latency_ms, args.pending_ratio)))
+
+    results = []
+    for concurrency in args.concurrency:
+        _seed(args.count)
+        started = time.perf_counter()
+        resolved = reconcile_stale_transactions(
+            stale_after_seconds=60, page_size=args.page_size, concurrency=concurrency
+        )
+        elapsed = time.perf_counter() - started
+        result = {
+            "transactions": args.count,
+            "resolved": resolved,
+            "concurrency": concurrency,
+            "latency_ms": args.latency_ms,
+            "page_size": args.page_size,
+            "seconds": round(elapsed, 3),
+            "per_second": round(args.count / elapsed, 1),
+        }
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
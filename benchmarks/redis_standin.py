@@ -0,0 +1,164 @@
+# Local stand-in for Redis speaking RESP2, covering the commands the cache backend uses
+# (GET/SET PX/DEL/SADD/SMEMBERS/EXPIRE/SCAN/PUBLISH/SUBSCRIBE).
+#
+#   python -m benchmarks.redis_standin --port 6390
+#
+# Point the API at it with CACHE_BACKEND=redis CACHE_URL=redis://127.0.0.1:6390/0.
+import argparse
+import asyncio
+import fnmatch
+import time
+
+
+class Store:
+    def __init__(self) -> None:
+        self.values: dict[bytes, object] = {}
+        self.expires: dict[bytes, float] = {}
+        self.subscribers: dict[bytes, set[asyncio.StreamWriter]] = {}
+
+    def _alive(self, key: bytes) -> bool:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and time.monotonic() >= expires_at:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values
+
+    def get(self, key: bytes):
+        return self.values[key] if self._alive(key) else None
+
+    def delete(self, key: bytes) -> int:
+        existed = self._alive(key)
+        self.values.pop(key, None)
+        self.expires.pop(key, None)
+        return int(existed)
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode()
+    if value is True:
+        return b"+OK\r\n"
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, str):
+        return _encode(value.encode())
+    if isinstance(value, (list, tuple, set)):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    raise TypeError(type(value))
+
+
+async def _read_command(reader: asyncio.StreamReader) -> list[bytes] | None:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.strip().split()
+    parts = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        parts.append((await reader.readexactly(size + 2))[:-2])
+    return parts
+
+
+def _execute(store: Store, args: list[bytes], writer: asyncio.StreamWriter):
+    name = args[0].upper()
+    if name == b"PING":
+        return b"PONG"
+    if name in {b"CLIENT", b"SELECT"}:
+        return True
+    if name == b"GET":
+        value = store.get(args[1])
+        return value if value is None or isinstance(value, bytes) else Exception("WRONGTYPE")
+    if name == b"SET":
+        key = args[1]
+        store.delete(key)
+        store.values[key] = args[2]
+        options = [arg.upper() for arg in args[3:]]
+        if b"PX" in options:
+            store.expires[key] = time.monotonic() + int(args[3 + options.index(b"PX") + 1]) / 1000
+        elif b"EX" in options:
+            store.expires[key] = time.monotonic() + int(args[3 + options.index(b"EX") + 1])
+        return True
+    if name == b"DEL":
+        return sum(store.delete(key) for key in args[1:])
+    if name == b"EXPIRE":
+        if not store._alive(args[1]):
+            return 0
+        store.expires[args[1]] = time.monotonic() + int(args[2])
+        return 1
+    if name == b"SADD":
+        members = store.get(args[1])
+        if members is None:
+            members = store.values[args[1]] = set()
+        before = len(members)
+        members.update(args[2:])
+        return len(members) - before
+    if name == b"SMEMBERS":
+        return store.get(args[1]) or set()
+    if name == b"SCAN":
+        pattern = b"*"
+        for index, arg in enumerate(args):
+            if arg.upper() == b"MATCH":
+                pattern = args[index + 1]
+        keys = [key for key in list(store.values) if store._alive(key)]
+        matched = [key for key in keys if fnmatch.fnmatchcase(key.decode(), pattern.decode())]
+        return [b"0", matched]
+    if name == b"PUBLISH":
+        receivers = store.subscribers.get(args[1], set())
+        for subscriber in list(receivers):
+            subscriber.write(_encode([b"message", args[1], args[2]]))
+        return len(receivers)
+    if name == b"SUBSCRIBE":
+        replies = b""
+        for count, channel in enumerate(args[1:], start=1):
+            store.subscribers.setdefault(channel, set()).add(writer)
+            replies += _encode([b"subscribe", channel, count])
+        return replies
+    return Exception(f"unknown command '{name.decode()}'")
+
+
+def serve(store: Store):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                args = await _read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                reply = _execute(store, args, writer)
+                # SUBSCRIBE returns its already-encoded confirmations.
+                writer.write(reply if args[0].upper() == b"SUBSCRIBE" else _encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for subscribers in store.subscribers.values():
+                subscribers.discard(writer)
+            writer.close()
+
+    return handle
+
+
+async def _main(host: str, port: int) -> None:
+    server = await asyncio.start_server(serve(Store()), host, port)
+    print(f"Redis stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Minimal Redis-protocol stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
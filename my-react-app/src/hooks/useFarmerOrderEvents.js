@@ -0,0 +1,50 @@
+import { useEffect, useRef } from 'react'
+import { apiUrl } from '../utils/api'
+
+function eventsUrl(token) {
+  const url = new URL(apiUrl('/orders/events'), window.location.href)
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:'
+  url.searchParams.set('token', token)
+  return url.toString()
+}
+
+export default function useFarmerOrderEvents(token, onEvent) {
+  const handlerRef = useRef(onEvent)
+  handlerRef.current = onEvent
+
+  useEffect(() => {
+    if (!token) return undefined
+    let socket = null
+    let retryTimer = null
+    let retryDelay = 1000
+    let closed = false
+
+    function connect() {
+      socket = new WebSocket(eventsUrl(token))
+      socket.onopen = () => {
+        retryDelay = 1000
+      }
+      socket.onmessage = (message) => {
+        try {
+          const event = JSON.parse(message.data)
+          if (event.type !== 'ping') handlerRef.current(event)
+        } catch {
+          // Ignore malformed frames.
+        }
+      }
+      socket.onclose = (event) => {
+        // 1008: the token was rejected, so retrying cannot help.
+        if (closed || event.code === 1008) return
+        retryTimer = setTimeout(connect, retryDelay)
+        retryDelay = Math.min(retryDelay * 2, 30000)
+      }
+    }
+
+    connect()
+    return () => {
+      closed = true
+      clearTimeout(retryTimer)
+      if (socket) socket.close()
+    }
+  }, [token])
+}
@@ -14,6 +14,7 @@ export default function Market() {
   const [query, setQuery] = useState('')
   const [toast, setToast] = useState('')
   const [allListings, setAllListings] = useState([])
+  const [categoryCounts, setCategoryCounts] = useState({})
   const [cartCount, setCartCount] = useState(0)
   const isFarmer = isFarmerUser()
   const decisionCount = useOrderDecisionCount()
@@ -115,6 +116,28 @@ export default function Market() {
     }
   }, [])
 
+  useEffect(() => {
+    let cancelled = false
+    async function loadFacets() {
+      try {
+        const res = await fetch(apiUrl('/listings/facets'))
+        if (!res.ok) return
+        const data = await res.json()
+        const counts = { All: data.total || 0 }
+        for (const entry of data.category || []) {
+          if (entry.value) counts[entry.value] = entry.count
+        }
+        if (!cancelled) setCategoryCounts(counts)
+      } catch {
+        // Counts are decorative; the chips work without them.
+      }
+    }
+    loadFacets()
+    return () => {
+      cancelled = true
+    }
+  }, [])
+
   useEffect(() => {
     try {
       const cart = JSON.parse(localStorage.getItem('cart') || '[]')
@@ -260,6 +283,9 @@ export default function Market() {
                   }`}
                 >
                   {filter}
+                  {categoryCounts[filter] !== undefined && (
+                    <span className="ml-2 text-xs opacity-75">{categoryCounts[filter]}</span>
+                  )}
                 </button>
               ))}
             </div>
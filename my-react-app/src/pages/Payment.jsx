@@ -68,70 +68,69 @@ export default function Payment() {
     if (!activeOrderId || !token) return undefined
     let cancelled = false
     let attempts = 0
-    const maxAttempts = 24
+    let timer = null
+    // Each request parks on the server for up to 25s until the payment status changes.
+    const maxAttempts = 5
 
-    const timer = setInterval(async () => {
+    const finishTimedOut = (message) => {
+      if (!cancelled) {
+        setIsPaying(false)
+        setActiveOrderId(null)
+        setPaymentMessage(message)
+      }
+    }
+
+    const poll = async () => {
       attempts += 1
       try {
-        const res = await fetch(apiUrl(`/payments/${activeOrderId}/status`), {
+        const res = await fetch(apiUrl(`/payments/${activeOrderId}/status?wait=25`), {
           headers: token ? { Authorization: `Bearer ${token}` } : {},
         })
+        if (cancelled) return
         if (!res.ok) {
           if (attempts >= maxAttempts) {
-            clearInterval(timer)
-            if (!cancelled) {
-              setIsPaying(false)
-              setPaymentMessage('Payment confirmation timed out. Check again in Orders.')
-              setActiveOrderId(null)
-            }
+            finishTimedOut('Payment confirmation timed out. Check again in Orders.')
+          } else {
+            timer = setTimeout(poll, 5000)
           }
           return
         }
         const data = await res.json()
+        if (cancelled) return
         if (data.status === 'SUCCESS') {
-          clearInterval(timer)
-          if (!cancelled) {
-            localStorage.setItem('cart', JSON.stringify([]))
-            setCart([])
-            setShowPaid(true)
-            setIsPaying(false)
-            setActiveOrderId(null)
-            setPaymentMessage('Payment confirmed.')
-            setTimeout(() => {
-              setShowPaid(false)
-              navigate('/orders')
-            }, 1200)
-          }
+          localStorage.setItem('cart', JSON.stringify([]))
+          setCart([])
+          setShowPaid(true)
+          setIsPaying(false)
+          setActiveOrderId(null)
+          setPaymentMessage('Payment confirmed.')
+          setTimeout(() => {
+            setShowPaid(false)
+            navigate('/orders')
+          }, 1200)
         } else if (data.status === 'FAILED') {
-          clearInterval(timer)
-          if (!cancelled) {
-            setIsPaying(false)
-            setActiveOrderId(null)
-            setError(data.resultDesc || 'Payment failed. Please try again.')
-          }
+          setIsPaying(false)
+          setActiveOrderId(null)
+          setError(data.resultDesc || 'Payment failed. Please try again.')
         } else if (attempts >= maxAttempts) {
-          clearInterval(timer)
-          if (!cancelled) {
-            setIsPaying(false)
-            setActiveOrderId(null)
-            setPaymentMessage('Payment confirmation timed out. Check again in Orders.')
-          }
+          finishTimedOut('Payment confirmation timed out. Check again in Orders.')
+        } else {
+          timer = setTimeout(poll, 0)
         }
       } catch {
         if (attempts >= maxAttempts) {
-          clearInterval(timer)
-          if (!cancelled) {
-            setIsPaying(false)
-            setActiveOrderId(null)
-            setPaymentMessage('Could not confirm payment. Check your order status.')
-          }
+          finishTimedOut('Could not confirm payment. Check your order status.')
+        } else {
+          timer = setTimeout(poll, 5000)
         }
       }
-    }, 5000)
+    }
+
+    poll()
 
     return () => {
       cancelled = true
-      clearInterval(timer)
+      clearTimeout(timer)
     }
   }, [activeOrderId, token, navigate])
 
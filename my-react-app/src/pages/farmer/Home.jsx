@@ -3,6 +3,7 @@ import { Link } from 'react-router-dom'
 import { apiUrl } from '../../utils/api'
 import cattleImage from '../../assets/cattle.jpeg'
 import Footer from '../../components/Footer'
+import useFarmerOrderEvents from '../../hooks/useFarmerOrderEvents'
 import { getAuthToken, getSessionUser } from '../../utils/session'
 
 export default function FarmerHome() {
@@ -76,6 +77,34 @@ export default function FarmerHome() {
     }
   }, [token])
 
+  // New orders and payment changes are pushed over the socket instead of re-polling /orders.
+  useFarmerOrderEvents(token, (event) => {
+    if (event.type === 'order.created' && event.order) {
+      setOrders((prev) =>
+        prev.some((order) => order.id === event.order.id) ? prev : [event.order, ...prev]
+      )
+    } else if (event.type === 'payment.status' && event.payment) {
+      const { orderId, status, paymentMethod, receipt, resultDesc } = event.payment
+      const applyPayment = (order) =>
+        order.id === orderId
+          ? {
+              ...order,
+              paymentStatus: status,
+              paymentMethod: paymentMethod || order.paymentMethod,
+              paymentReceipt: receipt || order.paymentReceipt,
+              resultDesc,
+            }
+          : order
+      setOrders((prev) => prev.map(applyPayment))
+      setSelectedOrder((prev) => (prev ? applyPayment(prev) : prev))
+    } else if (event.type === 'order.status') {
+      const applyStatus = (order) =>
+        order.id === event.orderId ? { ...order, status: event.status } : order
+      setOrders((prev) => prev.map(applyStatus))
+      setSelectedOrder((prev) => (prev ? applyStatus(prev) : prev))
+    }
+  })
+
   useEffect(() => {
     let cancelled = false
     async function loadPaymentSummary() {
@@ -0,0 +1,38 @@
+import itertools
+import os
+import tempfile
+
+# Settings are read at import time, so the app must see these before it is imported.
+_scratch = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["MEDIA_ROOT"] = os.path.join(_scratch, "media")
+os.environ["SEED_DEMO_USERS"] = "false"
+os.environ["JOB_WORKER_EMBEDDED"] = "false"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+_users = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def login(client):
+    # Every call registers a fresh user, so tests never share accounts.
+    def login(role: str = "buyer") -> dict:
+        email = f"{role}{next(_users)}@example.com"
+        client.post(
+            "/auth/register",
+            json={"name": "Test", "email": email, "password": "secret12", "role": role},
+        )
+        response = client.post("/auth/login", json={"email": email, "password": "secret12"})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return login
@@ -0,0 +1,88 @@
+from sqlalchemy import func, select
+
+from app.database import SessionLocal
+from app.models import Listing
+
+
+def _titles(ids: list[int]) -> list[str]:
+    with SessionLocal() as db:
+        rows = db.execute(select(Listing.id, Listing.title).where(Listing.id.in_(ids))).all()
+    titles = dict(rows)
+    return [titles[listing_id] for listing_id in ids]
+
+
+def _listing_count() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count(Listing.id)))
+
+
+def test_json_import_returns_ids_in_input_order(client, login):
+    rows = [{"title": f"Heifer {index}", "price": "30000"} for index in range(5)]
+
+    response = client.post("/listings/bulk", json=rows, headers=login("farmer"))
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created"] == 5
+    assert [row["row"] for row in data["rows"]] == [1, 2, 3, 4, 5]
+    assert [row["id"] for row in data["rows"]] == data["ids"]
+    assert _titles(data["ids"]) == [row["title"] for row in rows]
+
+
+def test_atomic_import_rejects_the_whole_batch(client, login):
+    before = _listing_count()
+    rows = [{"title": "Bull", "price": "50000"}, {"title": "", "price": "1"}]
+
+    response = client.post("/listings/bulk", json=rows, headers=login("farmer"))
+
+    assert response.status_code == 422
+    assert response.json()["detail"]["errors"][0]["row"] == 2
+    assert _listing_count() == before
+
+
+def test_non_atomic_import_keeps_the_valid_rows(client, login):
+    rows = [
+        {"title": "Bad", "price": ""},
+        {"title": "Ox", "price": "40000"},
+        {"title": "Inline", "price": "1", "imageUrl": "data:image/png;base64,AAAA"},
+        {"title": "Calf", "price": "9000"},
+    ]
+
+    response = client.post("/listings/bulk?atomic=false", json=rows, headers=login("farmer"))
+
+    assert response.status_code == 201
+    data = response.json()
+    assert [row["row"] for row in data["rows"]] == [2, 4]
+    assert [error["row"] for error in data["errors"]] == [1, 3]
+    assert _titles(data["ids"]) == ["Ox", "Calf"]
+
+
+def test_csv_upload(client, login):
+    csv_text = "title,price,breed\nGoat,5000,Boer\nSheep,4000,\n"
+
+    response = client.post(
+        "/listings/bulk",
+        files={"file": ("listings.csv", csv_text.encode("utf-8"), "text/csv")},
+        headers=login("farmer"),
+    )
+
+    assert response.status_code == 201
+    assert _titles(response.json()["ids"]) == ["Goat", "Sheep"]
+
+
+def test_non_utf8_upload_is_rejected(client, login):
+    response = client.post(
+        "/listings/bulk",
+        content="title,price\nNg'ombe caf\xe9,100\n".encode("latin-1"),
+        headers={**login("farmer"), "Content-Type": "text/csv"},
+    )
+
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["detail"]
+
+
+def test_buyers_cannot_import(client, login):
+    rows = [{"title": "Cow", "price": "1"}]
+    response = client.post("/listings/bulk", json=rows, headers=login())
+
+    assert response.status_code == 403
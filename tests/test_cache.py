@@ -0,0 +1,110 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.cache import Cache, CoalescingCache
+from app.metrics import REGISTRY
+
+_namespaces = itertools.count(1)
+
+
+class Loader:
+    # Counts calls and, while `gate` is clear, blocks them so tests can line up races.
+    def __init__(self) -> None:
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+
+    def __call__(self, key):
+        self.calls += 1
+        self.started.set()
+        self.gate.wait(5)
+        return f"{key}-v{self.calls}"
+
+
+@pytest.fixture
+def cache():
+    return CoalescingCache(
+        Cache(f"test-coalescing-{next(_namespaces)}"), ttl_seconds=60, stale_seconds=60
+    )
+
+
+def _entries_gauge(namespace: str) -> float | None:
+    for sample in REGISTRY.snapshot("cache_entries")["cache_entries"]:
+        if sample["labels"] == {"cache": namespace}:
+            return sample["value"]
+    return None
+
+
+def test_entries_gauge_counts_each_namespace():
+    first, second = Cache("test-gauge-a"), Cache("test-gauge-b")
+    for index in range(3):
+        first.set(index, "value", ttl=60)
+    second.set("only", "value", ttl=60)
+
+    assert _entries_gauge("test-gauge-a") == 3
+    assert _entries_gauge("test-gauge-b") == 1
+
+    first.clear()
+    assert _entries_gauge("test-gauge-a") == 0
+
+
+def test_concurrent_misses_share_one_load(cache):
+    loader = Loader()
+    loader.gate.clear()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = [pool.submit(cache.get, "cow", loader) for _ in range(5)]
+        loader.started.wait(5)
+        time.sleep(0.05)
+        loader.gate.set()
+
+    assert [result.result() for result in results] == ["cow-v1"] * 5
+    assert loader.calls == 1
+    assert cache.get("cow", loader) == "cow-v1"
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached(cache):
+    def broken(key):
+        raise LookupError(key)
+
+    with pytest.raises(LookupError):
+        cache.get("cow", broken)
+
+    assert cache.get("cow", Loader()) == "cow-v1"
+
+
+def test_stale_entry_is_served_while_it_refreshes(cache):
+    loader = Loader()
+    cache.ttl_seconds = 0.05
+    cache.get("cow", loader)
+    time.sleep(0.1)
+
+    loader.started.clear()
+    assert cache.get("cow", loader) == "cow-v1"
+    loader.started.wait(5)
+    deadline = time.monotonic() + 5
+    while cache.cache.get("cow")[0] != "cow-v2" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    cache.ttl_seconds = 60
+    assert cache.get("cow", loader) == "cow-v2"
+    assert loader.calls == 2
+
+
+def test_invalidation_during_a_load_discards_its_result(cache):
+    loader = Loader()
+    loader.gate.clear()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(cache.get, "cow", loader)
+        loader.started.wait(5)
+        # The listing changed while the old row was being read.
+        cache.invalidate("cow")
+        loader.gate.set()
+
+    # The caller that started the load still gets its answer, but it is not kept.
+    assert pending.result() == "cow-v1"
+    assert cache.get("cow", loader) == "cow-v2"
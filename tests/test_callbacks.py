@@ -0,0 +1,139 @@
+import itertools
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from app import callbacks
+from app.config import settings
+from app.database import SessionLocal
+from app.models import MpesaCallbackInbox, MpesaTransaction, Order, PaymentStatus, User
+
+_checkouts = itertools.count(1)
+
+
+@pytest.fixture(autouse=True)
+def empty_inbox(monkeypatch):
+    with SessionLocal() as db:
+        db.execute(delete(MpesaCallbackInbox))
+        db.commit()
+    # Waiting callbacks are retried on every pass, not on the production schedule.
+    monkeypatch.setattr(settings, "mpesa_callback_retry_seconds", 0)
+
+
+def _checkout_id() -> str:
+    return f"ws_CO_callback_{next(_checkouts)}"
+
+
+def _callback(checkout_request_id: str, result_code: int = 0) -> dict:
+    callback = {"CheckoutRequestID": checkout_request_id, "ResultCode": result_code}
+    callback["ResultDesc"] = "Processed" if result_code == 0 else "Cancelled"
+    if result_code == 0:
+        callback["CallbackMetadata"] = {"Item": [{"Name": "MpesaReceiptNumber", "Value": "RCP1"}]}
+    return {"Body": {"stkCallback": callback}}
+
+
+def _pending_transaction(checkout_request_id: str) -> int:
+    with SessionLocal() as db:
+        buyer = User(name="Buyer", email=f"{checkout_request_id}@example.com", password_hash="x")
+        db.add(buyer)
+        db.flush()
+        order = Order(
+            buyer_id=buyer.id,
+            buyer_email=buyer.email,
+            total=100,
+            payment_status=PaymentStatus.pending,
+        )
+        db.add(order)
+        db.flush()
+        db.add(MpesaTransaction(order_id=order.id, checkout_request_id=checkout_request_id))
+        db.commit()
+        return order.id
+
+
+def _inbox(checkout_request_id: str) -> list[MpesaCallbackInbox]:
+    with SessionLocal() as db:
+        return db.scalars(
+            select(MpesaCallbackInbox).where(
+                MpesaCallbackInbox.checkout_request_id == checkout_request_id
+            )
+        ).all()
+
+
+def _payment_status(order_id: int) -> PaymentStatus:
+    with SessionLocal() as db:
+        return db.get(Order, order_id).payment_status
+
+
+def test_replayed_callback_is_stored_once(client):
+    checkout_request_id = _checkout_id()
+    for _ in range(2):
+        response = client.post("/payments/mpesa/callback", json=_callback(checkout_request_id))
+        assert response.json()["ResultCode"] == 0
+
+    assert len(_inbox(checkout_request_id)) == 1
+    assert not callbacks.store_mpesa_callback(checkout_request_id, "{}")
+
+
+def test_callback_is_applied_to_its_transaction(client):
+    checkout_request_id = _checkout_id()
+    order_id = _pending_transaction(checkout_request_id)
+    client.post("/payments/mpesa/callback", json=_callback(checkout_request_id))
+
+    callbacks.process_callback_inbox(10)
+
+    assert _inbox(checkout_request_id)[0].outcome == "applied"
+    assert _payment_status(order_id) == PaymentStatus.success
+    with SessionLocal() as db:
+        assert db.get(Order, order_id).payment_receipt == "RCP1"
+
+
+def test_callback_for_a_settled_transaction_is_a_duplicate(client):
+    checkout_request_id = _checkout_id()
+    order_id = _pending_transaction(checkout_request_id)
+    with SessionLocal() as db:
+        db.execute(
+            update(MpesaTransaction)
+            .where(MpesaTransaction.checkout_request_id == checkout_request_id)
+            .values(status=PaymentStatus.success)
+        )
+        db.commit()
+    client.post("/payments/mpesa/callback", json=_callback(checkout_request_id, result_code=1))
+
+    callbacks.process_callback_inbox(10)
+
+    assert _inbox(checkout_request_id)[0].outcome == "duplicate"
+    assert _payment_status(order_id) == PaymentStatus.pending
+
+
+def test_early_callback_waits_for_its_transaction(client):
+    checkout_request_id = _checkout_id()
+    client.post("/payments/mpesa/callback", json=_callback(checkout_request_id, result_code=1))
+
+    callbacks.process_callback_inbox(10)
+    assert _inbox(checkout_request_id)[0].outcome == callbacks.WAITING
+
+    order_id = _pending_transaction(checkout_request_id)
+    callbacks.process_callback_inbox(10)
+
+    row = _inbox(checkout_request_id)[0]
+    assert row.outcome == "applied"
+    assert row.processed_at is not None
+    assert _payment_status(order_id) == PaymentStatus.failed
+
+
+def test_callback_without_a_transaction_is_unmatched_after_the_grace_period():
+    checkout_request_id = _checkout_id()
+    callbacks.store_mpesa_callback(checkout_request_id, json.dumps(_callback(checkout_request_id)))
+    callbacks.process_callback_inbox(10)
+
+    with SessionLocal() as db:
+        expired = datetime.utcnow() - timedelta(
+            seconds=settings.mpesa_callback_match_grace_seconds + 1
+        )
+        db.execute(update(MpesaCallbackInbox).values(received_at=expired))
+        db.commit()
+    callbacks.process_callback_inbox(10)
+
+    assert _inbox(checkout_request_id)[0].outcome == "unmatched"
@@ -0,0 +1,88 @@
+import itertools
+
+import pytest
+
+from app.database import SessionLocal
+from app.facets import rebuild_facet_counts
+
+_categories = itertools.count(1)
+
+
+@pytest.fixture(autouse=True)
+def counted():
+    # The worker's first count; from here on listing writes maintain the counters.
+    with SessionLocal() as db:
+        rebuild_facet_counts(db)
+        db.commit()
+
+
+def _category() -> str:
+    return f"Facetcat{next(_categories)}"
+
+
+def _counts(client, facet: str = "category", **filters) -> dict:
+    data = client.get("/listings/facets", params=filters).json()
+    return {item["value"]: item["count"] for item in data[facet]} | {"total": data["total"]}
+
+
+def _create(client, headers: dict, category: str, **extra) -> int:
+    body = {"title": "Cow", "price": "1000", "category": category, **extra}
+    response = client.post("/listings", json=body, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_counters_follow_creates_updates_and_deletes(client, login):
+    farmer = login("farmer")
+    first, second = _category(), _category()
+    before = _counts(client)["total"]
+
+    moved = _create(client, farmer, first)
+    deleted = _create(client, farmer, first)
+    counts = _counts(client)
+    assert (counts[first], counts["total"]) == (2, before + 2)
+
+    body = {"title": "Cow", "price": "1000", "category": second}
+    client.put(f"/listings/{moved}", json=body, headers=farmer)
+    counts = _counts(client)
+    assert (counts[first], counts[second]) == (1, 1)
+
+    client.delete(f"/listings/{deleted}", headers=farmer)
+    counts = _counts(client)
+    assert first not in counts
+    assert (counts[second], counts["total"]) == (1, before + 1)
+
+
+def test_bulk_import_is_counted(client, login):
+    category = _category()
+    rows = [{"title": "Goat", "price": "500", "category": category} for _ in range(3)]
+    client.post("/listings/bulk", json=rows, headers=login("farmer"))
+
+    assert _counts(client)[category] == 3
+
+
+def test_counters_match_a_full_recount(client, login):
+    farmer = login("farmer")
+    category = _category()
+    listing_id = _create(client, farmer, category, breed="Boran")
+    body = {"title": "Cow", "price": "1000", "category": category, "breed": "Zebu"}
+    client.put(f"/listings/{listing_id}", json=body, headers=farmer)
+    _create(client, farmer, category, location="Kitale")
+    maintained = client.get("/listings/facets").json()
+
+    with SessionLocal() as db:
+        rebuild_facet_counts(db)
+        db.commit()
+
+    assert client.get("/listings/facets").json() == maintained
+
+
+def test_filtered_counts_ignore_their_own_filter(client, login):
+    farmer = login("farmer")
+    category = _category()
+    _create(client, farmer, category, breed="Boran")
+    _create(client, farmer, category, breed="Zebu")
+
+    counts = _counts(client, "breed", category=category, breed="Boran")
+
+    assert (counts["Boran"], counts["Zebu"], counts["total"]) == (1, 1, 1)
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import delete
+
+from app import gateways, jobs, services
+from app.database import SessionLocal
+from app.gateways import PaymentGateway, PaymentRequest, PaymentResult
+from app.models import Job, JobStatus, MpesaTransaction, Order, PaymentMethod, PaymentStatus, User
+
+
+class RecordingGateway(PaymentGateway):
+    name = "test_batch"
+    method = PaymentMethod.mpesa
+    asynchronous = True
+
+    def __init__(self) -> None:
+        self.batches: list[list[int]] = []
+
+    def initiate_many(self, requests, *, concurrency=None):
+        self.batches.append([request.order_id for request in requests])
+        return super().initiate_many(requests, concurrency=concurrency)
+
+    def _initiate(self, request: PaymentRequest) -> PaymentResult:
+        if request.phone.endswith("0"):
+            raise RuntimeError("gateway down")
+        return PaymentResult(
+            status=PaymentStatus.pending,
+            result_desc="sent",
+            checkout_request_id=f"ws_CO_test_{request.order_id}",
+            raw_payload="{}",
+        )
+
+
+@pytest.fixture
+def gateway():
+    gateway = gateways.register_gateway(RecordingGateway())
+    with SessionLocal() as db:
+        db.execute(delete(Job))
+        db.commit()
+    yield gateway
+    gateways._gateways.pop(gateway.name)
+
+
+def _queue_payments(gateway: PaymentGateway, phones: list[str]) -> list[int]:
+    with SessionLocal() as db:
+        buyer = db.query(User).first() or User(
+            name="Buyer", email="gateway-buyer@example.com", password_hash="x"
+        )
+        db.add(buyer)
+        db.flush()
+        order_ids = []
+        for phone in phones:
+            order = Order(buyer_id=buyer.id, buyer_email=buyer.email, total=100)
+            db.add(order)
+            db.flush()
+            services.start_payment(
+                db,
+                order=order,
+                gateway=gateway,
+                request=PaymentRequest(order_id=order.id, amount=100, phone=phone),
+                queued_desc="queued",
+            )
+            order_ids.append(order.id)
+        db.commit()
+    return order_ids
+
+
+def test_gateway_requires_initiate():
+    with pytest.raises(TypeError):
+        PaymentGateway()
+
+
+def test_queued_payments_are_pushed_in_one_batch(gateway):
+    order_ids = _queue_payments(gateway, ["254700000001", "254700000002", "254700000010"])
+
+    with SessionLocal() as db:
+        job_ids = jobs.claim_jobs(db, 10, kind=services.PAYMENT_INITIATE_JOB)
+    jobs.run_job_batch(job_ids)
+
+    assert gateway.batches == [order_ids]
+    with SessionLocal() as db:
+        statuses = {job.payload: job.status for job in db.query(Job)}
+        transactions = {tx.order_id for tx in db.query(MpesaTransaction)}
+        failed_job = next(job for job in db.query(Job) if job.status == JobStatus.queued)
+    # The failed push retries on its own; the other two are done and recorded.
+    assert sorted(statuses.values()) == [JobStatus.done, JobStatus.done, JobStatus.queued]
+    assert transactions >= set(order_ids[:2])
+    assert failed_job.last_error == "gateway down"
+
+
+def test_unknown_gateway_fails_only_its_jobs(gateway):
+    order_ids = _queue_payments(gateway, ["254700000003"])
+    gateways._gateways.pop(gateway.name)
+    try:
+        with SessionLocal() as db:
+            job_ids = jobs.claim_jobs(db, 10, kind=services.PAYMENT_INITIATE_JOB)
+        jobs.run_job_batch(job_ids)
+    finally:
+        gateways.register_gateway(gateway)
+
+    with SessionLocal() as db:
+        job = db.query(Job).one()
+        order = db.get(Order, order_ids[0])
+    assert job.status == JobStatus.queued
+    assert "No payment gateway registered" in job.last_error
+    assert order.payment_status == PaymentStatus.pending
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, engine
+from app.idempotency import IN_PROGRESS, IdempotencyScope
+from app.models import IdempotencyRecord, Order, User
+from app.schemas import CreateOrderRequest
+
+ORDER = {"items": [{"title": "Cow", "price": 100}], "total": 100}
+
+
+def _order_count() -> int:
+    with SessionLocal() as db:
+        return db.scalar(select(func.count(Order.id)))
+
+
+def test_retry_with_the_same_key_replays_the_response(client, login):
+    headers = {**login(), "Idempotency-Key": "replay-1"}
+    first = client.post("/orders", json=ORDER, headers=headers)
+    orders = _order_count()
+    second = client.post("/orders", json=ORDER, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert _order_count() == orders
+
+
+def test_key_reused_for_a_different_request_is_rejected(client, login):
+    headers = {**login(), "Idempotency-Key": "reuse-1"}
+    client.post("/orders", json=ORDER, headers=headers)
+
+    response = client.post("/orders", json={**ORDER, "total": 200}, headers=headers)
+
+    assert response.status_code == 422
+
+
+def test_keys_belong_to_one_user(client, login):
+    body = {**ORDER, "total": 300}
+    first = client.post("/orders", json=body, headers={**login(), "Idempotency-Key": "shared"})
+    second = client.post("/orders", json=body, headers={**login(), "Idempotency-Key": "shared"})
+
+    assert second.status_code == 201
+    assert second.json()["order"]["id"] != first.json()["order"]["id"]
+
+
+def test_key_held_by_a_request_in_flight_on_sqlite_is_a_conflict():
+    impatient = create_engine(engine.url, connect_args={"timeout": 0.1})
+    with SessionLocal() as holder, Session(impatient) as db:
+        user = User(name="Buyer", email="idempotency-lock@example.com", password_hash="x")
+        holder.add(user)
+        holder.commit()
+        # The first request has reserved the key but not committed, so it holds SQLite's lock.
+        holder.add(
+            IdempotencyRecord(
+                user_id=user.id,
+                key="held",
+                route="POST /orders",
+                request_hash="x",
+                expires_at=datetime.utcnow() + timedelta(hours=1),
+            )
+        )
+        holder.flush()
+        try:
+            scope = IdempotencyScope(db, user, "held", "POST /orders")
+            with pytest.raises(HTTPException) as error:
+                scope.reserve(CreateOrderRequest(**ORDER))
+        finally:
+            holder.rollback()
+
+    assert error.value.status_code == 409
+    assert error.value.detail == IN_PROGRESS
+    impatient.dispose()
@@ -0,0 +1,133 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, update
+
+from app import jobs
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Job, JobStatus
+
+calls: list[dict] = []
+given_up: list[tuple[dict, str]] = []
+
+
+@jobs.job_handler("test.ok")
+def _ok(db, payload):
+    calls.append(payload)
+
+
+def _record_give_up(db, payload, error):
+    given_up.append((payload, error))
+
+
+@jobs.job_handler("test.broken", on_give_up=_record_give_up)
+def _broken(db, payload):
+    calls.append(payload)
+    raise RuntimeError("still broken")
+
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    with SessionLocal() as db:
+        db.execute(delete(Job))
+        db.commit()
+    calls.clear()
+    given_up.clear()
+
+
+def _enqueue(kind: str, **kwargs) -> int:
+    with SessionLocal() as db:
+        job = jobs.enqueue(db, kind, {"n": 1}, **kwargs)
+        db.commit()
+        return job.id
+
+
+def _job(job_id: int) -> Job:
+    with SessionLocal() as db:
+        return db.get(Job, job_id)
+
+
+def _claim(limit: int = 10) -> list[int]:
+    with SessionLocal() as db:
+        return jobs.claim_jobs(db, limit)
+
+
+def test_claimed_job_is_leased_until_the_lease_expires():
+    job_id = _enqueue("test.ok")
+
+    assert _claim() == [job_id]
+    assert _claim() == []
+
+    # A worker that died mid-job leaves the lease to expire; the job is then claimed again.
+    with SessionLocal() as db:
+        expired = datetime.utcnow() - timedelta(seconds=settings.job_lease_seconds + 1)
+        db.execute(update(Job).where(Job.id == job_id).values(locked_at=expired))
+        db.commit()
+    assert _claim() == [job_id]
+    assert _job(job_id).attempts == 2
+
+
+def test_successful_job_is_done():
+    job_id = _enqueue("test.ok")
+    _claim()
+    jobs.run_job(job_id)
+
+    job = _job(job_id)
+    assert job.status == JobStatus.done
+    assert job.locked_at is None
+    assert calls == [{"n": 1}]
+
+
+def test_failed_job_retries_after_a_backoff():
+    job_id = _enqueue("test.broken")
+    _claim()
+    jobs.run_job(job_id)
+
+    job = _job(job_id)
+    assert job.status == JobStatus.queued
+    assert job.last_error == "still broken"
+    assert job.run_after > datetime.utcnow() + timedelta(
+        seconds=settings.job_retry_backoff_seconds - 1
+    )
+    assert _claim() == []
+    assert given_up == []
+
+
+def test_job_gives_up_after_its_last_attempt():
+    job_id = _enqueue("test.broken", max_attempts=1)
+    _claim()
+    jobs.run_job(job_id)
+
+    assert _job(job_id).status == JobStatus.failed
+    assert given_up == [({"n": 1}, "still broken")]
+
+
+def test_job_without_a_handler_fails():
+    job_id = _enqueue("test.unknown")
+    _claim()
+    jobs.run_job(job_id)
+
+    job = _job(job_id)
+    assert job.status == JobStatus.failed
+    assert "No handler registered" in job.last_error
+
+
+def test_run_due_jobs_claims_only_free_slots():
+    release = threading.Event()
+    jobs._handlers["test.blocking"] = (lambda db, payload: release.wait(5), None)
+    first, second = _enqueue("test.blocking"), _enqueue("test.blocking")
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert jobs.run_due_jobs(executor, 1) == 1
+            assert jobs.run_due_jobs(executor, 1) == 0
+            release.set()
+            wait(list(jobs._in_flight))
+            assert jobs.run_due_jobs(executor, 1) == 1
+            wait(list(jobs._in_flight))
+    finally:
+        jobs._handlers.pop("test.blocking")
+
+    assert {_job(first).status, _job(second).status} == {JobStatus.done}
@@ -0,0 +1,45 @@
+import io
+import os
+
+from PIL import Image
+
+from app.config import settings
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "green").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _listing(client, headers: dict) -> int:
+    response = client.post("/listings", json={"title": "Cow", "price": "1000"}, headers=headers)
+    return response.json()["id"]
+
+
+def test_upload_stores_the_original_under_the_media_root(client, login):
+    headers = login("farmer")
+    listing_id = _listing(client, headers)
+
+    response = client.post(
+        f"/listings/{listing_id}/images",
+        files={"file": ("cow.png", _png(), "image/png")},
+        headers=headers,
+    )
+
+    assert response.status_code == 201
+    image_url = response.json()["imageUrl"]
+    relative_path = image_url.removeprefix(f"{settings.media_url_prefix}/")
+    assert os.path.exists(os.path.join(settings.media_root, relative_path))
+
+
+def test_upload_checks_ownership_and_type(client, login):
+    owner = login("farmer")
+    listing_id = _listing(client, owner)
+    url = f"/listings/{listing_id}/images"
+    files = {"file": ("cow.png", _png(), "image/png")}
+
+    assert client.post(url, files=files, headers=login("farmer")).status_code == 403
+    assert client.post("/listings/999999/images", files=files, headers=owner).status_code == 404
+    text_file = {"file": ("cow.txt", b"not an image", "text/plain")}
+    assert client.post(url, files=text_file, headers=owner).status_code == 415
@@ -0,0 +1,92 @@
+import itertools
+
+import pytest
+
+from app import market
+
+_categories = itertools.count(1)
+
+
+@pytest.fixture
+def category():
+    return f"Marketcat{next(_categories)}"
+
+
+def _listing(client, headers: dict, category: str, breed: str, price: str, **extra) -> int:
+    body = {"title": "Cow", "category": category, "breed": breed, "price": price, **extra}
+    response = client.post("/listings", json=body, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _prices(client, **params) -> list[dict]:
+    market.refresh_dirty_groups(10_000)
+    return client.get("/market/prices", params=params).json()["items"]
+
+
+def test_group_stats_and_rollups(client, login, category):
+    farmer = login("farmer")
+    for price in ("10000", "20000", "KSh 30,000 - 35,000"):
+        _listing(client, farmer, category, "Boran", price, location="nakuru")
+    _listing(client, farmer, category, "Sahiwal", "50000", location="Nakuru")
+
+    [boran] = _prices(client, category=category, breed="boran", location="Nakuru")
+    assert boran["count"] == 3
+    summary = [boran[name] for name in ("min", "p25", "median", "p75", "max")]
+    assert summary == [10000, 15000, 20000, 25000, 30000]
+
+    [everything] = _prices(client, category=category)
+    assert everything["breed"] is None
+    assert (everything["count"], everything["max"]) == (4, 50000)
+
+    by_breed = _prices(client, category=category, groupBy="breed")
+    assert [(item["breed"], item["count"]) for item in by_breed] == [("Boran", 3), ("Sahiwal", 1)]
+
+
+def test_unpriced_and_out_of_range_listings_are_left_out(client, login, category):
+    farmer = login("farmer")
+    _listing(client, farmer, category, "Boran", "40000")
+    _listing(client, farmer, category, "Boran", "Call for price")
+    _listing(client, farmer, category, "Boran", "0")
+
+    [stats] = _prices(client, category=category)
+    assert stats["count"] == 1
+
+
+def test_updates_and_deletes_move_the_stats(client, login, category):
+    farmer = login("farmer")
+    kept = _listing(client, farmer, category, "Boran", "10000")
+    moved = _listing(client, farmer, category, "Boran", "20000")
+    _prices(client, category=category)
+
+    body = {"title": "Cow", "category": category, "breed": "Sahiwal", "price": "60000"}
+    client.put(f"/listings/{moved}", json=body, headers=farmer)
+    by_breed = _prices(client, category=category, groupBy="breed")
+    assert [(item["breed"], item["max"]) for item in by_breed] == [
+        ("Boran", 10000),
+        ("Sahiwal", 60000),
+    ]
+
+    client.delete(f"/listings/{moved}", headers=farmer)
+    by_breed = _prices(client, category=category, groupBy="breed")
+    assert [item["breed"] for item in by_breed] == ["Boran"]
+
+    client.delete(f"/listings/{kept}", headers=farmer)
+    assert _prices(client, category=category) == []
+
+
+def test_rebuild_matches_the_incremental_stats(client, login, category):
+    farmer = login("farmer")
+    for breed, price in (("Boran", "10000"), ("Boran", "12000"), ("Zebu", "9000")):
+        _listing(client, farmer, category, breed, price, location="Kitale")
+    incremental = _prices(client, category=category, groupBy=["breed", "location"])
+
+    market.rebuild_market_stats()
+    rebuilt = client.get(
+        "/market/prices", params={"category": category, "groupBy": ["breed", "location"]}
+    ).json()["items"]
+
+    def strip(items):
+        return [{k: v for k, v in item.items() if k != "refreshedAt"} for item in items]
+
+    assert strip(rebuilt) == strip(incremental)
@@ -0,0 +1,87 @@
+import itertools
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import Order, OutboxEvent
+from app.outbox import ORDER_STATUS_CHANGED
+from app.querylog import count_queries
+
+_farmers = itertools.count(1)
+
+
+def _farmer(client) -> tuple[str, dict]:
+    email = f"bulk-farmer{next(_farmers)}@example.com"
+    body = {"name": "Farmer", "email": email, "password": "secret12", "role": "farmer"}
+    client.post("/auth/register", json=body)
+    response = client.post("/auth/login", json={"email": email, "password": "secret12"})
+    return email, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _order(client, buyer: dict, farmer_email: str | None) -> int:
+    body = {"items": [{"title": "Cow", "price": 100}], "total": 100, "farmerEmail": farmer_email}
+    response = client.post("/orders", json=body, headers=buyer)
+    assert response.status_code == 201
+    return response.json()["order"]["id"]
+
+
+def _statuses(order_ids: list[int]) -> list[str]:
+    with SessionLocal() as db:
+        return [db.get(Order, order_id).status.value for order_id in order_ids]
+
+
+def test_bulk_status_only_changes_the_callers_orders(client, login):
+    buyer = login()
+    email, farmer = _farmer(client)
+    other_email, _ = _farmer(client)
+    own = [_order(client, buyer, email), _order(client, buyer, email)]
+    foreign = _order(client, buyer, other_email)
+    unassigned = _order(client, buyer, None)
+
+    body = [
+        {"orderId": own[0], "status": "Rejected"},
+        {"orderId": foreign, "status": "Accepted"},
+        {"orderId": unassigned, "status": "Accepted"},
+        {"orderId": 10**9, "status": "Accepted"},
+        {"orderId": own[1], "status": "Rejected"},
+        {"orderId": own[1], "status": "Accepted"},
+    ]
+    response = client.patch("/orders/status", json=body, headers=farmer)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 2
+    assert [result["ok"] for result in data["results"]] == [True, False, False, False, True, True]
+    assert {result["error"] for result in data["results"] if not result["ok"]} == {
+        "Order not found"
+    }
+    assert _statuses(own + [foreign, unassigned]) == ["Rejected", "Accepted", "Pending", "Pending"]
+    with SessionLocal() as db:
+        events = db.scalars(
+            select(OutboxEvent).where(OutboxEvent.kind == ORDER_STATUS_CHANGED)
+        ).all()
+    assert sorted(event.order_id for event in events if event.order_id in own + [foreign]) == own
+
+
+def test_bulk_status_query_count_does_not_grow_with_orders(client, login):
+    buyer = login()
+    email, farmer = _farmer(client)
+    order_ids = [_order(client, buyer, email) for _ in range(5)]
+
+    with count_queries() as stats:
+        response = client.patch(
+            "/orders/status",
+            json=[{"orderId": order_id, "status": "Accepted"} for order_id in order_ids],
+            headers=farmer,
+        )
+
+    assert response.json()["updated"] == 5
+    # User lookup, the UPDATE ... RETURNING and one batched outbox INSERT.
+    assert stats.count == 3
+
+
+def test_bulk_status_requires_a_farmer(client, login):
+    body = [{"orderId": 1, "status": "Accepted"}]
+    response = client.patch("/orders/status", json=body, headers=login())
+
+    assert response.status_code == 403
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Order, PaymentStatus
+from app.notifications import bus, order_payment_topic
+
+
+def _pending_order(client, headers: dict) -> int:
+    body = {
+        "items": [{"id": 1, "title": "Cow", "price": 100, "qty": 1}],
+        "subtotal": 100,
+        "shipping": 0,
+        "total": 100,
+        "phoneNumber": "0712345671",
+    }
+    response = client.post("/payments/mpesa/stk-push", json=body, headers=headers)
+    assert response.json()["order"]["paymentStatus"] == "PENDING"
+    return response.json()["order"]["id"]
+
+
+def _settle_later(order_id: int, *, publish: bool) -> None:
+    def settle():
+        time.sleep(0.3)
+        with SessionLocal() as db:
+            db.get(Order, order_id).payment_status = PaymentStatus.success
+            db.commit()
+        if publish:
+            bus.publish(order_payment_topic(order_id), {"orderId": order_id})
+
+    threading.Thread(target=settle).start()
+
+
+def _poll(client, headers: dict, order_id: int, wait: float) -> tuple[str, float]:
+    started = time.monotonic()
+    response = client.get(f"/payments/{order_id}/status", params={"wait": wait}, headers=headers)
+    return response.json()["status"], time.monotonic() - started
+
+
+@pytest.fixture
+def shared_bus(monkeypatch):
+    monkeypatch.setattr(bus.backend, "shared", True, raising=False)
+
+
+def test_local_bus_rechecks_changes_from_other_processes(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "payment_status_recheck_seconds", 0.2)
+    headers = login()
+    order_id = _pending_order(client, headers)
+    _settle_later(order_id, publish=False)
+
+    status, elapsed = _poll(client, headers, order_id, wait=5)
+
+    assert status == "SUCCESS"
+    assert elapsed < 2
+
+
+def test_shared_bus_waits_for_an_event(client, login, shared_bus):
+    headers = login()
+    order_id = _pending_order(client, headers)
+    _settle_later(order_id, publish=True)
+
+    status, elapsed = _poll(client, headers, order_id, wait=5)
+
+    assert status == "SUCCESS"
+    assert elapsed < 2
+
+
+def test_shared_bus_does_not_poll_without_events(client, login, shared_bus, monkeypatch):
+    monkeypatch.setattr(settings, "payment_status_recheck_seconds", 0.1)
+    headers = login()
+    order_id = _pending_order(client, headers)
+    _settle_later(order_id, publish=False)
+
+    status, elapsed = _poll(client, headers, order_id, wait=1)
+
+    # No event arrived, so the change is not seen until the client polls again.
+    assert status == "PENDING"
+    assert elapsed >= 1
+
+
+def test_event_stream_sends_status_after_an_event(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "payment_events_heartbeat_seconds", 0.1)
+    headers = login()
+    order_id = _pending_order(client, headers)
+    _settle_later(order_id, publish=True)
+
+    with client.stream("GET", f"/payments/{order_id}/events", headers=headers) as response:
+        lines = [line for line in response.iter_lines() if line]
+
+    statuses = [line for line in lines if line.startswith("data:")]
+    assert len(statuses) == 2
+    assert '"SUCCESS"' in statuses[-1]
+    assert ": keep-alive" in lines
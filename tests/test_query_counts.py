@@ -0,0 +1,35 @@
+from app.querylog import count_queries
+
+
+def _create_listings(client, headers: dict, count: int) -> None:
+    for index in range(count):
+        response = client.post(
+            "/listings", json={"title": f"Cow {index}", "price": "45000"}, headers=headers
+        )
+        assert response.status_code == 201
+
+
+def _listing_queries(client) -> int:
+    with count_queries() as stats:
+        response = client.get("/listings")
+    assert response.status_code == 200
+    assert 'desc="' in response.headers["server-timing"]
+    return stats.count
+
+
+def test_listing_page_queries_do_not_grow_with_rows(client, login):
+    headers = login("farmer")
+    _create_listings(client, headers, 2)
+    baseline = _listing_queries(client)
+    _create_listings(client, headers, 5)
+
+    assert baseline > 0
+    assert _listing_queries(client) == baseline
+
+
+def test_queries_outside_the_block_are_not_counted(client):
+    with count_queries() as stats:
+        pass
+    client.get("/listings")
+
+    assert stats.count == 0
@@ -0,0 +1,153 @@
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete
+
+from app import daraja, gateways
+from app.database import SessionLocal
+from app.gateways import DarajaGateway, PaymentGateway, StatusResult
+from app.models import MpesaTransaction, Order, PaymentMethod, PaymentStatus, User
+from app.reconciler import reconcile_stale_transactions
+
+_checkouts = itertools.count(1)
+
+
+class ScriptedGateway(PaymentGateway):
+    name = "test_reconcile"
+    method = PaymentMethod.mpesa
+    asynchronous = True
+
+    def __init__(self) -> None:
+        self.results: dict[str, StatusResult | None] = {}
+        self.pages: list[list[str]] = []
+
+    def query_many(self, references, *, concurrency=None):
+        self.pages.append(list(references))
+        return super().query_many(references, concurrency=concurrency)
+
+    def _initiate(self, request):
+        raise NotImplementedError
+
+    def _query(self, reference: str) -> StatusResult | None:
+        return self.results.get(reference)
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    with SessionLocal() as db:
+        db.execute(delete(MpesaTransaction))
+        db.commit()
+    gateway = ScriptedGateway()
+    monkeypatch.setattr(gateways, "mpesa_gateway", gateway)
+    return gateway
+
+
+def _success(code: str = "0") -> StatusResult:
+    status = PaymentStatus.success if code == "0" else PaymentStatus.failed
+    return StatusResult(status=status, result_code=code, result_desc=f"code {code}")
+
+
+def _order() -> int:
+    with SessionLocal() as db:
+        buyer = db.query(User).first() or User(
+            name="Buyer", email="reconcile-buyer@example.com", password_hash="x"
+        )
+        db.add(buyer)
+        db.flush()
+        order = Order(
+            buyer_id=buyer.id,
+            buyer_email=buyer.email,
+            total=100,
+            payment_status=PaymentStatus.pending,
+        )
+        db.add(order)
+        db.commit()
+        return order.id
+
+
+def _transaction(order_id: int, created_at: datetime) -> str:
+    checkout_request_id = f"ws_CO_reconcile_{next(_checkouts)}"
+    with SessionLocal() as db:
+        db.add(
+            MpesaTransaction(
+                order_id=order_id,
+                checkout_request_id=checkout_request_id,
+                created_at=created_at,
+            )
+        )
+        db.commit()
+    return checkout_request_id
+
+
+def _order_status(order_id: int) -> PaymentStatus:
+    with SessionLocal() as db:
+        return db.get(Order, order_id).payment_status
+
+
+def test_sweep_pages_through_stale_transactions_once(gateway):
+    stale = datetime.utcnow() - timedelta(hours=1)
+    # Equal timestamps force the keyset to break ties on id.
+    references = [_transaction(_order(), stale) for _ in range(5)]
+    fresh = _transaction(_order(), datetime.utcnow())
+    gateway.results = {reference: _success() for reference in references[::2]}
+
+    resolved = reconcile_stale_transactions(stale_after_seconds=60, page_size=2)
+
+    assert resolved == 3
+    assert gateway.pages == [references[0:2], references[2:4], references[4:]]
+    assert fresh not in sum(gateway.pages, [])
+
+
+def test_results_settle_orders_and_unknown_ones_stay_pending(gateway):
+    stale = datetime.utcnow() - timedelta(hours=1)
+    paid, cancelled, unknown = _order(), _order(), _order()
+    gateway.results = {
+        _transaction(paid, stale): _success(),
+        _transaction(cancelled, stale): _success("1032"),
+    }
+    _transaction(unknown, stale)
+
+    reconcile_stale_transactions(stale_after_seconds=60)
+
+    assert _order_status(paid) == PaymentStatus.success
+    assert _order_status(cancelled) == PaymentStatus.failed
+    assert _order_status(unknown) == PaymentStatus.pending
+
+
+def test_old_transaction_does_not_settle_an_order_being_retried(gateway):
+    order_id = _order()
+    old = _transaction(order_id, datetime.utcnow() - timedelta(hours=2))
+    _transaction(order_id, datetime.utcnow() - timedelta(hours=1))
+    gateway.results = {old: _success("1032")}
+
+    assert reconcile_stale_transactions(stale_after_seconds=60) == 1
+
+    # The old transaction records its own result; the order waits on the retry.
+    with SessionLocal() as db:
+        transaction = db.query(MpesaTransaction).filter_by(checkout_request_id=old).one()
+    assert transaction.status == PaymentStatus.failed
+    assert _order_status(order_id) == PaymentStatus.pending
+
+
+@pytest.mark.parametrize(
+    ("response", "expected"),
+    [
+        ({"ResultCode": "0", "ResultDesc": "Paid"}, _success("0").status),
+        ({"ResultCode": "1032", "ResultDesc": "Cancelled"}, PaymentStatus.failed),
+        ({"errorCode": "500.001.1001"}, None),
+        (HTTPException(status_code=503, detail="busy"), None),
+    ],
+)
+def test_daraja_query_results_are_mapped(monkeypatch, response, expected):
+    def stk_query(checkout_request_id):
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(daraja, "stk_query", stk_query)
+
+    results = DarajaGateway().query_many(["ws_CO_1", "ws_CO_2"])
+
+    assert [result and result.status for result in results] == [expected, expected]